@@ -0,0 +1,95 @@
+"""
+Benchmark of band-parallel rendering (render_core.bands.BandRenderer).
+
+Paints hexagons, random shapes and random characters on a large canvas, once
+in this process on a single QImage and then with BandRenderer for each worker
+count, and checks that every parallel result equals the single-thread one.
+
+    python benchmarks/bench_band_render.py --size 8192 --workers 1 2 4 8 16 32
+
+Worker pools are started and warmed up before the timing, so the numbers show
+the rendering and stitching cost, not the process start-up.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'simple_scripts')
+
+
+# Function to get the benchmarked generators: (name, script, band painter, arguments)
+def generators():
+    from PyQt5.QtGui import QColor, QFont
+
+    return [
+        ('hexagons', 'krita_test16hexagon1.py', 'paint_hexagons', [12, QColor(40, 80, 160), 2]),
+        ('random_shapes', 'krita_test15_random_objects.py', 'paint_random_shapes',
+         ['Circle', 4, 24, 10, True, True, 1, QColor(0, 0, 0), 2409]),
+        ('random_chars', 'krita_test18_random_chars.py', 'paint_random_characters',
+         ['Alphanumeric (A-z, 0-9)', QFont('DejaVu Sans', 10), QColor(0, 0, 0), 12, 2, 2, 2409]),
+    ]
+
+
+# Function to paint a generator on one QImage in this process (the single-thread reference)
+def render_single(script_path, paint_name, arguments, size):
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtCore import Qt
+    from render_core import headless
+
+    paint = getattr(headless.load_script(script_path), paint_name)
+    image = QImage(size, size, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    paint(painter, size, size, 0, size, *arguments)
+    painter.end()
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark band-parallel rendering')
+    parser.add_argument('--size', type=int, default=8192, help='square canvas size in pixels')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='worker counts to measure')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement (best time is kept)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    from render_core import headless
+    from render_core.bands import BandRenderer
+
+    headless.install()
+    cases = generators()
+
+    print(f"{'generator':>14} {'workers':>8} {'time (s)':>10} {'speed-up':>9} {'same':>5}")
+    references = {}
+    for name, script, paint_name, arguments in cases:
+        script_path = os.path.join(SCRIPTS_DIR, script)
+        elapsed = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            references[name] = render_single(script_path, paint_name, arguments, args.size)
+            elapsed.append(time.perf_counter() - start)
+        references[name, 'time'] = min(elapsed)
+        print(f"{name:>14} {'single':>8} {min(elapsed):>10.3f} {1:>9.2f} {'-':>5}")
+
+    for workers in args.workers:
+        with BandRenderer(workers) as renderer:
+            for name, script, paint_name, arguments in cases:
+                script_path = os.path.join(SCRIPTS_DIR, script)
+                renderer.render(script_path, paint_name, arguments, 64, 64)  # Warm up: load the script in the workers
+
+                elapsed = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    image = renderer.render(script_path, paint_name, arguments, args.size, args.size)
+                    elapsed.append(time.perf_counter() - start)
+
+                speedup = references[name, 'time'] / min(elapsed)
+                same = 'yes' if image == references[name] else 'NO'
+                print(f"{name:>14} {workers:>8} {min(elapsed):>10.3f} {speedup:>9.2f} {same:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark of full-canvas generators with many primitives.
+
+The fill-style generators (hexagons, random characters) paint per tile, the
+line generators record their drawing and render_core.tiles rasterizes the
+recording. This benchmark checks that the recorded path stays close to
+painting straight into one QImage as big as the document, the way the scripts
+painted before render_core: the 3D plot at a high density and the mikado with
+many lines cover every tile, so a replay of the recording per tile would show
+up as a multiple of the direct time.
+
+    python benchmarks/bench_dense_render.py --sizes 2048 8192
+
+For each case the direct paint and the draw function (through run_generator,
+into a headless document, render cache off) are timed, with the share of the
+rasterize stage of the trace. The last column counts the pixels where the layer
+differs from the direct paint (a QPicture replay can move a few line ends).
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'simple_scripts')
+
+# Seed of the random generators, the same pictures in every run
+SEED = 2409
+
+# Case name: (script, paint function, draw function, parameters in call order without vector)
+CASES = {
+    'plot_3d density=300': ('krita_test21_func_3d.py', 'paint_3d_function_plot', 'draw_3d_function_plot',
+                            ['sin(A*(x^2 + y^2))/A', 5, 2, 300, 20, 2, '#000000', False]),
+    'mikado N=100000': ('krita_test15_mikado.py', 'paint_mikado_lines', 'draw_mikado_lines',
+                        [100000, 100, 500, 100, 500, False, 2, '#000000', SEED]),
+    'functions N=100': ('krita_test20_functions.py', 'paint_functions', 'draw_functions',
+                        ['y = A*sin((x+x0)/B) + C*cos((x+x0)*A)', -5, 5, 1, 1, 0, 0, 100, 20, 2, '#000000']),
+}
+
+
+# Function to paint a paint function straight into one document-sized image, returns it and the time taken
+def paint_direct(paint, arguments, size):
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtCore import Qt
+
+    start = time.perf_counter()
+    image = QImage(size, size, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    paint(painter, size, size, 0, size, *arguments)
+    painter.end()
+    return image, time.perf_counter() - start
+
+
+# Function to run a draw function into a new headless document, returns the layer image, the time taken
+# and the time of the rasterize stage
+def run_draw(draw, arguments, size):
+    from render_core import headless, trace
+
+    krita_instance = headless.Krita.instance()
+    doc = krita_instance.createDocument(size, size, 'bench')
+    krita_instance.setActiveDocument(doc)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            trace_path = os.path.join(directory, 'trace.json')
+            trace.start(trace_path)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # Without the stage summary
+                draw(*arguments)
+            elapsed = time.perf_counter() - start
+            trace.stop()
+            return doc.activeNode().image, elapsed, stage_time(trace.read_trace(trace_path), 'rasterize')
+    finally:
+        krita_instance.closeDocument(doc)
+
+
+# Function to get the total time of the finished stages of a name in a list of trace events (seconds)
+def stage_time(events, name):
+    return sum(event.get('dur', 0) for event in events if event.get('name') == name) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full-canvas generators with many primitives')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2048, 4096], help='square canvas sizes in pixels')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES), help='cases to measure')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per method (best time is kept)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    import numpy as np
+    from PyQt5.QtGui import QColor
+    from render_core import headless
+    from render_core.cache import render_cache
+    from render_core.pool import image_pixels
+
+    headless.install()  # Offscreen Qt and the Krita stand-in
+    render_cache().max_bytes = 0
+
+    print(f"{'case':<22} {'size':>6} {'direct (s)':>11} {'draw (s)':>9} {'ratio':>6} {'rasterize':>10} {'differs':>9}")
+    for name in args.cases:
+        script, paint_name, draw_name, parameters = CASES[name]
+        module = headless.load_script(os.path.join(SCRIPTS_DIR, script))
+        arguments = [QColor(value) if isinstance(value, str) and value.startswith('#') else value
+                     for value in parameters]
+        for size in args.sizes:
+            direct_times = []
+            draw_times = []
+            for _ in range(args.repeat):
+                direct, elapsed = paint_direct(getattr(module, paint_name), arguments, size)
+                direct_times.append(elapsed)
+                layer, elapsed, rasterize = run_draw(getattr(module, draw_name), arguments, size)
+                draw_times.append((elapsed, rasterize))
+
+            direct_time = min(direct_times)
+            draw_time, rasterize = min(draw_times)
+            differs = np.count_nonzero(image_pixels(layer, writable=False) != image_pixels(direct, writable=False))
+            print(f"{name:<22} {size:>6} {direct_time:>11.2f} {draw_time:>9.2f} {draw_time / direct_time:>5.1f}x"
+                  f" {rasterize / draw_time:>9.0%} {differs:>9}")
+
+
+if __name__ == '__main__':
+    main()
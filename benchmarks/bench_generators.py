@@ -0,0 +1,246 @@
+"""
+Benchmark of every generator's draw function outside Krita.
+
+The scripts import krita and open their dialog from main(). This benchmark puts
+render_core.headless in place of the krita module (documents and layers kept in
+memory, with createNode, addChildNode, pixelData and setPixelData), imports each
+script with headless.load_script, which leaves main() alone, and times the
+draw_* function of every generator of render_batch.py for each canvas size and
+parameter case of CASES:
+
+    python benchmarks/bench_generators.py --sizes 1024 2048 4096
+    python benchmarks/bench_generators.py --generators mikado hexagons --json after.json --compare before.json
+
+Every round draws into a new document after --warmup untimed rounds, the best
+time is kept. The render cache is turned off, so every round paints. --json
+writes the results in the layout of pytest-benchmark's --benchmark-json files
+(one entry per generator, size and case, grouped by generator), --compare
+reads such a file and reports the cases that got slower than --threshold,
+with exit code 1 if there are any.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'simple_scripts')
+
+# Seed of the random generators, the same pictures in every run
+SEED = 2409
+
+# Parameter cases per generator, on top of the dialog defaults (render_batch.GENERATORS)
+CASES = {
+    'lines': [{}, {'spacing': 4}],
+    'noise_lines': [{}, {'N': 100, 'S': 1}],
+    'dots_lines': [{}, {'points_count': 1000}],
+    'cyber_clock': [{}, {'circle_distance': 10, 'N': 120}],
+    'mikado': [{}, {'N': 20000, 'random_color': True}],
+    'random_shapes': [{}, {'size_to': 40, 'fill': True, 'random_color': True}],
+    'hexagons': [{}, {'hex_width': 12, 'spacing': 2}],
+    'random_chars': [{}, {'char_type': 'Alphanumeric (A-z, 0-9)', 'font': 'DejaVu Sans,8'}],
+    'image': [{}, {'zoom_factor': 4}],
+    'image_atlas': [{}, {'padding': 0}],
+    'functions': [{}, {'N': 100}],
+    'plot_3d': [{}, {'hidden_lines': True}],
+}
+
+# Edge of the square test image of the image generator
+TEST_IMAGE_SIZE = 256
+
+# Number of images in the test directory of the image atlas generator, and their sizes
+ATLAS_IMAGE_COUNT = 24
+ATLAS_IMAGE_SIZES = (32, 48, 96, 160)
+
+
+# Function to write a test image for the image generator, returns its path
+def write_test_image(directory):
+    from PyQt5.QtGui import QImage, QColor
+
+    image = QImage(TEST_IMAGE_SIZE, TEST_IMAGE_SIZE, QImage.Format_ARGB32)
+    for y in range(TEST_IMAGE_SIZE):
+        for x in range(TEST_IMAGE_SIZE):
+            image.setPixelColor(x, y, QColor(x, y, (x ^ y) & 255))
+    path = os.path.join(directory, 'bench_image.png')
+    image.save(path)
+    return path
+
+
+# Function to write a directory of differently sized test images for the image atlas generator, returns its path
+def write_atlas_images(directory):
+    from PyQt5.QtGui import QImage, QColor, QPainter, QLinearGradient
+    from PyQt5.QtCore import Qt
+
+    atlas_directory = os.path.join(directory, 'atlas')
+    os.makedirs(atlas_directory)
+    for index in range(ATLAS_IMAGE_COUNT):
+        width = ATLAS_IMAGE_SIZES[index % len(ATLAS_IMAGE_SIZES)]
+        height = ATLAS_IMAGE_SIZES[index * 3 % len(ATLAS_IMAGE_SIZES)]
+        image = QImage(width, height, QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+        gradient = QLinearGradient(0, 0, width, height)
+        gradient.setColorAt(0, QColor.fromHsv(index * 360 // ATLAS_IMAGE_COUNT, 255, 255))
+        gradient.setColorAt(1, QColor(0, 0, 0, 128))
+        painter = QPainter(image)
+        painter.fillRect(image.rect(), gradient)
+        painter.end()
+        image.save(os.path.join(atlas_directory, f'bench_atlas_{index:02}.png'))
+    return atlas_directory
+
+
+# Function to get a short name of a parameter case
+def case_label(case):
+    return ','.join(f'{name}={value}' for name, value in case.items()) or 'default'
+
+
+# Function to get the statistics of the round times, named like pytest-benchmark's
+def round_stats(times):
+    data = sorted(times)
+    q1, median, q3 = statistics.quantiles(data, n=4) if len(data) > 1 else (data[0],) * 3
+    mean = statistics.mean(data)
+    return {
+        'min': data[0], 'max': data[-1], 'mean': mean,
+        'stddev': statistics.stdev(data) if len(data) > 1 else 0.0,
+        'rounds': len(data), 'median': statistics.median(data),
+        'q1': q1, 'q3': q3, 'iqr': q3 - q1,
+        'ops': 1 / mean if mean else 0.0, 'total': sum(data), 'data': times,
+    }
+
+
+# Function to time one draw function call per round, each into a new document (warm-up rounds are not timed)
+def time_draw(draw, arguments, size, rounds, warmup):
+    from render_core import headless
+
+    krita_instance = headless.Krita.instance()
+    times = []
+    for _ in range(warmup + rounds):
+        doc = krita_instance.createDocument(size, size, 'benchmark')
+        krita_instance.setActiveDocument(doc)
+        try:
+            start = time.perf_counter()
+            draw(*arguments)
+            times.append(time.perf_counter() - start)
+        finally:
+            krita_instance.closeDocument(doc)
+    return times[warmup:]
+
+
+# Function to describe the machine and the checked out commit, like pytest-benchmark does
+def machine_info():
+    return {
+        'node': platform.node(), 'processor': platform.processor(), 'machine': platform.machine(),
+        'python_implementation': platform.python_implementation(), 'python_version': platform.python_version(),
+        'system': platform.system(), 'release': platform.release(), 'cpu': {'count': os.cpu_count()},
+    }
+
+
+def commit_info():
+    def git(*arguments):
+        return subprocess.run(['git', *arguments], cwd=SCRIPTS_DIR, capture_output=True, text=True).stdout.strip()
+
+    try:
+        return {'id': git('rev-parse', 'HEAD'), 'branch': git('rev-parse', '--abbrev-ref', 'HEAD'),
+                'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+    except OSError:
+        return {}  # No git
+
+
+# Function to compare the results with a saved run, returns the number of regressions
+def compare(benchmarks, baseline_path, threshold):
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = {entry['fullname']: entry['stats']['min'] for entry in json.load(file)['benchmarks']}
+
+    width = max([len(entry['fullname']) for entry in benchmarks] + [len('benchmark')])
+    print(f"\n{'benchmark':<{width}} {'before (s)':>11} {'after (s)':>10} {'change':>8}")
+    regressions = 0
+    for entry in benchmarks:
+        before = baseline.get(entry['fullname'])
+        if before is None:
+            continue
+        after = entry['stats']['min']
+        change = after / before - 1
+        slower = change > threshold
+        regressions += slower
+        print(f"{entry['fullname']:<{width}} {before:>11.4f} {after:>10.4f} {change:>+8.1%}{'  SLOWER' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the generators outside Krita')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 2048, 4096], help='square canvas sizes in pixels')
+    parser.add_argument('--generators', nargs='+', choices=sorted(CASES), help='generators to measure (default: all)')
+    parser.add_argument('--rounds', type=int, default=3, help='runs per measurement (best time is compared)')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs before each measurement (glyph and stamp caches)')
+    parser.add_argument('--json', help='write the results to this file (pytest-benchmark JSON layout)')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slow-down that counts as a regression in --compare (0.1 = 10%%)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    from render_core import headless
+    from render_core.cache import render_cache
+    import render_batch
+
+    headless.install()
+    render_cache().max_bytes = 0  # Measure the painting, not the cache
+
+    benchmarks = []
+    with tempfile.TemporaryDirectory() as directory:
+        test_image = write_test_image(directory)
+        atlas_directory = write_atlas_images(directory)
+
+        print(f"{'generator':>14} {'size':>6} {'min (s)':>9} {'mean (s)':>9}  case")
+        for generator in args.generators or list(CASES):
+            script, function_name, defaults = render_batch.GENERATORS[generator]
+            draw = getattr(headless.load_script(os.path.join(render_batch.SCRIPTS_DIR, script)), function_name)
+
+            for case in CASES[generator]:
+                params = dict(case)
+                if 'seed' in defaults:
+                    params.setdefault('seed', SEED)
+                if 'selected_image' in defaults:
+                    params.setdefault('selected_image', test_image)
+                if 'image_directory' in defaults:
+                    params.setdefault('image_directory', atlas_directory)
+                arguments = render_batch.build_arguments(generator, params)
+
+                for size in args.sizes:
+                    stats = round_stats(time_draw(draw, arguments, size, args.rounds, args.warmup))
+                    label = case_label(case)
+                    print(f"{generator:>14} {size:>6} {stats['min']:>9.4f} {stats['mean']:>9.4f}  {label}")
+                    benchmarks.append({
+                        'group': generator,
+                        'name': f'{function_name}[{size}-{label}]',
+                        'fullname': f'{script}::{function_name}[{size}-{label}]',
+                        'params': {'size': size, **case},
+                        'param': f'{size}-{label}',
+                        'extra_info': {},
+                        'options': {'min_rounds': args.rounds, 'timer': 'perf_counter', 'warmup': args.warmup > 0},
+                        'stats': stats,
+                    })
+
+    if args.json:
+        report = {
+            'machine_info': machine_info(),
+            'commit_info': commit_info(),
+            'benchmarks': benchmarks,
+            'datetime': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'version': '4.0.0',  # pytest-benchmark file layout
+        }
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        return 1 if compare(benchmarks, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
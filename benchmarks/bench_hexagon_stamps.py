@@ -0,0 +1,85 @@
+"""
+Benchmark and check of the stamped hexagons against drawing them as polygons.
+
+krita_test16hexagon1 stamps small opaque hexagons: each one is rasterized once
+into a coverage stamp and the rows are composed with NumPy. A stamp moved by
+whole pixels must keep the pixels of drawPolygon at the hexagon's place, also
+without antialiasing, where a vertex rounded differently moves a whole pixel.
+For every case the hexagons are painted on one canvas-sized image both ways
+(the polygon path by setting STAMP_MAX_WIDTH to 0), timed, and compared:
+
+    python benchmarks/bench_hexagon_stamps.py --size 2048
+
+The pixels that differ are counted, and the largest difference of a channel.
+Aliased hexagons must match exactly. Antialiased edges may differ by two
+levels: Qt blends the color by the coverage with its own rounding, and where
+hexagons without spacing overlap the stamps add up their coverage with a
+rounding of their own. Exit code 1 if a case differs more than that.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'simple_scripts')
+
+# (hex_width, spacing) cases, the first three moved whole pixels with the earlier single stamp per row
+CASES = [(50, 10), (12, 2), (13, 3), (20, 4), (77, 0), (16, 0)]
+
+# Largest channel difference allowed between the two paths, aliased and antialiased
+TOLERANCE = {False: 0, True: 2}
+
+
+# Function to paint the hexagons on a new canvas-sized image, returns its pixels and the time taken
+def paint(module, size, hex_width, spacing, antialiasing, stamp_max_width):
+    from PyQt5.QtGui import QImage, QPainter, QColor
+    from PyQt5.QtCore import Qt
+    from render_core.pool import image_pixels
+
+    module.STAMP_MAX_WIDTH = stamp_max_width
+    image = QImage(size, size, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    start = time.perf_counter()
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing, antialiasing)
+    module.paint_hexagons(painter, size, size, 0, size, hex_width, QColor(20, 40, 80), spacing)
+    painter.end()
+    elapsed = time.perf_counter() - start
+    # Compared premultiplied: the color of an almost transparent pixel is not kept to one level
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return image_pixels(image, writable=False).copy(), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the stamped hexagons against drawing them as polygons')
+    parser.add_argument('--size', type=int, default=1024, help='square canvas size in pixels')
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    import numpy as np
+    from render_core import headless
+
+    headless.install()  # Offscreen Qt and the Krita stand-in
+    module = headless.load_script(os.path.join(SCRIPTS_DIR, 'krita_test16hexagon1.py'))
+
+    failed = 0
+    print(f"{'case':<18} {'antialiasing':>12} {'stamps (s)':>11} {'polygons (s)':>13} {'differs':>8} {'max':>4}")
+    for hex_width, spacing in CASES:
+        for antialiasing in (False, True):
+            paint(module, args.size, hex_width, spacing, antialiasing, hex_width)  # Stamp cache
+            stamped, stamp_time = paint(module, args.size, hex_width, spacing, antialiasing, hex_width)
+            shapes, shape_time = paint(module, args.size, hex_width, spacing, antialiasing, 0)
+
+            channels = (stamped.view(np.uint8).astype(np.int16) - shapes.view(np.uint8)).reshape(stamped.shape + (4,))
+            differs = np.count_nonzero((channels != 0).any(axis=2))
+            largest = int(np.abs(channels).max())
+            ok = largest <= TOLERANCE[antialiasing]
+            failed += not ok
+            print(f"{f'{hex_width}/{spacing}':<18} {'on' if antialiasing else 'off':>12} {stamp_time:>11.3f}"
+                  f" {shape_time:>13.3f} {differs:>8} {largest:>4}{'' if ok else '  FAILED'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
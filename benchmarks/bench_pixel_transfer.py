@@ -0,0 +1,82 @@
+"""
+Benchmark of the QImage -> setPixelData hand-over.
+
+Compares the previous conversion, QByteArray(image.constBits().asstring(...)),
+with render_core.buffers.image_bytes, which wraps the image buffer without a
+copy. Every measurement runs in a fresh process, so the peak RSS reported by
+getrusage belongs to that single method and canvas size.
+
+    python benchmarks/bench_pixel_transfer.py --sizes 4096 8192 16384
+
+setPixelData is simulated by copying the QByteArray once into a preallocated
+buffer, like Krita does when it writes the pixels into the layer.
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'simple_scripts')
+
+METHODS = ['asstring', 'zero-copy']
+
+
+# Function to measure one method at one canvas size (runs inside the child process)
+def measure(method, size):
+    sys.path.insert(0, SCRIPTS_DIR)
+    from PyQt5.QtGui import QImage
+    from PyQt5.QtCore import QByteArray, Qt
+    from render_core.buffers import image_bytes
+
+    image = QImage(size, size, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    # Stand-in for the layer storage setPixelData copies the pixels into
+    layer_copy = QByteArray(image.byteCount(), b'\0')
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if method == 'asstring':
+        image_bits = image.constBits()
+        data = QByteArray(image_bits.asstring(image.byteCount()))
+    else:
+        data = image_bytes(image)
+    # Stand-in for setPixelData, which copies the data into the layer
+    layer_copy.replace(0, data.size(), data)
+    elapsed = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux
+    print(f"{elapsed:.6f} {baseline_rss / 1024:.1f} {peak_rss / 1024:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the QImage to setPixelData hand-over')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4096, 8192, 16384],
+                        help='square canvas sizes in pixels')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per method and size (best time is kept)')
+    parser.add_argument('--child', nargs=2, metavar=('METHOD', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'size':>7} {'method':>10} {'time (s)':>10} {'start RSS (MiB)':>16} {'peak RSS (MiB)':>15}")
+    for size in args.sizes:
+        for method in METHODS:
+            results = []
+            for _ in range(args.repeat):
+                output = subprocess.run([sys.executable, __file__, '--child', method, str(size)],
+                                        capture_output=True, text=True, check=True).stdout
+                results.append([float(value) for value in output.split()])
+            elapsed = min(result[0] for result in results)
+            baseline_rss = min(result[1] for result in results)
+            peak_rss = max(result[2] for result in results)
+            print(f"{size:>7} {method:>10} {elapsed:>10.3f} {baseline_rss:>16.0f} {peak_rss:>15.0f}")
+
+
+if __name__ == '__main__':
+    main()
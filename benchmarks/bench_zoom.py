@@ -0,0 +1,108 @@
+"""
+Benchmark of the integer nearest-neighbour zoom of imported images.
+
+Compares the previous zoom of krita_test19_png_in, QImage.scaled with
+Qt.FastTransformation followed by painter.drawImage into the canvas, with
+render_core.images.zoom_into, which writes the enlarged pixels straight into
+the canvas buffer. For each zoom factor the source is the part of a test image
+that covers the canvas, like the import decodes it, so both methods write one
+canvas of pixels:
+
+    python benchmarks/bench_zoom.py --zooms 1 2 4 8 16 32 64 100 --canvas 2048
+
+zoom_into is checked against np.repeat of the source. The last column counts
+the pixels where the Qt path differs from it: QImage.scaled maps the pixels in
+16.16 fixed point, which drifts by a pixel at some block edges of large outputs.
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'simple_scripts')
+
+METHODS = ['scaled + drawImage', 'zoom_into']
+
+
+# Function to make an ARGB32 test image with a different color in every pixel
+def test_image(width, height):
+    import numpy as np
+    from PyQt5.QtGui import QImage
+    from render_core.pool import image_pixels
+
+    image = QImage(width, height, QImage.Format_ARGB32)
+    rows, columns = np.mgrid[0:height, 0:width].astype(np.uint32)
+    image_pixels(image)[...] = 0xff000000 | (rows * 40503 + columns * 2654435761) & 0xffffff
+    return image
+
+
+# Function to zoom the source into a new canvas with one method, returns the canvas and the time taken
+def run(method, source, zoom, canvas_size, offset):
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtCore import Qt
+    from render_core.images import zoom_into
+    from render_core.pool import image_pixels
+
+    canvas = QImage(canvas_size, canvas_size, QImage.Format_ARGB32)
+    canvas.fill(Qt.transparent)
+
+    start = time.perf_counter()
+    if method == 'zoom_into':
+        zoom_into(image_pixels(canvas), image_pixels(source, writable=False), -offset, -offset, zoom)
+    else:
+        zoomed = source.scaled(source.width() * zoom, source.height() * zoom, Qt.IgnoreAspectRatio,
+                               Qt.FastTransformation)
+        painter = QPainter(canvas)
+        painter.drawImage(-offset, -offset, zoomed)
+        painter.end()
+    return canvas, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the integer zoom of imported images')
+    parser.add_argument('--zooms', type=int, nargs='+', default=[1, 2, 3, 4, 8, 16, 32, 64, 100],
+                        help='zoom factors to measure')
+    parser.add_argument('--canvas', type=int, default=2048, help='edge of the square canvas in pixels')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per method and zoom (best time is kept)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    import numpy as np
+    from render_core import headless
+    from render_core.pool import image_pixels
+
+    headless.install()  # Offscreen Qt
+
+    print(f"{'zoom':>5} {'source':>11} " + ' '.join(f'{method + " (ms)":>22}' for method in METHODS)
+          + f" {'speed-up':>9} {'Qt differs':>11}")
+    for zoom in args.zooms:
+        # The source covers the canvas, the zoomed first and last pixels are cut like at the canvas edges
+        offset = zoom // 2
+        size = math.ceil((args.canvas + offset) / zoom)
+        source = test_image(size, size)
+
+        results = {}
+        for method in METHODS:
+            times = []
+            for _ in range(args.repeat):
+                canvas, elapsed = run(method, source, zoom, args.canvas, offset)
+                times.append(elapsed)
+            results[method] = (canvas, min(times))
+
+        # Exact enlargement: every source pixel repeated zoom times on both axes, cut to the canvas
+        source_pixels = image_pixels(source, writable=False)
+        expected = np.repeat(np.repeat(source_pixels, zoom, axis=0), zoom, axis=1)[offset:, offset:]
+        expected = expected[:args.canvas, :args.canvas]
+        if not np.array_equal(image_pixels(results['zoom_into'][0], writable=False), expected):
+            raise Exception(f"zoom_into gives wrong pixels at zoom {zoom}.")
+        differing = np.count_nonzero(image_pixels(results[METHODS[0]][0], writable=False) != expected)
+
+        before, after = (results[method][1] for method in METHODS)
+        print(f"{zoom:>5} {f'{size}x{size}':>11} {before * 1000:>22.2f} {after * 1000:>22.2f} {before / after:>8.1f}x"
+              f" {differing:>11}")
+
+
+if __name__ == '__main__':
+    main()
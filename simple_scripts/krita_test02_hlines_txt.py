@@ -1,77 +1,59 @@
-import krita as k
-from PyQt5.QtGui import QPainter, QColor, QPen, QFont, QImage
-from PyQt5.QtCore import QByteArray, Qt
-
-# Get Krita instance
-krita_instance = k.Krita.instance()
-
-# Get the active document
-doc = krita_instance.activeDocument()
-
-# Check if there is an active document
-if not doc:
-    raise Exception("No active document found.")
-
-# Create a new layer
-new_layer = doc.createNode("Lines and Text", "paintlayer")
-doc.rootNode().addChildNode(new_layer, None)  # Add the new layer to the root node
-
-# Set the new layer as active
-doc.setActiveNode(new_layer)
-
-# Get the document's width and height
-width = doc.width()
-height = doc.height()
-
-# Define the area to draw on (x, y, width, height)
-x = 0
-y = 0
-
-# Create a QImage for drawing
-image = QImage(width, height, QImage.Format_ARGB32)
-image.fill(Qt.transparent)  # Set the background to transparent
-
-# Create a QPainter to draw on the QImage
-painter = QPainter(image)
-
-# Set the black color for the lines
-pen = QPen(QColor(0, 0, 0))  # Black color
-pen.setWidth(2)  # Set line width to 2px
-painter.setPen(pen)
-
-# Starting position for the lines
-start_y = 80  # Start drawing lines 80px from the top to leave space for the text
-spacing = 50  # Spacing between the lines
-
-# Draw horizontal lines every 50px
-for y_position in range(start_y, height, spacing):
-    painter.drawLine(0, y_position, width, y_position)
-
-# Set the black color for the text
-painter.setPen(QColor(0, 0, 0))
-
-# Set the font for the text
-font = QFont("Verdana", 50)  # Use Verdana font, size 50
-painter.setFont(font)
-
-# Calculate the position to center the text
-text = "test"
-text_width = painter.fontMetrics().width(text)
-text_x = (width - text_width) // 2  # Center the text horizontally
-text_y = 70  # Position the text 40px from the top
-
-# Draw the text
-painter.drawText(text_x, text_y, text)
-
-# Release the painter to free memory
-painter.end()
-
-# Convert the QImage to QByteArray
-image_bits = image.constBits()  # Get a pointer to the image data
-image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert the data to QByteArray
-
-# Set the modified pixel data back to the new layer
-new_layer.setPixelData(image_bytes, x, y, width, height)
-
-# Refresh the document to apply changes
-doc.refreshProjection()  # Refresh the document projection
+import os
+import sys
+from PyQt5.QtGui import QColor, QPen, QFont
+from PyQt5.QtCore import QRect
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.trace import stage
+
+# Draw shapes on a vector layer (True) or pixels on a paint layer (False)
+vector = False
+
+# Function to paint the horizontal lines and the centered text, returns the text area
+def paint_lines_and_text(painter, width, height, top, bottom):
+    # Set the black color for the lines
+    pen = QPen(QColor(0, 0, 0))  # Black color
+    pen.setWidth(2)  # Set line width to 2px
+    painter.setPen(pen)
+
+    # Starting position for the lines
+    start_y = 80  # Start drawing lines 80px from the top to leave space for the text
+    spacing = 50  # Spacing between the lines
+
+    # Draw horizontal lines every 50px
+    for y_position in range(start_y, height, spacing):
+        painter.drawLine(0, y_position, width, y_position)
+
+    # Set the black color for the text
+    painter.setPen(QColor(0, 0, 0))
+
+    # Set the font for the text
+    font = QFont("Verdana", 50)  # Use Verdana font, size 50
+    painter.setFont(font)
+
+    # Calculate the position to center the text
+    text = "test"
+    text_width = painter.fontMetrics().width(text)
+    text_x = (width - text_width) // 2  # Center the text horizontally
+    text_y = 70  # Position the text 40px from the top
+
+    # Draw the text
+    painter.drawText(text_x, text_y, text)
+
+    # Text is not included in the recorded drawing bounds, return its area
+    metrics = painter.fontMetrics()
+    return QRect(text_x, text_y - metrics.ascent(), text_width, metrics.height())
+
+# Create a new layer in the active document, draw into it and refresh the document
+# (traced as one run when tracing is on, see render_core.trace)
+with stage('krita_test02_hlines_txt'):
+    run_generator(paint_lines_and_text, "Lines and Text", (), vector=vector)
@@ -1,8 +1,21 @@
-import krita as k
 import os
+import sys
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QComboBox, QPushButton, QDialogButtonBox, QCheckBox, QColorDialog
-from PyQt5.QtGui import QPainter, QColor, QPen, QImage
-from PyQt5.QtCore import Qt, QByteArray
+from PyQt5.QtGui import QColor, QPen
+from PyQt5.QtCore import QRect
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.trace import traced
 
 
 """
@@ -52,6 +65,13 @@ class LineSettingsDialog(QDialog):
         self.checkbox_new_layer = QCheckBox('Create a new layer')
         self.checkbox_new_layer.setChecked(False)  # Default is unchecked
 
+        # Checkbox for drawing the lines as shapes on a new vector layer
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+
+        # Preview of the active document
+        self.preview = PreviewPane(paint_lines, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -67,65 +87,53 @@ class LineSettingsDialog(QDialog):
         layout.addWidget(self.label_spacing)
         layout.addWidget(self.spin_spacing)
         layout.addWidget(self.checkbox_new_layer)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.combo_direction, self.spin_thickness, self.spin_spacing)
+        self.update_preview()
+
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color = color
+            self.update_preview()
 
-# Function to draw lines based on user settings
-def draw_lines(direction, color, thickness, spacing, create_new_layer):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
-
-    # Create a new layer if requested
-    if create_new_layer:
-        new_layer = doc.createNode("Lines Layer", "paintlayer")
-        doc.rootNode().addChildNode(new_layer, None)
-        doc.setActiveNode(new_layer)
-
-    # Get the active layer
-    active_layer = doc.activeNode()
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.combo_direction.currentText(), self.color, self.spin_thickness.value(),
+                              self.spin_spacing.value()))
 
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
-
-    # Get the pixel data of the current layer
-    pixel_data = active_layer.pixelData(0, 0, width, height)
-
-    # Create a QImage to draw lines on
-    image = QImage(pixel_data, width, height, QImage.Format_ARGB32)
-
-    # Create a QPainter to draw on the QImage
-    painter = QPainter(image)
+# Function to paint the lines (all of them, they are cheap to draw for any band top..bottom),
+# returns the stripes they cover, so painting over a layer reads back and writes only them
+def paint_lines(painter, width, height, top, bottom, direction, color, thickness, spacing):
     painter.setPen(QPen(color, thickness))
 
+    # A line of thickness t at position p covers the pixels p - t/2 .. p + t/2
+    start = -(thickness + 1) // 2
+    stripes = []
+
     # Draw lines based on the selected direction
     if direction == 'Horizontal':
         for y in range(0, height, spacing):
             painter.drawLine(0, y, width, y)
+            stripes.append(QRect(0, y + start, width, thickness + 1))
     elif direction == 'Vertical':
         for x in range(0, width, spacing):
             painter.drawLine(x, 0, x, height)
+            stripes.append(QRect(x + start, 0, thickness + 1, height))
+    return stripes
 
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert to QByteArray
-
-    # Set the modified pixel data back to the layer
-    active_layer.setPixelData(image_bytes, 0, 0, width, height)
-
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+# Function to draw lines based on user settings
+@traced
+def draw_lines(direction, color, thickness, spacing, create_new_layer, vector=False):
+    # Without a new layer the lines are painted over the active layer
+    run_generator(paint_lines, "Lines Layer", (direction, color, thickness, spacing), vector=vector,
+                  new_layer=create_new_layer)
 
 # Main function to run the dialog and draw lines
 def main():
@@ -138,9 +146,11 @@ def main():
         thickness = dialog.spin_thickness.value()
         spacing = dialog.spin_spacing.value()
         create_new_layer = dialog.checkbox_new_layer.isChecked()
+        vector = dialog.checkbox_vector.isChecked()
 
         # Draw lines based on the user settings
-        draw_lines(direction, color, thickness, spacing, create_new_layer)
+        draw_lines(direction, color, thickness, spacing, create_new_layer, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,24 @@
-import krita as k
-import random
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QComboBox, QPushButton, QDialogButtonBox, QColorDialog
-from PyQt5.QtGui import QPainter, QColor, QPen, QImage
-from PyQt5.QtCore import Qt, QPointF, QByteArray
+import os
+import sys
+import math
+import numpy as np
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QComboBox, QPushButton, QDialogButtonBox, QColorDialog, QCheckBox
+from PyQt5.QtGui import QColor, QPen
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.geometry import polygon_from_arrays
+from render_core.streams import substream, new_seed, MAX_SEED
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.trace import traced
 
 # Basic class for the settings dialog
 class NoiseLinesDialog(QDialog):
@@ -27,7 +43,7 @@ class NoiseLinesDialog(QDialog):
         # S input (step size)
         self.label_S = QLabel('S (Step Size):')
         self.spin_S = QSpinBox()
-        self.spin_S.setMinimum(0)
+        self.spin_S.setMinimum(1)
         self.spin_S.setMaximum(50)
         self.spin_S.setValue(5)
 
@@ -51,6 +67,21 @@ class NoiseLinesDialog(QDialog):
         self.button_color.clicked.connect(self.choose_color)
         self.color = QColor(0, 0, 0)  # Default black color
 
+        # Seed input (0 picks a new random seed every time)
+        self.label_seed = QLabel('Seed (0 = random):')
+        self.spin_seed = QSpinBox()
+        self.spin_seed.setMinimum(0)
+        self.spin_seed.setMaximum(MAX_SEED)
+        self.spin_seed.setValue(0)
+
+        # Checkbox for drawing shapes on a vector layer
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+
+        # Preview of the active document, a seed of 0 shows (and draws) preview_seed
+        self.preview_seed = new_seed()
+        self.preview = PreviewPane(paint_noise_lines, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -69,85 +100,71 @@ class NoiseLinesDialog(QDialog):
         layout.addWidget(self.spin_thickness)
         layout.addWidget(self.label_color)
         layout.addWidget(self.button_color)
+        layout.addWidget(self.label_seed)
+        layout.addWidget(self.spin_seed)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.combo_direction, self.spin_R, self.spin_S, self.spin_N,
+                        self.spin_thickness, self.spin_seed)
+        self.update_preview()
+
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color = color
+            self.update_preview()
 
-# Function to draw noisy lines
-def draw_noise_lines(direction, R, S, N, thickness, color):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
+    # Function to get the seed of the drawing (0 in the spin box uses the preview seed)
+    def seed(self):
+        return self.spin_seed.value() or self.preview_seed
 
-    # Create a new layer
-    new_layer = doc.createNode("Noise Lines", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
-    doc.setActiveNode(new_layer)
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.combo_direction.currentText(), self.spin_R.value(), self.spin_S.value(),
+                              self.spin_N.value(), self.spin_thickness.value(), self.color, self.seed()))
 
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
+# Function to generate one noisy coordinate: a random start in 0..limit and steps random steps of -R..R
+def noise_walk(rng, limit, R, steps):
+    start = rng.integers(0, limit, endpoint=True)
+    offsets = rng.integers(-R, R, size=steps, endpoint=True)
+    return start + np.concatenate(([0], np.cumsum(offsets)))
 
-    # Create a QImage to draw on
-    image = QImage(width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
-
-    # Create a QPainter to draw on the QImage
-    painter = QPainter(image)
+# Function to paint the N noisy lines (all of them, they cross any band top..bottom)
+def paint_noise_lines(painter, width, height, top, bottom, direction, R, S, N, thickness, color, seed):
     pen = QPen(color)
     pen.setWidth(thickness)
     painter.setPen(pen)
 
-    # Draw N noisy lines
-    for _ in range(N):
+    # Draw N noisy lines, line i takes its random values from its own substream
+    for i in range(N):
         if direction == 'Horizontal':
-            # Initial starting point
-            y = random.randint(0, height)
-            x = 0
-
-            points = [QPointF(x, y)]
-            # Create a noisy horizontal line
-            while x < width:
-                x += S
-                y += random.randint(-R, R)
-                points.append(QPointF(x, y))
+            # Noisy y for the points at x = 0, S, 2S, ... until the line reaches the width
+            ys = noise_walk(substream(seed, i), height, R, math.ceil(width / S))
+            xs = np.arange(len(ys)) * S
 
             # Draw the polyline
-            painter.drawPolyline(*points)
+            painter.drawPolyline(polygon_from_arrays(xs, ys))
 
         elif direction == 'Vertical':
-            # Initial starting point
-            x = random.randint(0, width)
-            y = 0
-
-            points = [QPointF(x, y)]
-            # Create a noisy vertical line
-            while y < height:
-                y += S
-                x += random.randint(-R, R)
-                points.append(QPointF(x, y))
+            # Noisy x for the points at y = 0, S, 2S, ... until the line reaches the height
+            xs = noise_walk(substream(seed, i), width, R, math.ceil(height / S))
+            ys = np.arange(len(xs)) * S
 
             # Draw the polyline
-            painter.drawPolyline(*points)
-
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert to QByteArray
+            painter.drawPolyline(polygon_from_arrays(xs, ys))
 
-    # Set the modified pixel data back to the layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
+# Function to draw noisy lines, the same seed gives the same lines
+@traced
+def draw_noise_lines(direction, R, S, N, thickness, color, seed=None, vector=False):
+    if seed is None:
+        seed = new_seed()
 
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+    run_generator(paint_noise_lines, "Noise Lines", (direction, R, S, N, thickness, color, seed), vector=vector)
 
 # Main function to run the dialog and draw noisy lines
 def main():
@@ -161,9 +178,12 @@ def main():
         N = dialog.spin_N.value()
         thickness = dialog.spin_thickness.value()
         color = dialog.color
+        seed = dialog.seed()  # 0 uses the random seed of the preview
+        vector = dialog.checkbox_vector.isChecked()
 
         # Draw the noisy lines based on the settings
-        draw_noise_lines(direction, R, S, N, thickness, color)
+        draw_noise_lines(direction, R, S, N, thickness, color, seed, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
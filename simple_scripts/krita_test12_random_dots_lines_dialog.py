@@ -1,8 +1,23 @@
-import krita as k
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QPushButton, QColorDialog, QDialogButtonBox
-from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QImage
-from PyQt5.QtCore import QPoint, QByteArray, Qt
-import random
+import os
+import sys
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QPushButton, QColorDialog, QDialogButtonBox, QCheckBox
+from PyQt5.QtGui import QColor, QPen, QBrush
+from PyQt5.QtCore import QPoint, Qt
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.geometry import lines_from_arrays
+from render_core.streams import draw_chunked, new_seed, MAX_SEED
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.trace import traced
 
 # Basic class for the settings dialog
 class SettingsDialog(QDialog):
@@ -31,6 +46,21 @@ class SettingsDialog(QDialog):
         self.button_color_lines.clicked.connect(self.choose_color_lines)
         self.color_lines = QColor(128, 128, 128)  # Default gray color for lines
 
+        # Seed input (0 picks a new random seed every time)
+        self.label_seed = QLabel('Seed (0 = random):')
+        self.spin_seed = QSpinBox()
+        self.spin_seed.setMinimum(0)
+        self.spin_seed.setMaximum(MAX_SEED)
+        self.spin_seed.setValue(0)
+
+        # Checkbox for drawing shapes on a vector layer
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+
+        # Preview of the active document, a seed of 0 shows (and draws) preview_seed
+        self.preview_seed = new_seed()
+        self.preview = PreviewPane(paint_points_and_lines, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)  # Action for OK
@@ -43,66 +73,55 @@ class SettingsDialog(QDialog):
         layout.addWidget(self.button_color_points)
         layout.addWidget(self.label_color_lines)
         layout.addWidget(self.button_color_lines)
+        layout.addWidget(self.label_seed)
+        layout.addWidget(self.spin_seed)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.spin_points, self.spin_seed)
+        self.update_preview()
+
     # Function to choose the color for points
     def choose_color_points(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color_points = color  # Set the selected color for points
+            self.update_preview()
 
     # Function to choose the color for lines
     def choose_color_lines(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color_lines = color  # Set the selected color for lines
+            self.update_preview()
 
-# Function to draw points and lines
-def draw_points_and_lines(points_count, color_points, color_lines):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
-
-    # Create a new layer for points and lines
-    new_layer = doc.createNode("Points and Lines", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
+    # Function to get the seed of the drawing (0 in the spin box uses the preview seed)
+    def seed(self):
+        return self.spin_seed.value() or self.preview_seed
 
-    # Set the new layer as the active layer
-    doc.setActiveNode(new_layer)
-
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
-
-    # Create a QImage for drawing
-    image = QImage(width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
-
-    # Create a QPainter for drawing on the QImage
-    painter = QPainter(image)
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.spin_points.value(), self.color_points, self.color_lines, self.seed()))
 
+# Function to paint the points and the lines between them (all of them, they cross any band top..bottom)
+def paint_points_and_lines(painter, width, height, top, bottom, points_count, color_points, color_lines, seed):
     # Set the pen for drawing lines (with the selected color and 3px width)
     pen_line = QPen(color_lines)
     pen_line.setWidth(3)  # Set the line width to 3px
     painter.setPen(pen_line)
 
-    # List to store the generated points
-    points = []
+    # Generate the points
+    xs, ys = draw_chunked(seed, 0, points_count, lambda rng, count: (
+        rng.integers(0, width, size=count, endpoint=True),
+        rng.integers(0, height, size=count, endpoint=True),
+    ))
 
-    # Generate and draw the points
-    for i in range(points_count):
-        x_pos = random.randint(0, width)
-        y_pos = random.randint(0, height)
-        point = QPoint(x_pos, y_pos)
-        points.append(point)
-
-        if i > 0:
-            # Draw a line connecting the current point with the previous one
-            painter.drawLine(points[i - 1], points[i])
+    # Draw the lines connecting each point with the previous one in one call
+    painter.drawLines(lines_from_arrays(xs[:-1], ys[:-1], xs[1:], ys[1:]))
 
     # Set the pen and brush for drawing circles (points)
     pen_circle = QPen(Qt.NoPen)  # No outline for circles
@@ -111,21 +130,17 @@ def draw_points_and_lines(points_count, color_points, color_lines):
     painter.setBrush(brush_circle)
 
     # Draw circles for each point
-    for point in points:
-        painter.drawEllipse(point, 10, 10)  # Draw a circle with a 21px diameter (radius 10)
-
-    # Release the painter to free memory
-    painter.end()
-
-    # Convert the QImage to a QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert the image data to QByteArray
+    for x_pos, y_pos in zip(xs.tolist(), ys.tolist()):
+        painter.drawEllipse(QPoint(x_pos, y_pos), 10, 10)  # Draw a circle with a 21px diameter (radius 10)
 
-    # Set the modified pixel data back to the new layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
+# Function to draw points and lines, the same seed gives the same points
+@traced
+def draw_points_and_lines(points_count, color_points, color_lines, seed=None, vector=False):
+    if seed is None:
+        seed = new_seed()
 
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+    run_generator(paint_points_and_lines, "Points and Lines", (points_count, color_points, color_lines, seed),
+                  vector=vector)
 
 # Main function to run the dialog and draw points and lines
 def main():
@@ -135,9 +150,12 @@ def main():
         points_count = dialog.spin_points.value()
         color_points = dialog.color_points
         color_lines = dialog.color_lines
+        seed = dialog.seed()  # 0 uses the random seed of the preview
+        vector = dialog.checkbox_vector.isChecked()
 
         # Draw points and lines based on user settings
-        draw_points_and_lines(points_count, color_points, color_lines)
+        draw_points_and_lines(points_count, color_points, color_lines, seed, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
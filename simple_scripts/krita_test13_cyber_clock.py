@@ -1,8 +1,23 @@
-import krita as k
+import os
+import sys
 import math
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QPushButton, QColorDialog, QDialogButtonBox
-from PyQt5.QtGui import QPainter, QColor, QPen, QImage
-from PyQt5.QtCore import Qt, QPointF, QByteArray
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QDoubleSpinBox, QPushButton, QColorDialog, QDialogButtonBox, QCheckBox
+from PyQt5.QtGui import QColor, QPen
+from PyQt5.QtCore import QPointF
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.sequence import draw_sequence, frame_parameters
+from render_core.trace import traced
 
 # Basic class for the settings dialog
 class ConcentricCirclesLinesDialog(QDialog):
@@ -33,12 +48,34 @@ class ConcentricCirclesLinesDialog(QDialog):
         self.spin_thickness.setMaximum(10)
         self.spin_thickness.setValue(2)
 
+        # Rotation of the lines
+        self.label_rotation = QLabel('Line Rotation (degrees):')
+        self.spin_rotation = QDoubleSpinBox()
+        self.spin_rotation.setMinimum(0)
+        self.spin_rotation.setMaximum(360)
+        self.spin_rotation.setValue(0)
+
+        # Number of animation frames, the lines turn by one line step over them (1 is a still image)
+        self.label_frames = QLabel('Animation Frames:')
+        self.spin_frames = QSpinBox()
+        self.spin_frames.setMinimum(1)
+        self.spin_frames.setMaximum(1000)
+        self.spin_frames.setValue(1)
+
         # Line and circle color selection
         self.label_color = QLabel('Line and Circle Color:')
         self.button_color = QPushButton('Choose Color')
         self.button_color.clicked.connect(self.choose_color)
         self.color = QColor(0, 0, 0)  # Default black color
 
+        # Checkbox for drawing shapes on a vector layer (a still image only, animation frames are painted)
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+        self.spin_frames.valueChanged.connect(self.update_vector)
+
+        # Preview of the active document
+        self.preview = PreviewPane(paint_concentric_circles_lines, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -51,44 +88,45 @@ class ConcentricCirclesLinesDialog(QDialog):
         layout.addWidget(self.spin_N)
         layout.addWidget(self.label_thickness)
         layout.addWidget(self.spin_thickness)
+        layout.addWidget(self.label_rotation)
+        layout.addWidget(self.spin_rotation)
+        layout.addWidget(self.label_frames)
+        layout.addWidget(self.spin_frames)
         layout.addWidget(self.label_color)
         layout.addWidget(self.button_color)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.spin_circle_distance, self.spin_N, self.spin_thickness,
+                        self.spin_rotation)
+        self.update_preview()
+
+    # Function to allow the vector layer only for a still image
+    def update_vector(self, frames):
+        self.checkbox_vector.setEnabled(frames == 1)
+        self.checkbox_vector.setToolTip('' if frames == 1 else 'Animation frames are painted on a paint layer.')
+
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color = color
+            self.update_preview()
 
-# Function to draw concentric circles and full-span lines
-def draw_concentric_circles_lines(circle_distance, N, line_thickness, color):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
-
-    # Create a new layer
-    new_layer = doc.createNode("Concentric Circles and Lines", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
-    doc.setActiveNode(new_layer)
-
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.spin_circle_distance.value(), self.spin_N.value(), self.spin_thickness.value(),
+                              self.color, self.spin_rotation.value()))
 
+# Function to paint the concentric circles (all of them, they cross any band top..bottom)
+def paint_clock_circles(painter, width, height, top, bottom, circle_distance, line_thickness, color):
     # Calculate the center of the document
     center_x = width / 2
     center_y = height / 2
 
-    # Create a QImage to draw on
-    image = QImage(width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
-
-    # Create a QPainter to draw on the QImage
-    painter = QPainter(image)
     pen = QPen(color)
     pen.setWidth(line_thickness)
     painter.setPen(pen)
@@ -99,12 +137,23 @@ def draw_concentric_circles_lines(circle_distance, N, line_thickness, color):
         painter.drawEllipse(QPointF(center_x, center_y), radius, radius)
         radius += circle_distance
 
+# Function to paint the lines through the center, turned by rotation degrees (all of them, they cross
+# any band top..bottom)
+def paint_clock_lines(painter, width, height, top, bottom, N, line_thickness, color, rotation=0):
+    # Calculate the center of the document
+    center_x = width / 2
+    center_y = height / 2
+
+    pen = QPen(color)
+    pen.setWidth(line_thickness)
+    painter.setPen(pen)
+
     # Draw lines from edge to edge through the center
     if N > 0:
         angle_step = 360 / N  # Step size for angle in degrees
 
         for i in range(N):
-            angle = i * angle_step
+            angle = rotation + i * angle_step
             radians = math.radians(angle)
 
             # Calculate the intersection points on the edges of the canvas
@@ -117,17 +166,27 @@ def draw_concentric_circles_lines(circle_distance, N, line_thickness, color):
             # Draw the line from one edge through the center to the opposite edge
             painter.drawLine(QPointF(x_start, y_start), QPointF(x_end, y_end))
 
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert to QByteArray
+# Function to paint the circles and lines (all of them, they cross any band top..bottom)
+def paint_concentric_circles_lines(painter, width, height, top, bottom, circle_distance, N, line_thickness, color,
+                                   rotation=0):
+    paint_clock_circles(painter, width, height, top, bottom, circle_distance, line_thickness, color)
+    paint_clock_lines(painter, width, height, top, bottom, N, line_thickness, color, rotation)
 
-    # Set the modified pixel data back to the layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
-
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+# Function to draw concentric circles and full-span lines
+@traced
+def draw_concentric_circles_lines(circle_distance, N, line_thickness, color, rotation=0, vector=False):
+    run_generator(paint_concentric_circles_lines, "Concentric Circles and Lines",
+                  (circle_distance, N, line_thickness, color, rotation), vector=vector)
+
+# Function to draw the clock as an animation: the lines turn by one line step over the frames (the last
+# frame leads back into the first), the circles are painted once for all frames
+@traced
+def draw_clock_animation(circle_distance, N, line_thickness, color, rotation, frames):
+    step = 360 / N if N > 0 else 0
+    parameters = {'circle_distance': circle_distance, 'N': N, 'line_thickness': line_thickness, 'color': color,
+                  'rotation': rotation}
+    sweep = {'rotation': (rotation, rotation + step * (frames - 1) / frames)}
+    draw_sequence(paint_clock_lines, frame_parameters(parameters, sweep, frames), static=paint_clock_circles)
 
 # Main function to run the dialog and draw concentric circles and full-span lines
 def main():
@@ -139,9 +198,16 @@ def main():
         N = dialog.spin_N.value()
         line_thickness = dialog.spin_thickness.value()
         color = dialog.color
+        rotation = dialog.spin_rotation.value()
+        frames = dialog.spin_frames.value()
+        vector = dialog.checkbox_vector.isChecked()
 
-        # Draw the concentric circles and lines based on the settings
-        draw_concentric_circles_lines(circle_distance, N, line_thickness, color)
+        # Draw the concentric circles and lines based on the settings, as an animated layer for more frames
+        if frames > 1:
+            draw_clock_animation(circle_distance, N, line_thickness, color, rotation, frames)
+        else:
+            draw_concentric_circles_lines(circle_distance, N, line_thickness, color, rotation, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
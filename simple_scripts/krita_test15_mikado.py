@@ -1,8 +1,26 @@
-import krita as k
-import random
+import os
+import sys
+import numpy as np
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QCheckBox, QPushButton, QColorDialog, QDialogButtonBox
-from PyQt5.QtGui import QPainter, QColor, QPen, QImage
-from PyQt5.QtCore import Qt, QPointF, QByteArray
+from PyQt5.QtGui import QColor, QPen
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.geometry import lines_from_arrays
+from render_core.streams import draw_chunked, new_seed, random_signs, MAX_SEED
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.trace import traced
+
+# Levels per color channel of the random color palette (6 levels give 216 colors)
+PALETTE_LEVELS = 6
 
 # Basic class for the settings dialog
 class MikadoDialog(QDialog):
@@ -16,7 +34,7 @@ class MikadoDialog(QDialog):
         self.label_N = QLabel('Number of Lines (N):')
         self.spin_N = QSpinBox()
         self.spin_N.setMinimum(10)
-        self.spin_N.setMaximum(2000)
+        self.spin_N.setMaximum(1000000)
         self.spin_N.setValue(200)
 
         # Lx and Ly input (length of lines)
@@ -59,6 +77,21 @@ class MikadoDialog(QDialog):
         self.button_color.clicked.connect(self.choose_color)
         self.color = QColor(0, 0, 0)  # Default black color
 
+        # Seed input (0 picks a new random seed every time)
+        self.label_seed = QLabel('Seed (0 = random):')
+        self.spin_seed = QSpinBox()
+        self.spin_seed.setMinimum(0)
+        self.spin_seed.setMaximum(MAX_SEED)
+        self.spin_seed.setValue(0)
+
+        # Checkbox for drawing shapes on a vector layer
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+
+        # Preview of the active document, a seed of 0 shows (and draws) preview_seed
+        self.preview_seed = new_seed()
+        self.preview = PreviewPane(paint_mikado_lines, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -78,82 +111,90 @@ class MikadoDialog(QDialog):
         layout.addWidget(self.spin_thickness)
         layout.addWidget(self.label_color)
         layout.addWidget(self.button_color)
+        layout.addWidget(self.label_seed)
+        layout.addWidget(self.spin_seed)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.spin_N, self.spin_Lx_min, self.spin_Lx_max, self.spin_Ly_min,
+                        self.spin_Ly_max, self.checkbox_random_color, self.spin_thickness, self.spin_seed)
+        self.update_preview()
+
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color = color
-
-# Function to draw random lines with positive or negative lengths
-def draw_mikado_lines(N, Lx_min, Lx_max, Ly_min, Ly_max, random_color, line_thickness, color):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
-
-    # Create a new layer
-    new_layer = doc.createNode("Mikado Lines", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
-    doc.setActiveNode(new_layer)
-
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
-
-    # Create a QImage to draw on
-    image = QImage(width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
-
-    # Create a QPainter to draw on the QImage
-    painter = QPainter(image)
+            self.update_preview()
+
+    # Function to get the seed of the drawing (0 in the spin box uses the preview seed)
+    def seed(self):
+        return self.spin_seed.value() or self.preview_seed
+
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.spin_N.value(), self.spin_Lx_min.value(), self.spin_Lx_max.value(),
+                              self.spin_Ly_min.value(), self.spin_Ly_max.value(), self.checkbox_random_color.isChecked(),
+                              self.spin_thickness.value(), self.color, self.seed()))
+
+# Function to generate count random lines: start points, end points and palette levels of their colors
+def generate_mikado_lines(rng, count, width, height, Lx_min, Lx_max, Ly_min, Ly_max, random_color):
+    # Random start points
+    x_start = rng.integers(0, width, size=count, endpoint=True)
+    y_start = rng.integers(0, height, size=count, endpoint=True)
+
+    # Random lengths with positive or negative values
+    Lx = rng.integers(Lx_min, Lx_max, size=count, endpoint=True) * random_signs(rng, count)
+    Ly = rng.integers(Ly_min, Ly_max, size=count, endpoint=True) * random_signs(rng, count)
+
+    # Palette levels of the colors, drawn last so the lines are the same with or without random colors
+    if random_color:
+        levels = rng.integers(0, PALETTE_LEVELS, size=(count, 3))
+    else:
+        levels = np.zeros((count, 3), dtype=int)
+    return x_start, y_start, x_start + Lx, y_start + Ly, levels
+
+# Function to paint the random lines on the canvas (all lines, they cross any band top..bottom)
+def paint_mikado_lines(painter, width, height, top, bottom, N, Lx_min, Lx_max, Ly_min, Ly_max, random_color,
+                       line_thickness, color, seed):
     pen = QPen(color)
     pen.setWidth(line_thickness)
     painter.setPen(pen)
 
-    # Draw N random lines
-    for _ in range(N):
-        # Generate random start point
-        x_start = random.randint(0, width)
-        y_start = random.randint(0, height)
-
-        # Generate random lengths with positive or negative values
-        Lx = random.randint(Lx_min, Lx_max)
-        Ly = random.randint(Ly_min, Ly_max)
-
-        # Determine if the length should be negative
-        if random.randint(0, 1) == 1:
-            Lx = -Lx
-        if random.randint(0, 1) == 1:
-            Ly = -Ly
-
-        # Generate random end point
-        x_end = x_start + Lx
-        y_end = y_start + Ly
-
-        # Randomize color if needed
-        if random_color:
-            line_color = QColor(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-            pen.setColor(line_color)
+    # Generate all N random lines at once
+    x_start, y_start, x_end, y_end, levels = draw_chunked(
+        seed, 0, N,
+        lambda rng, count: generate_mikado_lines(rng, count, width, height, Lx_min, Lx_max, Ly_min, Ly_max, random_color))
+
+    if not random_color:
+        # One drawLines call for all lines
+        painter.drawLines(lines_from_arrays(x_start, y_start, x_end, y_end))
+    else:
+        # Random colors come from a palette of PALETTE_LEVELS^3 colors, so lines sharing
+        # a color are drawn together with one pen change and one drawLines call
+        palette_index = (levels[:, 0] * PALETTE_LEVELS + levels[:, 1]) * PALETTE_LEVELS + levels[:, 2]
+        order = np.argsort(palette_index, kind='stable')
+        indices, group_starts = np.unique(palette_index[order], return_index=True)
+        group_ends = np.append(group_starts[1:], N)
+
+        for index, start, end in zip(indices, group_starts, group_ends):
+            group = order[start:end]
+            red, green, blue = levels[group[0]] * 255 // (PALETTE_LEVELS - 1)
+            pen.setColor(QColor(int(red), int(green), int(blue)))
             painter.setPen(pen)
+            painter.drawLines(lines_from_arrays(x_start[group], y_start[group], x_end[group], y_end[group]))
 
-        # Draw the line
-        painter.drawLine(QPointF(x_start, y_start), QPointF(x_end, y_end))
-
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert to QByteArray
-
-    # Set the modified pixel data back to the layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
+# Function to draw random lines with positive or negative lengths, the same seed gives the same lines
+@traced
+def draw_mikado_lines(N, Lx_min, Lx_max, Ly_min, Ly_max, random_color, line_thickness, color, seed=None, vector=False):
+    if seed is None:
+        seed = new_seed()
 
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+    run_generator(paint_mikado_lines, "Mikado Lines",
+                  (N, Lx_min, Lx_max, Ly_min, Ly_max, random_color, line_thickness, color, seed), vector=vector)
 
 # Main function to run the dialog and draw random lines
 def main():
@@ -169,9 +210,12 @@ def main():
         random_color = dialog.checkbox_random_color.isChecked()
         line_thickness = dialog.spin_thickness.value()
         color = dialog.color
+        seed = dialog.seed()  # 0 uses the random seed of the preview
+        vector = dialog.checkbox_vector.isChecked()
 
         # Draw the random lines based on the settings
-        draw_mikado_lines(N, Lx_min, Lx_max, Ly_min, Ly_max, random_color, line_thickness, color)
+        draw_mikado_lines(N, Lx_min, Lx_max, Ly_min, Ly_max, random_color, line_thickness, color, seed, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
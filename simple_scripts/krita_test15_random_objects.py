@@ -1,8 +1,23 @@
-import krita as k
-import random
+import os
+import sys
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QCheckBox, QPushButton, QColorDialog, QDialogButtonBox, QComboBox
-from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QImage
-from PyQt5.QtCore import Qt, QRectF, QPointF, QByteArray
+from PyQt5.QtGui import QColor, QPen, QBrush
+from PyQt5.QtCore import Qt, QRectF, QPointF
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.bands import band_rows
+from render_core.streams import substream, new_seed, random_colors, MAX_SEED
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.trace import traced
 
 # Basic class for the settings dialog
 class RandomShapesDialog(QDialog):
@@ -58,6 +73,21 @@ class RandomShapesDialog(QDialog):
         self.button_color.clicked.connect(self.choose_color)
         self.color = QColor(0, 0, 0)  # Default black color
 
+        # Seed input (0 picks a new random seed every time)
+        self.label_seed = QLabel('Seed (0 = random):')
+        self.spin_seed = QSpinBox()
+        self.spin_seed.setMinimum(0)
+        self.spin_seed.setMaximum(MAX_SEED)
+        self.spin_seed.setValue(0)
+
+        # Checkbox for drawing shapes on a vector layer
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+
+        # Preview of the active document, a seed of 0 shows (and draws) preview_seed
+        self.preview_seed = new_seed()
+        self.preview = PreviewPane(paint_random_shapes, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -78,39 +108,40 @@ class RandomShapesDialog(QDialog):
         layout.addWidget(self.spin_line_thickness)
         layout.addWidget(self.label_color)
         layout.addWidget(self.button_color)
+        layout.addWidget(self.label_seed)
+        layout.addWidget(self.spin_seed)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.combo_shape, self.spin_size_from, self.spin_size_to,
+                        self.spin_distance, self.checkbox_random_color, self.checkbox_fill, self.spin_line_thickness,
+                        self.spin_seed)
+        self.update_preview()
+
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color = color
-
-# Function to draw random shapes
-def draw_random_shapes(shape, size_from, size_to, distance, random_color, fill, line_thickness, color):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
-
-    # Create a new layer
-    new_layer = doc.createNode("Random Shapes", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
-    doc.setActiveNode(new_layer)
-
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
-
-    # Create a QImage to draw on
-    image = QImage(width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
-
-    # Create a QPainter to draw on the QImage
-    painter = QPainter(image)
-
+            self.update_preview()
+
+    # Function to get the seed of the drawing (0 in the spin box uses the preview seed)
+    def seed(self):
+        return self.spin_seed.value() or self.preview_seed
+
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.combo_shape.currentText(), self.spin_size_from.value(), self.spin_size_to.value(),
+                              self.spin_distance.value(), self.checkbox_random_color.isChecked(),
+                              self.checkbox_fill.isChecked(), self.spin_line_thickness.value(), self.color,
+                              self.seed()))
+
+# Function to paint the rows of random shapes that reach into the rows top..bottom of the canvas
+def paint_random_shapes(painter, width, height, top, bottom, shape, size_from, size_to, distance, random_color, fill,
+                        line_thickness, color, seed):
     if fill:
         painter.setPen(Qt.NoPen)
     else:
@@ -118,14 +149,24 @@ def draw_random_shapes(shape, size_from, size_to, distance, random_color, fill,
         pen.setWidth(line_thickness)
         painter.setPen(pen)
 
-    for x in range(0, width, distance):
-        for y in range(0, height, distance):
+    columns = range(0, width, distance)
+    reach = size_to / 2 + line_thickness + 1  # How far a shape reaches above and below its center
+    for row in band_rows(distance, len(range(0, height, distance)), top, bottom, reach, reach):
+        y = row * distance
+
+        # Sizes and colors of the row come from the row's own random stream, the same in every band
+        rng = substream(seed, row)
+        sizes = rng.integers(size_from, size_to, size=len(columns), endpoint=True)
+        if random_color:
+            colors = random_colors(rng, len(columns))
+
+        for column, x in enumerate(columns):
             # Determine size of the shape
-            size = random.randint(size_from, size_to)
+            size = int(sizes[column])
 
             # Randomize color if needed
             if random_color:
-                shape_color = QColor(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
+                shape_color = QColor(*colors[column].tolist())
             else:
                 shape_color = color
 
@@ -141,17 +182,14 @@ def draw_random_shapes(shape, size_from, size_to, distance, random_color, fill,
             elif shape == 'Square':
                 painter.drawRect(QRectF(x - size / 2, y - size / 2, size, size))
 
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert to QByteArray
-
-    # Set the modified pixel data back to the layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
+# Function to draw random shapes, the same seed gives the same shapes
+@traced
+def draw_random_shapes(shape, size_from, size_to, distance, random_color, fill, line_thickness, color, seed=None, vector=False):
+    if seed is None:
+        seed = new_seed()
 
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+    run_generator(paint_random_shapes, "Random Shapes",
+                  (shape, size_from, size_to, distance, random_color, fill, line_thickness, color, seed), vector=vector)
 
 # Main function to run the dialog and draw random shapes
 def main():
@@ -167,9 +205,12 @@ def main():
         fill = dialog.checkbox_fill.isChecked()
         line_thickness = dialog.spin_line_thickness.value()
         color = dialog.color
+        seed = dialog.seed()  # 0 uses the random seed of the preview
+        vector = dialog.checkbox_vector.isChecked()
 
         # Draw the random shapes based on the settings
-        draw_random_shapes(shape, size_from, size_to, distance, random_color, fill, line_thickness, color)
+        draw_random_shapes(shape, size_from, size_to, distance, random_color, fill, line_thickness, color, seed, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,33 @@
-import krita as k
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QPushButton, QColorDialog, QDialogButtonBox
-from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QImage
-from PyQt5.QtCore import QPointF, QByteArray, Qt
+import os
+import sys
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QPushButton, QColorDialog, QDialogButtonBox, QCheckBox
+from PyQt5.QtGui import QColor, QPen, QBrush, QPainter
+from PyQt5.QtCore import QPointF
 import math
+from functools import lru_cache
+import numpy as np
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.vector import is_vector_painter
+from render_core.bands import band_rows
+from render_core.stamps import rasterize_coverage, compose_grid, color_pixels, draw_pixels
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.trace import traced
+
+# Transparent pixels around a hexagon stamp for the pen and antialiasing
+STAMP_MARGIN = 2
+
+# Widest stamped hexagons (in pixels), Qt fills fewer larger polygons faster than NumPy composes their pixels
+STAMP_MAX_WIDTH = 32
 
 # Basic class for the settings dialog
 class SettingsDialog(QDialog):
@@ -32,6 +57,13 @@ class SettingsDialog(QDialog):
         self.button_color.clicked.connect(self.choose_color)
         self.color = QColor(0, 0, 0)  # Default black color
 
+        # Checkbox for drawing shapes on a vector layer
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+
+        # Preview of the active document
+        self.preview = PreviewPane(paint_hexagons, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -42,15 +74,26 @@ class SettingsDialog(QDialog):
         layout.addWidget(self.spin_width)
         layout.addWidget(self.label_spacing)
         layout.addWidget(self.button_color)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.spin_width, self.spin_spacing)
+        self.update_preview()
+
     # Function to choose the color for hexagons
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color = color
+            self.update_preview()
+
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.spin_width.value(), self.color, self.spin_spacing.value()))
 
 # Function to calculate the hexagon points
 def create_hexagon(center, size):
@@ -63,66 +106,111 @@ def create_hexagon(center, size):
         points.append(QPointF(x, y))
     return points
 
-# Function to draw hexagons on the canvas
-def draw_hexagons(hex_width, hex_color, spacing):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
-
-    # Create a new layer
-    new_layer = doc.createNode("Hexagons", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
-
-    # Set the new layer as active
-    doc.setActiveNode(new_layer)
+# Function to get the coverage stamp of a hexagon from its vertices, relative to the top-left corner of the stamp
+@lru_cache(maxsize=1024)
+def hexagon_stamp(vertices, width, height, render_hints):
+    points = [QPointF(x, y) for x, y in vertices]
+    return rasterize_coverage(width, height, lambda painter: painter.drawPolygon(points),
+                              QPainter.RenderHints(render_hints))
+
+# Function to get the stamps of the hexagons of a row at x_positions (column_step apart), returns
+# (stamps, indices, left, top): indices selects the stamp of every hexagon, the first one is at
+# (left, top) of the canvas. The vertices are computed like create_hexagon does on the canvas and
+# moved by whole pixels. Their rounding depends on the place (a vertex 12.500000000000004 right of
+# the center is 14.500000000000004 at x 2, but 1039.5 at x 1027), which moves aliased edges by a
+# pixel, so hexagons share a stamp only when their moved vertices are the same
+def hexagon_row_stamps(hex_width, x_positions, y_position, render_hints):
+    hex_height = math.sqrt(3) * hex_width / 2
+    size = hex_width / 2
+    angles = [math.radians(60 * i) for i in range(6)]
+    lefts = np.floor(x_positions) - STAMP_MARGIN
+    top = math.floor(y_position) - STAMP_MARGIN
+
+    # The vertices of every hexagon, in the order of create_hexagon's floating-point operations
+    center_y = y_position + hex_height / 2
+    vertices_x = (x_positions + size)[:, np.newaxis] + np.array([size * math.cos(angle) for angle in angles])
+    vertices_x -= lefts[:, np.newaxis]
+    vertices_y = [center_y + size * math.sin(angle) - top for angle in angles]
+
+    # Neighbouring hexagons mostly round alike, only the first one of every run is looked up
+    starts = [0] + (np.flatnonzero((vertices_x[1:] != vertices_x[:-1]).any(axis=1)) + 1).tolist()
+    numbers = {}
+    firsts = []
+    run_numbers = []
+    for start in starts:
+        key = vertices_x[start].tobytes()
+        if key not in numbers:
+            numbers[key] = len(firsts)
+            firsts.append(start)
+        run_numbers.append(numbers[key])
+    indices = np.repeat(run_numbers, np.diff(starts + [len(vertices_x)]))
+
+    width = math.ceil(x_positions[0] + hex_width) - int(lefts[0]) + STAMP_MARGIN
+    height = math.ceil(y_position + hex_height) - top + STAMP_MARGIN
+    stamps = np.stack([hexagon_stamp(tuple(zip(vertices_x[first].tolist(), vertices_y)), width, height, render_hints)
+                       for first in firsts])
+    return stamps, indices[np.newaxis], int(lefts[0]), top
+
+# Function to paint the hexagons that reach into the area left..right, top..bottom of the canvas
+def paint_hexagons(painter, width, height, top, bottom, hex_width, hex_color, spacing, left=0, right=None):
+    if right is None:
+        right = width
 
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
-
-    # Create a QImage for drawing
-    image = QImage(width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
+    # Calculate the height of a hexagon
+    hex_height = math.sqrt(3) * hex_width / 2  # Height of a regular hexagon
 
-    # Create QPainter for drawing on the QImage
-    painter = QPainter(image)
+    # Small opaque hexagons are stamped; translucent ones (their outline is drawn over their fill,
+    # which a coverage stamp cannot show) and hexagons for a vector layer are drawn as shapes
+    stamped = (hex_width <= STAMP_MAX_WIDTH and QColor(hex_color).alpha() == 255
+               and not is_vector_painter(painter))
     painter.setPen(QPen(hex_color))  # Set the pen with hexagon color
     painter.setBrush(QBrush(hex_color))  # Set the brush with hexagon color
 
-    # Calculate the height of a hexagon
-    hex_height = math.sqrt(3) * hex_width / 2  # Height of a regular hexagon
-
-    # Start drawing hexagons row by row
-    y_position = 0
-    row = 0
-    while y_position < height:
-        x_position = 0 if row % 2 == 0 else hex_width / 2  # Offset for even rows
-        while x_position < width:
+    # Draw the hexagons row by row, a row covers y_position .. y_position + hex_height (plus the pen)
+    row_step = hex_height + spacing
+    column_step = hex_width + spacing
+    for row in band_rows(row_step, math.ceil(height / row_step), top, bottom, 1, hex_height + 1):
+        y_position = row * row_step
+        row_start = 0 if row % 2 == 0 else hex_width / 2  # Offset for even rows
+        # Hexagon c of the row covers row_start + c * column_step .. + hex_width (plus the pen)
+        columns = band_rows(column_step, math.ceil((width - row_start) / column_step),
+                            left - row_start, right - row_start, 1, hex_width + 1)
+        if not columns:
+            continue
+
+        shape_columns = columns
+        if stamped:
+            # The hexagons of a row are stamps a whole number of pixels apart, compose the row and draw it at once
+            x_positions = row_start + np.arange(columns.start, columns.stop) * column_step
+            stamps, indices, stamp_left, stamp_top = hexagon_row_stamps(hex_width, x_positions, y_position,
+                                                                        int(painter.renderHints()))
+
+            # Hexagons whose stamp reaches over the canvas edge are clipped by it, which moves their
+            # aliased edges: they are drawn as shapes
+            stamp_height, stamp_width = stamps.shape[1:]
+            stamp_lefts = stamp_left + np.arange(len(columns)) * column_step
+            inside = (stamp_lefts >= 0) & (stamp_lefts + stamp_width <= width)
+            if stamp_top < 0 or stamp_top + stamp_height > height:
+                inside[:] = False
+            inside_columns = np.flatnonzero(inside)
+            if inside_columns.size:
+                first, last = inside_columns[0], inside_columns[-1] + 1
+                coverage = compose_grid(stamps, indices[:, first:last], column_step, stamp_height)
+                draw_pixels(painter, int(stamp_lefts[first]), stamp_top, color_pixels(coverage, hex_color))
+            shape_columns = [column for column, fits in zip(columns, inside) if not fits]
+
+        for column in shape_columns:
+            x_position = row_start + column * column_step
             # Calculate the center of the hexagon
             center = QPointF(x_position + hex_width / 2, y_position + hex_height / 2)
-            # Get the hexagon points
-            hexagon_points = create_hexagon(center, hex_width / 2)
             # Draw the hexagon
-            painter.drawPolygon(hexagon_points)
-            x_position += hex_width + spacing  # Move to the next hexagon in the row
-
-        y_position += hex_height + spacing  # Move to the next row
-        row += 1
+            painter.drawPolygon(create_hexagon(center, hex_width / 2))
 
-    # Release the painter to free memory
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert the image data to QByteArray
-
-    # Set the modified pixel data back to the new layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
-
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+# Function to draw hexagons on the canvas
+@traced
+def draw_hexagons(hex_width, hex_color, spacing, vector=False):
+    # Hexagons cover the whole canvas, each tile stamps its own hexagons when it is rasterized
+    run_generator(paint_hexagons, "Hexagons", (hex_width, hex_color, spacing), vector=vector, per_tile=True)
 
 # Main function to run the dialog and draw hexagons
 def main():
@@ -132,9 +220,11 @@ def main():
         hex_width = dialog.spin_width.value()
         hex_color = dialog.color
         spacing = dialog.spin_spacing.value()
+        vector = dialog.checkbox_vector.isChecked()
 
         # Draw hexagons based on user settings
-        draw_hexagons(hex_width, hex_color, spacing)
+        draw_hexagons(hex_width, hex_color, spacing, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,26 @@
-import krita as k
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox, QSpinBox, QPushButton, QColorDialog, QFontDialog, QDialogButtonBox
-from PyQt5.QtGui import QPainter, QColor, QPen, QFont, QImage
-from PyQt5.QtCore import QByteArray, Qt
-import random
+import os
+import sys
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox, QSpinBox, QPushButton, QColorDialog, QFontDialog, QDialogButtonBox, QCheckBox
+from PyQt5.QtGui import QColor, QFont, QPen
 import string
+import numpy as np
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.vector import is_vector_painter
+from render_core.bands import band_rows
+from render_core.glyphs import glyph_atlas, draw_glyph_grid
+from render_core.streams import substream, new_seed, MAX_SEED
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.trace import traced
 
 print("random chars - 2409")
 
@@ -53,6 +70,21 @@ class SettingsDialog(QDialog):
         self.spin_line_spacing.setMaximum(100)
         self.spin_line_spacing.setValue(10)
 
+        # Seed input (0 picks a new random seed every time)
+        self.label_seed = QLabel('Seed (0 = random):')
+        self.spin_seed = QSpinBox()
+        self.spin_seed.setMinimum(0)
+        self.spin_seed.setMaximum(MAX_SEED)
+        self.spin_seed.setValue(0)
+
+        # Checkbox for drawing shapes on a vector layer
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+
+        # Preview of the active document, a seed of 0 shows (and draws) preview_seed
+        self.preview_seed = new_seed()
+        self.preview = PreviewPane(paint_random_characters, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -71,84 +103,97 @@ class SettingsDialog(QDialog):
         layout.addWidget(self.spin_spacing)
         layout.addWidget(self.label_line_spacing)
         layout.addWidget(self.spin_line_spacing)
+        layout.addWidget(self.label_seed)
+        layout.addWidget(self.spin_seed)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.combo_char_type, self.spin_size, self.spin_spacing,
+                        self.spin_line_spacing, self.spin_seed)
+        self.update_preview()
+
     # Function to choose the font
     def choose_font(self):
         font, ok = QFontDialog.getFont(self.font)
         if ok:
             self.font = font
+            self.update_preview()
 
     # Function to choose the color for characters
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color = color
-
-# Function to generate random characters based on the selected type
-def generate_random_character(char_type):
-    if char_type == 'Binary (0, 1)':
-        return random.choice(['0', '1'])
-    elif char_type == 'Hexadecimal (0-F)':
-        return random.choice('0123456789ABCDEF')
-    elif char_type == 'Alphanumeric (A-z, 0-9)':
-        return random.choice(string.ascii_letters + string.digits)
-
-# Function to draw random characters on the canvas
-def draw_random_characters(char_type, font, color, char_size, char_spacing, line_spacing):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
-
-    # Create a new layer
-    new_layer = doc.createNode("Random Characters", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
-
-    # Set the new layer as active
-    doc.setActiveNode(new_layer)
-
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
-
-    # Create a QImage for drawing
-    image = QImage(width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
-
-    # Create QPainter for drawing on the QImage
-    painter = QPainter(image)
-    painter.setFont(font)  # Set the chosen font
-
-    # Set the pen for drawing characters
-    pen = QPen(color)
-    painter.setPen(pen)
-
-    # Start drawing characters row by row
-    y_position = 0
-    while y_position < height:
-        x_position = 0
-        while x_position < width:
-            random_char = generate_random_character(char_type)  # Generate a random character
-            painter.drawText(x_position, y_position, random_char)  # Draw the character
-            x_position += char_size + char_spacing  # Move to the next position horizontally
-        y_position += char_size + line_spacing  # Move to the next line
-
-    # Release the painter to free memory
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert the image data to QByteArray
-
-    # Set the modified pixel data back to the new layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
-
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+            self.update_preview()
+
+    # Function to get the seed of the drawing (0 in the spin box uses the preview seed)
+    def seed(self):
+        return self.spin_seed.value() or self.preview_seed
+
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.combo_char_type.currentText(), self.font, self.color, self.spin_size.value(),
+                              self.spin_spacing.value(), self.spin_line_spacing.value(), self.seed()))
+
+# Characters used by each character type of the dialog
+CHARACTER_SETS = {
+    'Binary (0, 1)': '01',
+    'Hexadecimal (0-F)': '0123456789ABCDEF',
+    'Alphanumeric (A-z, 0-9)': string.ascii_letters + string.digits,
+}
+
+# Function to generate count random characters based on the selected type (as indices into its character set)
+def generate_random_characters(char_type, rng, count):
+    return rng.integers(0, len(CHARACTER_SETS[char_type]), size=count)
+
+# Function to paint the random characters that reach into the area left..right, top..bottom of the canvas
+def paint_random_characters(painter, width, height, top, bottom, char_type, font, color, char_size, char_spacing,
+                            line_spacing, seed, left=0, right=None):
+    if right is None:
+        right = width
+
+    # Every character is rasterized once into the atlas, the grid is composed from it
+    atlas = glyph_atlas(font, CHARACTER_SETS[char_type])
+
+    # Rows of characters, row r has its baseline at r * (char_size + line_spacing), column c starts
+    # at c * (char_size + char_spacing); only the cells whose glyphs reach into the area are drawn
+    row_step = char_size + line_spacing
+    column_step = char_size + char_spacing
+    column_count = len(range(0, width, column_step))
+    rows = band_rows(row_step, len(range(0, height, row_step)), top, bottom,
+                     -atlas.origin_y, atlas.origin_y + atlas.height)
+    columns = band_rows(column_step, column_count, left, right, -atlas.origin_x, atlas.origin_x + atlas.width)
+    if not rows or not columns:
+        return
+
+    # Characters of a row come from the row's own random stream, the same in every band or tile
+    indices = np.array([generate_random_characters(char_type, substream(seed, row), column_count)[columns.start:columns.stop]
+                        for row in rows])
+    if is_vector_painter(painter) or QColor(color).alpha() < 255:
+        # A vector layer gets every character as a text shape; translucent characters are drawn as text
+        # too, the atlas composes the coverage of an opaque color
+        characters = CHARACTER_SETS[char_type]
+        painter.setFont(font)
+        painter.setPen(QPen(color))
+        for row, row_indices in zip(rows, indices):
+            for column, index in zip(columns, row_indices):
+                painter.drawText(column * column_step, row * row_step, characters[index])
+        return
+    draw_glyph_grid(painter, atlas, color, indices, rows.start, columns.start, column_step, row_step)
+
+# Function to draw random characters on the canvas, the same seed gives the same characters
+@traced
+def draw_random_characters(char_type, font, color, char_size, char_spacing, line_spacing, seed=None, vector=False):
+    if seed is None:
+        seed = new_seed()
+
+    # Characters cover the whole canvas, each tile composes its own characters when it is rasterized
+    run_generator(paint_random_characters, "Random Characters",
+                  (char_type, font, color, char_size, char_spacing, line_spacing, seed), vector=vector, per_tile=True)
 
 # Main function to run the dialog and draw random characters
 def main():
@@ -161,9 +206,12 @@ def main():
         char_size = dialog.spin_size.value()
         char_spacing = dialog.spin_spacing.value()
         line_spacing = dialog.spin_line_spacing.value()
+        seed = dialog.seed()  # 0 uses the random seed of the preview
+        vector = dialog.checkbox_vector.isChecked()
 
         # Draw random characters based on user settings
-        draw_random_characters(char_type, font, color, char_size, char_spacing, line_spacing)
+        draw_random_characters(char_type, font, color, char_size, char_spacing, line_spacing, seed, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
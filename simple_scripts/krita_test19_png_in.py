@@ -1,22 +1,48 @@
-import krita as k
 import os
 import sys
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox, QSpinBox, QPushButton, QDialogButtonBox
-from PyQt5.QtGui import QPainter, QImage
-from PyQt5.QtCore import QByteArray, Qt
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox, QSpinBox, QDialogButtonBox, QCheckBox
+from PyQt5.QtGui import QIcon, QPixmap
+from PyQt5.QtCore import QRect, QSize
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.images import image_size, visible_region, release_visible_region, draw_zoomed
+from render_core.atlas import image_atlas, release_image_atlas, atlas_manifest, write_manifest
+from render_core.thumbnails import ImageIndex, ThumbnailLoader, THUMBNAIL_SIZE
+from render_core.trace import stage, traced
 
 # Basic class for the settings dialog
 class ImageSelectionDialog(QDialog):
-    def __init__(self, image_files):
+    def __init__(self, image_index, image_files):
         super().__init__()
 
         self.setWindowTitle('Select an Image, Position and Zoom')
         layout = QVBoxLayout()
 
-        # Dropdown for image file selection
+        # Dropdown for image file selection: file name and dimensions, the full path as item data
         self.label_image = QLabel('Select Image:')
         self.combo_image = QComboBox()
-        self.combo_image.addItems(image_files)
+        self.combo_image.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.image_rows = {}
+        for image_file in image_files:
+            entry = image_index.entries[image_file]
+            self.image_rows[image_file] = self.combo_image.count()
+            self.combo_image.addItem(f"{image_file} ({entry['width']}x{entry['height']})",
+                                     image_index.image_path(image_file))
+
+        # Thumbnails are read or made in the background and appear in the dropdown when ready
+        self.thumbnail_loader = ThumbnailLoader(image_index, self)
+        self.thumbnail_loader.ready.connect(self.show_thumbnail)
+        self.thumbnail_loader.request(image_files)
+        self.finished.connect(self.thumbnail_loader.stop)
 
         # X Position for the image
         self.label_x = QLabel('X Position (px):')
@@ -39,6 +65,15 @@ class ImageSelectionDialog(QDialog):
         self.spin_zoom.setMaximum(100)
         self.spin_zoom.setValue(1)
 
+        # Batch import: all images of the directory packed into one layer (position and zoom are not used)
+        self.checkbox_atlas = QCheckBox('Import all images as an atlas')
+        self.checkbox_atlas.setChecked(False)  # Default is the selected image only
+        self.label_padding = QLabel('Atlas Padding (px):')
+        self.spin_padding = QSpinBox()
+        self.spin_padding.setMinimum(0)
+        self.spin_padding.setMaximum(100)
+        self.spin_padding.setValue(2)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -53,64 +88,101 @@ class ImageSelectionDialog(QDialog):
         layout.addWidget(self.spin_y)
         layout.addWidget(self.label_zoom)
         layout.addWidget(self.spin_zoom)
+        layout.addWidget(self.checkbox_atlas)
+        layout.addWidget(self.label_padding)
+        layout.addWidget(self.spin_padding)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
-# Function to get all image files (PNG, JPG, JPEG) from the directory
-def get_image_files(directory):
-    return [f for f in os.listdir(directory) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-
-# Function to load and draw the selected image at the specified position with zoom
-def draw_image(selected_image, x, y, zoom_factor):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
+    # Function to show a finished thumbnail as the icon of its image
+    def show_thumbnail(self, image_file, thumbnail):
+        self.combo_image.setItemIcon(self.image_rows[image_file], QIcon(QPixmap.fromImage(thumbnail)))
 
-    # Create a new layer
-    new_layer = doc.createNode("Imported Image", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
+# Function to get all image files (PNG, JPG, JPEG) from the directory, from its index updated for the
+# files added, changed or removed since the last run
+def get_image_files(image_index):
+    return image_index.update()
 
-    # Set the new layer as active
-    doc.setActiveNode(new_layer)
+# Function to paint the selected image at the specified position with zoom (the part of it in the area
+# left..right, top..bottom)
+def paint_image(painter, width, height, top, bottom, selected_image, x, y, zoom_factor, left=0, right=None):
+    if right is None:
+        right = width
 
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
-
-    # Create a QImage for drawing
-    image = QImage(width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
-
-    # Create QPainter for drawing on the QImage
-    painter = QPainter(image)
-
-    # Load the selected image using its full path
+    # Only the part of the image that lands on the canvas is decoded, once for all tiles
     img_path = selected_image
-    imported_image = QImage(img_path)
-
-    # Calculate the new size based on the zoom factor (no filtering, sharp pixels)
-    new_width = imported_image.width() * zoom_factor
-    new_height = imported_image.height() * zoom_factor
-    zoomed_image = imported_image.scaled(new_width, new_height, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+    with stage('decode'):
+        source_rect, region = visible_region(img_path, x, y, zoom_factor, width, height)
+    if region is None:
+        return
+
+    # Draw the region where it lies in the zoomed image at the specified position (x, y),
+    # enlarged straight into the tile (no filtering, sharp pixels)
+    region_x = x + source_rect.x() * zoom_factor
+    region_y = y + source_rect.y() * zoom_factor
+    drawn = QRect(region_x, region_y, region.width() * zoom_factor, region.height() * zoom_factor)
+    if drawn.intersects(QRect(left, top, right - left, bottom - top)):
+        with stage('zoom'):
+            draw_zoomed(painter, region_x, region_y, region, zoom_factor)
+
+# Function to get the canvas area covered by the selected image at the specified position with zoom
+def image_area(selected_image, x, y, zoom_factor, width, height):
+    size = image_size(selected_image)
+    return QRect(x, y, size.width() * zoom_factor, size.height() * zoom_factor).intersected(QRect(0, 0, width, height))
 
-    # Draw the image at the specified position (x, y)
-    painter.drawImage(x, y, zoomed_image)
-
-    # Release the painter to free memory
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert the image data to QByteArray
-
-    # Set the modified pixel data back to the new layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
+# Function to load and draw the selected image at the specified position with zoom
+@traced
+def draw_image(selected_image, x, y, zoom_factor):
+    # Each tile enlarges its part of the image; the image file can change under the same name,
+    # so its layer is not cached
+    try:
+        run_generator(paint_image, "Imported Image", (selected_image, x, y, zoom_factor), per_tile=True, cache=False,
+                      painted=lambda width, height: image_area(selected_image, x, y, zoom_factor, width, height))
+    finally:
+        release_visible_region()
+
+# Function to paint the atlas of the images packed into the canvas (the part of it in the area
+# left..right, top..bottom)
+def paint_atlas(painter, width, height, top, bottom, image_paths, image_sizes, padding, left=0, right=None):
+    if right is None:
+        right = width
+
+    # The images are packed and decoded into one atlas image once for all tiles
+    with stage('decode'):
+        rects, atlas = image_atlas(image_paths, image_sizes, width, height, padding)
+    if atlas.rect().intersects(QRect(left, top, right - left, bottom - top)):
+        with stage('zoom'):
+            draw_zoomed(painter, 0, 0, atlas, 1)
+
+# Function to import all images of the directory into one layer, packed like a sprite atlas, and write
+# the rect of every image to a JSON manifest (atlas.json in the directory by default)
+@traced
+def draw_atlas(image_directory, padding, manifest=None):
+    image_index = ImageIndex(image_directory)
+    image_files = get_image_files(image_index)
+    if not image_files:
+        raise Exception(f"No image files found in the directory: {image_directory}")
+    if manifest is None:
+        manifest = os.path.join(image_directory, 'atlas.json')
+
+    # The sizes come from the index, the images are packed before any of them is decoded
+    image_paths = tuple(image_index.image_path(image_file) for image_file in image_files)
+    image_sizes = tuple((image_index.entries[image_file]['width'], image_index.entries[image_file]['height'])
+                        for image_file in image_files)
+
+    # Called once with the document size: the atlas covers the top left of the canvas
+    def atlas_area(width, height):
+        with stage('decode'):
+            rects, atlas = image_atlas(image_paths, image_sizes, width, height, padding)
+        write_manifest(manifest, atlas_manifest(image_files, rects, atlas.size(), padding, "Image Atlas"))
+        return atlas.rect()
 
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+    try:
+        run_generator(paint_atlas, "Image Atlas", (image_paths, image_sizes, padding), per_tile=True, cache=False,
+                      painted=atlas_area)
+    finally:
+        release_image_atlas()
 
 # Main function to run the dialog and load an image
 def main():
@@ -122,19 +194,25 @@ def main():
         script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
 
     print(f"Looking for image files in: {script_directory}")  # Print the script directory
-    image_files = get_image_files(script_directory)
+    image_index = ImageIndex(script_directory)
+    image_files = get_image_files(image_index)
 
     if not image_files:
         raise Exception(f"No image files found in the script's directory: {script_directory}")
 
-    # Add full paths to the image files for easier loading
-    image_files_with_paths = [os.path.join(script_directory, f) for f in image_files]
-
     # Open dialog for image selection and position input
-    dialog = ImageSelectionDialog(image_files_with_paths)
-    if dialog.exec_() == QDialog.Accepted:
-        # Get the selected image, position and zoom from the user
-        selected_image = dialog.combo_image.currentText()
+    dialog = ImageSelectionDialog(image_index, image_files)
+    accepted = dialog.exec_() == QDialog.Accepted
+
+    # Keep the thumbnails made while the dialog was open for the next run
+    image_index.save()
+
+    if accepted and dialog.checkbox_atlas.isChecked():
+        # Import all images of the directory into one atlas layer
+        draw_atlas(script_directory, dialog.spin_padding.value())
+    elif accepted:
+        # Get the selected image (its full path), position and zoom from the user
+        selected_image = dialog.combo_image.currentData()
         x = dialog.spin_x.value()
         y = dialog.spin_y.value()
         zoom_factor = dialog.spin_zoom.value()
@@ -143,4 +221,5 @@ def main():
         draw_image(selected_image, x, y, zoom_factor)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
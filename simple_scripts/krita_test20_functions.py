@@ -1,8 +1,23 @@
-import krita as k
-import math
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QDoubleSpinBox, QComboBox, QPushButton, QDialogButtonBox, QColorDialog, QFrame
-from PyQt5.QtGui import QPainter, QColor, QPen, QImage
-from PyQt5.QtCore import Qt, QPointF, QByteArray
+import os
+import sys
+import numpy as np
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QDoubleSpinBox, QComboBox, QPushButton, QDialogButtonBox, QColorDialog, QFrame, QCheckBox
+from PyQt5.QtGui import QColor, QPen
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.functions import FUNCTIONS, evaluate_functions, x_values
+from render_core.geometry import polygon_from_arrays
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.trace import traced
 
 # Basic class for the settings dialog
 class FunctionDialog(QDialog):
@@ -13,13 +28,10 @@ class FunctionDialog(QDialog):
         layout = QVBoxLayout()
 
         # Function selection
-        self.label_function = QLabel('Select Function:')
+        self.label_function = QLabel('Select Function (or type a formula of x, x0, A, B, C):')
         self.combo_function = QComboBox()
-        self.combo_function.addItems([
-            'y = A*sin((x+x0)/B) + C*cos((x+x0)*A)', 
-            'y = B*sin((x+x0)/A) + C*cos((x+x0)/A)', 
-            'y = A*sin((x+x0)*B) + A*C'
-        ])
+        self.combo_function.setEditable(True)
+        self.combo_function.addItems(FUNCTIONS)
 
         # A0 input (start of A range)
         self.label_A0 = QLabel('A0 (start of A range):')
@@ -100,6 +112,13 @@ class FunctionDialog(QDialog):
         self.button_color.clicked.connect(self.choose_color)
         self.color = QColor(0, 0, 0)  # Default black color
 
+        # Checkbox for drawing shapes on a vector layer
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+
+        # Preview of the active document
+        self.preview = PreviewPane(paint_functions, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -135,87 +154,57 @@ class FunctionDialog(QDialog):
         layout.addWidget(self.spin_thickness)
         layout.addWidget(self.label_color)
         layout.addWidget(self.button_color)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.combo_function, self.spin_A0, self.spin_A1, self.spin_B,
+                        self.spin_C, self.spin_x0, self.spin_y0, self.spin_N, self.spin_spacing, self.spin_thickness)
+        self.update_preview()
+
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color = color
+            self.update_preview()
 
-# Function to draw parametric functions
-def draw_functions(selected_function, A0, A1, B, C, x0, y0, N, spacing, line_thickness, line_color):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
-
-    # Create a new layer
-    new_layer = doc.createNode("Parametric Functions", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
-    doc.setActiveNode(new_layer)
-
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
-
-    # Get the pixel data of the current layer
-    pixel_data = new_layer.pixelData(0, 0, width, height)
-
-    # Create a QImage to draw functions on
-    image = QImage(pixel_data, width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.combo_function.currentText(), self.spin_A0.value(), self.spin_A1.value(),
+                              self.spin_B.value(), self.spin_C.value(), self.spin_x0.value(), self.spin_y0.value(),
+                              self.spin_N.value(), self.spin_spacing.value(), self.spin_thickness.value(), self.color))
 
-    # Create a QPainter to draw on the QImage
-    painter = QPainter(image)
+# Function to paint the N graphs (all of them, they cross any band top..bottom)
+def paint_functions(painter, width, height, top, bottom, selected_function, A0, A1, B, C, x0, y0, N, spacing,
+                    line_thickness, line_color):
     pen = QPen(line_color)
     pen.setWidth(line_thickness)
     painter.setPen(pen)
 
-    # Calculate the step size for A
-    step_A = (A1 - A0) / (N - 1)
+    # Values of A for the N graphs (a single graph uses A0)
+    step_A = (A1 - A0) / (N - 1) if N > 1 else 0
+    A_values = A0 + np.arange(N) * step_A
 
-    # Draw N graphs with different values of A
-    for i in range(N):
-        A = A0 + i * step_A
-        y_offset = i * spacing
-
-        # Loop through x values and calculate y based on the selected function
-        points = []
-        for x in range(width):
-            x_value = x / width * 20 - 10  # Map x to range [-10, 10]
-
-            try:
-                # Evaluate the selected function, incorporating x0 and y0
-                if selected_function == 'y = A*sin((x+x0)/B) + C*cos((x+x0)*A)':
-                    y_value = A * math.sin((x_value + x0) / B) + C * math.cos((x_value + x0) * A)
-                elif selected_function == 'y = B*sin((x+x0)/A) + C*cos((x+x0)/A)':
-                    y_value = B * math.sin((x_value + x0) / A) + C * math.cos((x_value + x0) / A)
-                elif selected_function == 'y = A*sin((x+x0)*B) + A*C':
-                    y_value = A * math.sin((x_value + x0) * B) + A * C
-            except ZeroDivisionError:
-                y_value = 0  # Handle division by zero
-
-            # Scale and offset y value to fit on canvas
-            y_scaled = -y_value * 50 + height / 2 + y_offset + y0  # Apply y0 for vertical shift
-            points.append(QPointF(x, y_scaled))
+    # Evaluate all N graphs over all canvas columns at once, incorporating x0
+    x_pixels = np.arange(width)
+    y_values = evaluate_functions(selected_function, A_values, B, C, x0, x_values(width))
 
-        # Draw the line using the points
-        painter.drawPolyline(*points)
+    # Scale and offset y values to fit on canvas, each graph shifted by its spacing and y0
+    y_offsets = np.arange(N)[:, np.newaxis] * spacing
+    y_scaled = -y_values * 50 + height / 2 + y_offsets + y0
 
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert to QByteArray
-
-    # Set the modified pixel data back to the layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
+    # Draw each graph as one polyline
+    for i in range(N):
+        painter.drawPolyline(polygon_from_arrays(x_pixels, y_scaled[i]))
 
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+# Function to draw parametric functions
+@traced
+def draw_functions(selected_function, A0, A1, B, C, x0, y0, N, spacing, line_thickness, line_color, vector=False):
+    run_generator(paint_functions, "Parametric Functions",
+                  (selected_function, A0, A1, B, C, x0, y0, N, spacing, line_thickness, line_color), vector=vector)
 
 # Main function to run the dialog and draw functions
 def main():
@@ -234,9 +223,11 @@ def main():
         spacing = dialog.spin_spacing.value()
         line_thickness = dialog.spin_thickness.value()
         line_color = dialog.color
+        vector = dialog.checkbox_vector.isChecked()
 
         # Draw the functions based on the settings
-        draw_functions(selected_function, A0, A1, B, C, x0, y0, N, spacing, line_thickness, line_color)
+        draw_functions(selected_function, A0, A1, B, C, x0, y0, N, spacing, line_thickness, line_color, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
-import krita as k
+import os
+import sys
 import math
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QComboBox, QPushButton, QColorDialog, QDialogButtonBox
-from PyQt5.QtGui import QPainter, QColor, QPen, QImage
-from PyQt5.QtCore import Qt, QPointF, QByteArray
+import numpy as np
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QSpinBox, QComboBox, QCheckBox, QPushButton, QColorDialog, QDialogButtonBox
+from PyQt5.QtGui import QColor, QPen
+
+# Make the shared render_core package next to this script importable
+try:
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+except NameError:
+    # Fallback for environments where __file__ is not available (like some Krita environments)
+    script_directory = os.path.dirname(os.path.realpath(sys.argv[0]))
+if script_directory not in sys.path:
+    sys.path.insert(0, script_directory)
+
+from render_core import run_generator
+from render_core.functions import FUNCTIONS_3D, evaluate_surface
+from render_core.geometry import polygon_from_arrays
+from render_core.wireframe import visible_polylines
+from render_core.preview import PreviewPane, active_document_size, connect_changes
+from render_core.trace import traced
 
 # Basic class for the settings dialog
 class Function3DDialog(QDialog):
@@ -13,13 +30,10 @@ class Function3DDialog(QDialog):
         layout = QVBoxLayout()
 
         # Function selection
-        self.label_function = QLabel('Select Function:')
+        self.label_function = QLabel('Select Function (or type a formula of x, y, A, K):')
         self.combo_function = QComboBox()
-        self.combo_function.addItems([
-            'sin(A*(x^2 + y^2))/A',
-            'sin(A*x) * cos(A*y)/A',
-            'sin(A*sqrt(x^2 + y^2))'
-        ])
+        self.combo_function.setEditable(True)
+        self.combo_function.addItems([label for label, formula in FUNCTIONS_3D])
 
         # A parameter input
         self.label_A = QLabel('A (parameter):')
@@ -56,12 +70,23 @@ class Function3DDialog(QDialog):
         self.spin_thickness.setMaximum(10)
         self.spin_thickness.setValue(2)
 
+        # Hidden-line removal checkbox
+        self.checkbox_hidden_lines = QCheckBox('Remove Hidden Lines')
+        self.checkbox_hidden_lines.setChecked(False)
+
         # Line color selection
         self.label_color = QLabel('Line Color:')
         self.button_color = QPushButton('Choose Color')
         self.button_color.clicked.connect(self.choose_color)
         self.color = QColor(0, 0, 0)  # Default black color
 
+        # Checkbox for drawing shapes on a vector layer
+        self.checkbox_vector = QCheckBox('Vector Layer (SVG)')
+        self.checkbox_vector.setChecked(False)  # Default is a paint layer
+
+        # Preview of the active document
+        self.preview = PreviewPane(paint_3d_function_plot, *active_document_size(), self)
+
         # OK and Cancel buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -80,61 +105,49 @@ class Function3DDialog(QDialog):
         layout.addWidget(self.spin_scale)
         layout.addWidget(self.label_thickness)
         layout.addWidget(self.spin_thickness)
+        layout.addWidget(self.checkbox_hidden_lines)
         layout.addWidget(self.label_color)
         layout.addWidget(self.button_color)
+        layout.addWidget(self.checkbox_vector)
+        layout.addWidget(self.preview)
         layout.addWidget(self.buttons)
 
         self.setLayout(layout)
 
+        # Render the preview again whenever a setting changes
+        connect_changes(self.update_preview, self.combo_function, self.spin_A, self.spin_K, self.spin_density,
+                        self.spin_scale, self.spin_thickness, self.checkbox_hidden_lines)
+        self.update_preview()
+
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
             self.color = color
+            self.update_preview()
+
+    # Function to show the current settings in the preview
+    def update_preview(self, *_):
+        self.preview.request((self.combo_function.currentText(), self.spin_A.value(), self.spin_K.value(),
+                              self.spin_density.value(), self.spin_scale.value(), self.spin_thickness.value(),
+                              self.color, self.checkbox_hidden_lines.isChecked()))
+
+# Square root of 2 used by the isometric projection, computed once
+SQRT_2 = math.sqrt(2)
 
-# Function to calculate z-value for the selected 3D function
-def calculate_z_value(func_index, A, K, x, y):
-    A = A/10
-    if func_index == 0:
-        return math.sin(A /2 *  (x ** 2 + y ** 2))* K
-    elif func_index == 1:
-        return math.sin(A *  x) * math.cos(A * K * y)* K
-    elif func_index == 2:
-        return math.sin(A * math.sqrt(x ** 2 + y ** 2))* K
-
-# Function to project 3D points into 2D space (isometric projection)
+# Function to project 3D points into 2D space (isometric projection), for numbers or NumPy arrays
 def project_3d_to_2d(x, y, z, scale):
     # Isometric projection formulas (scaled and rotated)
-    iso_x = (x - y) * math.sqrt(2) / 2
-    iso_y = (x + y) * math.sqrt(2) / 4 - z
+    iso_x = (x - y) * SQRT_2 / 2
+    iso_y = (x + y) * SQRT_2 / 4 - z
     return iso_x * scale, iso_y * scale
 
-# Function to draw 3D function plot
-def draw_3d_function_plot(func_index, A, K, density, scale, line_thickness, color):
-    krita_instance = k.Krita.instance()
-    doc = krita_instance.activeDocument()
-
-    if not doc:
-        raise Exception("No active document found.")
-
-    # Create a new layer
-    new_layer = doc.createNode("3D Function Plot", "paintlayer")
-    doc.rootNode().addChildNode(new_layer, None)
-    doc.setActiveNode(new_layer)
-
-    # Get the width and height of the document
-    width = doc.width()
-    height = doc.height()
-
+# Function to paint the 3D function plot (the whole wireframe, it crosses any band top..bottom)
+def paint_3d_function_plot(painter, width, height, top, bottom, selected_function, A, K, density, scale,
+                           line_thickness, color, hidden_lines):
     # Calculate the center of the document
     center_x = width / 2
     center_y = height / 2
 
-    # Create a QImage to draw on
-    image = QImage(width, height, QImage.Format_ARGB32)
-    image.fill(Qt.transparent)  # Set the background to transparent
-
-    # Create a QPainter to draw on the QImage
-    painter = QPainter(image)
     pen = QPen(color)
     pen.setWidth(line_thickness)
     painter.setPen(pen)
@@ -142,48 +155,34 @@ def draw_3d_function_plot(func_index, A, K, density, scale, line_thickness, colo
     # Define the grid size based on density
     step_size = 50 / density
 
-    # Draw the 3D function as a wireframe
-    for x in range(-density, density):
-        for y in range(-density, density):
-            # Calculate z value based on the selected function
-            z = calculate_z_value(func_index, A, K, x * step_size, y * step_size)
-
-            # Project the 3D point to 2D
-            proj_x, proj_y = project_3d_to_2d(x, y, z, scale)
-
-            # Offset the projection to center it on the canvas
-            proj_x += center_x
-            proj_y += center_y
-
-            # Draw a point or short line (simulating a grid)
-            if x < density - 1 and y < density - 1:
-                z_next_x = calculate_z_value(func_index, A, K, (x + 1) * step_size, y * step_size)
-                z_next_y = calculate_z_value(func_index, A, K, x * step_size, (y + 1) * step_size)
-
-                # Project the next points
-                proj_x_next, proj_y_next = project_3d_to_2d(x + 1, y, z_next_x, scale)
-                proj_x_next += center_x
-                proj_y_next += center_y
-
-                proj_x_next_y, proj_y_next_y = project_3d_to_2d(x, y + 1, z_next_y, scale)
-                proj_x_next_y += center_x
-                proj_y_next_y += center_y
+    # Calculate the z values of the whole grid at once; z_grid[x + density, y + density]
+    grid = np.arange(-density, density) * step_size
+    z_grid = evaluate_surface(selected_function, A, K, grid[:, np.newaxis], grid[np.newaxis, :])
+
+    # Project the whole grid to 2D once and offset it to center it on the canvas
+    grid_index = np.arange(-density, density)
+    proj_x, proj_y = project_3d_to_2d(grid_index[:, np.newaxis], grid_index[np.newaxis, :], z_grid, scale)
+    proj_x += center_x
+    proj_y += center_y
+
+    if hidden_lines:
+        # Draw only the parts of the wireframe not covered by the surface in front of them
+        for xs, ys in visible_polylines(proj_x, proj_y, width):
+            painter.drawPolyline(polygon_from_arrays(xs, ys))
+    else:
+        # Draw the 3D function as a wireframe, each grid line as one polyline.
+        # Like before, the lines along x stop before the last y and the lines along y before the last x.
+        last_index = 2 * density - 1
+        for y_index in range(last_index):
+            painter.drawPolyline(polygon_from_arrays(proj_x[:, y_index], proj_y[:, y_index]))
+        for x_index in range(last_index):
+            painter.drawPolyline(polygon_from_arrays(proj_x[x_index, :], proj_y[x_index, :]))
 
-                # Draw lines connecting points (forming a grid)
-                painter.drawLine(QPointF(proj_x, proj_y), QPointF(proj_x_next, proj_y_next))
-                painter.drawLine(QPointF(proj_x, proj_y), QPointF(proj_x_next_y, proj_y_next_y))
-
-    painter.end()
-
-    # Convert the QImage to QByteArray
-    image_bits = image.constBits()  # Get a pointer to the image data
-    image_bytes = QByteArray(image_bits.asstring(image.byteCount()))  # Convert to QByteArray
-
-    # Set the modified pixel data back to the layer
-    new_layer.setPixelData(image_bytes, 0, 0, width, height)
-
-    # Refresh the document to apply the changes
-    doc.refreshProjection()
+# Function to draw 3D function plot
+@traced
+def draw_3d_function_plot(selected_function, A, K, density, scale, line_thickness, color, hidden_lines=False, vector=False):
+    run_generator(paint_3d_function_plot, "3D Function Plot",
+                  (selected_function, A, K, density, scale, line_thickness, color, hidden_lines), vector=vector)
 
 # Main function to run the dialog and draw 3D function plot
 def main():
@@ -191,16 +190,19 @@ def main():
     dialog = Function3DDialog()
     if dialog.exec_() == QDialog.Accepted:
         # Get the user-selected settings
-        func_index = dialog.combo_function.currentIndex()
+        selected_function = dialog.combo_function.currentText()
         A = dialog.spin_A.value()
         K = dialog.spin_K.value()
         density = dialog.spin_density.value()
         scale = dialog.spin_scale.value()
         line_thickness = dialog.spin_thickness.value()
         color = dialog.color
+        hidden_lines = dialog.checkbox_hidden_lines.isChecked()
+        vector = dialog.checkbox_vector.isChecked()
 
         # Draw the 3D function plot based on the settings
-        draw_3d_function_plot(func_index, A, K, density, scale, line_thickness, color)
+        draw_3d_function_plot(selected_function, A, K, density, scale, line_thickness, color, hidden_lines, vector)
 
 # Run the main function
-main()
+if __name__ == "__main__":
+    main()
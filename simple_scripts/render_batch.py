@@ -0,0 +1,363 @@
+"""
+Headless batch rendering of the simple_scripts generators.
+
+Runs the draw_* function of a script without Krita and without its dialog,
+once per entry of a JSON or YAML parameter file, and saves each result:
+
+    python simple_scripts/render_batch.py renders.json
+    python simple_scripts/render_batch.py --list
+
+Parameter file (YAML needs PyYAML):
+
+    {
+      "width": 2048, "height": 2048, "background": "#ffffff",
+      "renders": [
+        {"generator": "hexagons", "output": "out/hexagons.png",
+         "params": {"hex_width": 40, "hex_color": "#3050a0"}},
+        {"generator": "mikado", "output": "out/mikado.ora", "width": 4096,
+         "params": {"N": 100000, "random_color": true}}
+      ]
+    }
+
+width, height and background at the top level are defaults for every render,
+an entry can override them. background is a color or null for a transparent
+document. Missing params take the dialog defaults (see --list). Colors are
+"#rrggbb" strings or [r, g, b] lists, fonts use Qt's "family,pointSize".
+
+Output files ending in .ora keep every layer (OpenRaster, opens in Krita),
+other extensions (.png, .jpg, ...) save the flattened image. With "vector":
+true the generators draw shapes on a vector layer (render_core.vector), and
+an output file ending in .svg saves that layer as an SVG document. Relative paths
+are resolved against the parameter file's directory or --output-dir. All
+entries are rendered in one process: PyQt and the scripts are imported once.
+
+Random generators take a "seed" parameter, the same seed gives the same
+picture. With --workers N the hexagons, random_shapes and random_chars
+generators are painted in horizontal bands by N worker processes
+(render_core.bands), with the same result as a single-process render.
+
+Raster renders are kept in the render cache (render_core.cache): an entry with
+the same generator, parameters, seed and size is read from it instead of being
+painted again. --no-cache renders everything without reading or writing it.
+
+An entry with "frames" renders an animation instead of one picture: the
+parameters in "sweep" go in even steps from their start to their end value
+over the frames, and every frame is saved as a numbered image. The last run of
+'#' in the output name is the frame number (one is added before the extension
+when there is none). Parameters that stay the same are taken from "params":
+
+    {"generator": "cyber_clock", "output": "out/clock_####.png", "frames": 60,
+     "sweep": {"rotation": [0, 59]}, "params": {"N": 6}}
+
+With --workers N the frames are painted by N worker processes. The clock's
+circles do not move with its lines, they are painted once per worker and every
+frame is painted over a copy (render_core.sequence).
+
+--trace FILE records the time and memory of every render stage (createNode,
+painting, rasterizing, setPixelData, ...) into a Chrome trace JSON file and
+prints a summary per render (render_core.trace).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# The scripts and the render_core package live next to this file
+SCRIPTS_DIR = os.path.dirname(os.path.realpath(__file__))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from render_core import headless
+from render_core.bands import BandRenderer
+from render_core.streams import new_seed
+from render_core.buffers import set_image_pixels
+from render_core.cache import render_cache
+from render_core.sequence import SequenceRenderer, frame_parameters
+from render_core import trace
+
+# Marks a parameter without default
+REQUIRED = object()
+
+# Generator name: (script file, draw function, parameters with the dialog defaults in call order)
+GENERATORS = {
+    'lines': ('krita_test10_lines_dialog.py', 'draw_lines', {
+        'direction': 'Horizontal', 'color': '#000000', 'thickness': 2, 'spacing': 50,
+        'create_new_layer': False, 'vector': False,
+    }),
+    'noise_lines': ('krita_test11_noise_lines_txt.py', 'draw_noise_lines', {
+        'direction': 'Horizontal', 'R': 3, 'S': 5, 'N': 10, 'thickness': 2, 'color': '#000000', 'seed': None, 'vector': False,
+    }),
+    'dots_lines': ('krita_test12_random_dots_lines_dialog.py', 'draw_points_and_lines', {
+        'points_count': 100, 'color_points': '#ff0000', 'color_lines': '#808080', 'seed': None, 'vector': False,
+    }),
+    'cyber_clock': ('krita_test13_cyber_clock.py', 'draw_concentric_circles_lines', {
+        'circle_distance': 50, 'N': 6, 'line_thickness': 2, 'color': '#000000', 'rotation': 0.0, 'vector': False,
+    }),
+    'mikado': ('krita_test15_mikado.py', 'draw_mikado_lines', {
+        'N': 200, 'Lx_min': 100, 'Lx_max': 500, 'Ly_min': 100, 'Ly_max': 500, 'random_color': False,
+        'line_thickness': 2, 'color': '#000000', 'seed': None, 'vector': False,
+    }),
+    'random_shapes': ('krita_test15_random_objects.py', 'draw_random_shapes', {
+        'shape': 'Circle', 'size_from': 10, 'size_to': 10, 'distance': 20, 'random_color': False,
+        'fill': False, 'line_thickness': 2, 'color': '#000000', 'seed': None, 'vector': False,
+    }),
+    'hexagons': ('krita_test16hexagon1.py', 'draw_hexagons', {
+        'hex_width': 50, 'hex_color': '#000000', 'spacing': 10, 'vector': False,
+    }),
+    'random_chars': ('krita_test18_random_chars.py', 'draw_random_characters', {
+        'char_type': 'Binary (0, 1)', 'font': 'Arial,12', 'color': '#000000', 'char_size': 20,
+        'char_spacing': 10, 'line_spacing': 10, 'seed': None, 'vector': False,
+    }),
+    'image': ('krita_test19_png_in.py', 'draw_image', {
+        'selected_image': REQUIRED, 'x': 0, 'y': 0, 'zoom_factor': 1,
+    }),
+    'image_atlas': ('krita_test19_png_in.py', 'draw_atlas', {
+        'image_directory': REQUIRED, 'padding': 2, 'manifest': None,
+    }),
+    'functions': ('krita_test20_functions.py', 'draw_functions', {
+        'selected_function': 'y = A*sin((x+x0)/B) + C*cos((x+x0)*A)', 'A0': -5, 'A1': 5, 'B': 1, 'C': 1,
+        'x0': 0, 'y0': 0, 'N': 21, 'spacing': 50, 'line_thickness': 2, 'line_color': '#000000', 'vector': False,
+    }),
+    'plot_3d': ('krita_test21_func_3d.py', 'draw_3d_function_plot', {
+        'selected_function': 'sin(A*(x^2 + y^2))/A', 'A': 5, 'K': 2, 'density': 150, 'scale': 20,
+        'line_thickness': 2, 'color': '#000000', 'hidden_lines': False, 'vector': False,
+    }),
+}
+
+# Generators that can be painted in horizontal bands by worker processes (--workers, raster layers only):
+# band painter with the same parameters as the draw function, and the name of the layer
+BAND_PAINTERS = {
+    'hexagons': ('paint_hexagons', 'Hexagons'),
+    'random_shapes': ('paint_random_shapes', 'Random Shapes'),
+    'random_chars': ('paint_random_characters', 'Random Characters'),
+}
+
+# Generators that can render frame sequences: paint function of the moving parts, and the painter of
+# the parts that stay the same between frames (painted once, None when everything moves)
+SEQUENCE_PAINTERS = {
+    'lines': ('paint_lines', None),
+    'noise_lines': ('paint_noise_lines', None),
+    'dots_lines': ('paint_points_and_lines', None),
+    'cyber_clock': ('paint_clock_lines', 'paint_clock_circles'),
+    'mikado': ('paint_mikado_lines', None),
+    'random_shapes': ('paint_random_shapes', None),
+    'hexagons': ('paint_hexagons', None),
+    'random_chars': ('paint_random_characters', None),
+    'image': ('paint_image', None),
+    'functions': ('paint_functions', None),
+    'plot_3d': ('paint_3d_function_plot', None),
+}
+
+DEFAULT_WIDTH = 1024
+DEFAULT_HEIGHT = 1024
+DEFAULT_BACKGROUND = '#ffffff'
+
+
+# Function to turn a parameter file value into what the draw function expects
+def convert_value(name, value, default):
+    from PyQt5.QtGui import QColor, QFont
+
+    if 'color' in name and not isinstance(default, bool):
+        color = QColor(value) if isinstance(value, str) else QColor(*value)
+        if not color.isValid():
+            raise ValueError(f"Invalid color for {name}: {value}")
+        return color
+    if name == 'font':
+        font = QFont()
+        if not font.fromString(value):
+            raise ValueError(f"Invalid font for {name}: {value}")
+        return font
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ValueError(f"{name} must be true or false, got: {value}")
+        return value
+    if isinstance(default, int) and isinstance(value, float) and value.is_integer():
+        return int(value)  # Spin boxes give ints, YAML/JSON may write 10.0
+    return value
+
+
+# Function to build the draw function arguments from the defaults and the given params
+def build_arguments(generator, params):
+    defaults = GENERATORS[generator][2]
+    unknown = [name for name in params if name not in defaults]
+    if unknown:
+        raise ValueError(f"Unknown parameters for {generator}: {', '.join(unknown)} "
+                         f"(expected {', '.join(defaults)})")
+
+    arguments = []
+    for name, default in defaults.items():
+        value = params.get(name, default)
+        if value is REQUIRED:
+            raise ValueError(f"Parameter {name} is required for {generator}")
+        if name == 'seed':
+            # Pick the seed here, so all bands of a parallel render use the same one
+            arguments.append(new_seed() if value is None else int(value))
+        else:
+            arguments.append(convert_value(name, value, default))
+    return arguments
+
+
+# Function to read the render list of a JSON or YAML parameter file
+def load_parameter_file(path):
+    with open(path, encoding='utf-8') as file:
+        if path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise Exception("Reading YAML parameter files needs PyYAML (pip install pyyaml).") from None
+            config = yaml.safe_load(file)
+        else:
+            config = json.load(file)
+
+    # A bare list is a list of renders without shared defaults
+    if isinstance(config, list):
+        config = {'renders': config}
+    if not isinstance(config, dict) or not isinstance(config.get('renders'), list):
+        raise Exception(f"Parameter file must contain a list of renders: {path}")
+    return config
+
+
+# Function to render the frames of a sequence entry and save them as numbered images, returns the
+# first and last file name
+def render_sequence(entry, defaults, output_dir, sequence_renderer):
+    generator = entry['generator']
+    if generator not in SEQUENCE_PAINTERS:
+        raise ValueError(f"No frame sequences for {generator} (available: {', '.join(SEQUENCE_PAINTERS)})")
+
+    script, function_name, parameter_names = GENERATORS[generator]
+    parameters = dict(zip(parameter_names, build_arguments(generator, entry.get('params') or {})))
+    if parameters.pop('vector', False):
+        raise ValueError(f"Frame sequences of {generator} are raster images, vector is not supported")
+
+    sweeps = {}
+    for name, value in (entry.get('sweep') or {}).items():
+        if (not isinstance(value, list) or len(value) != 2
+                or not all(isinstance(item, (int, float)) and not isinstance(item, bool) for item in value)):
+            raise ValueError(f"Sweep of {name} must be [start, end] numbers, got: {value}")
+        sweeps[name] = tuple(value)
+    frames = frame_parameters(parameters, sweeps, int(entry['frames']))
+
+    width = int(entry.get('width', defaults.get('width', DEFAULT_WIDTH)))
+    height = int(entry.get('height', defaults.get('height', DEFAULT_HEIGHT)))
+    background = entry.get('background', defaults.get('background', DEFAULT_BACKGROUND))
+    output = os.path.join(output_dir, entry['output'])
+
+    paint_name, static_name = SEQUENCE_PAINTERS[generator]
+    with trace.stage(f'{generator} frames', frames=len(frames), workers=sequence_renderer.workers):
+        paths = sequence_renderer.render(os.path.join(SCRIPTS_DIR, script), paint_name, frames, width, height,
+                                         output, static_name, background)
+    return f"{paths[0]} .. {os.path.basename(paths[-1])} ({len(paths)} frames)"
+
+
+# Function to render one entry of the parameter file into a new document and save it
+def render(entry, defaults, output_dir, band_renderer=None, sequence_renderer=None):
+
+    if not isinstance(entry, dict):
+        raise ValueError(f"A render must be an object with a generator, got: {entry!r}")
+    generator = entry.get('generator')
+    if generator not in GENERATORS:
+        raise ValueError(f"Unknown generator '{generator}' (available: {', '.join(GENERATORS)})")
+    if not entry.get('output'):
+        raise ValueError(f"No output file given for {generator}")
+    if 'frames' in entry:
+        return render_sequence(entry, defaults, output_dir, sequence_renderer or SequenceRenderer())
+
+    script, function_name, parameter_names = GENERATORS[generator]
+    arguments = build_arguments(generator, entry.get('params') or {})
+    vector = dict(zip(parameter_names, arguments)).get('vector', False)
+    script_path = os.path.join(SCRIPTS_DIR, script)
+    draw = getattr(headless.load_script(script_path), function_name)
+
+    width = int(entry.get('width', defaults.get('width', DEFAULT_WIDTH)))
+    height = int(entry.get('height', defaults.get('height', DEFAULT_HEIGHT)))
+    background = entry.get('background', defaults.get('background', DEFAULT_BACKGROUND))
+    output = os.path.join(output_dir, entry['output'])
+
+    krita_instance = headless.Krita.instance()
+    doc = krita_instance.createDocument(width, height, generator, background=background)
+    krita_instance.setActiveDocument(doc)
+    try:
+        if band_renderer is not None and generator in BAND_PAINTERS and not vector:
+            # Paint the bands in the worker processes, then put the result in a new layer
+            paint_name, layer_name = BAND_PAINTERS[generator]
+            new_layer = doc.createNode(layer_name, 'paintlayer')
+            doc.rootNode().addChildNode(new_layer, None)
+
+            # The band painter takes the draw function's arguments without vector, the cache entry is
+            # the one run_generator uses (render_core.generator)
+            draw_arguments = [value for name, value in zip(parameter_names, arguments) if name != 'vector']
+            paint = getattr(headless.load_script(script_path), paint_name)
+            cache_entry = render_cache().entry(paint, width, height, *draw_arguments)
+            with trace.stage(f'{generator} in bands'):
+                if not cache_entry.upload(new_layer):
+                    with trace.stage('paint bands', workers=band_renderer.workers):
+                        image = band_renderer.render(script_path, paint_name, draw_arguments, width, height)
+                    set_image_pixels(new_layer, image)
+                    cache_entry.add_tile(0, 0, image)
+                    cache_entry.commit()
+        else:
+            draw(*arguments)
+        with trace.stage('exportImage'):
+            doc.exportImage(output)
+    finally:
+        krita_instance.closeDocument(doc)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render simple_scripts generators without Krita')
+    parser.add_argument('parameter_file', nargs='?', help='JSON or YAML file with the renders')
+    parser.add_argument('--output-dir', help='directory for relative output paths (default: next to the parameter file)')
+    parser.add_argument('--list', action='store_true', help='list the generators and their default parameters')
+    parser.add_argument('--workers', type=int, default=1,
+                        help=f"worker processes for band-parallel rendering of {', '.join(BAND_PAINTERS)} "
+                             "and for the frames of sequences")
+    parser.add_argument('--no-cache', action='store_true', help='render everything again, without the render cache')
+    parser.add_argument('--trace', metavar='FILE', help='write the time and memory of the render stages to a Chrome trace JSON file')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (script, function_name, defaults) in GENERATORS.items():
+            print(f"{name} ({script}, {function_name})")
+            for parameter, default in defaults.items():
+                print(f"    {parameter} = {'(required)' if default is REQUIRED else json.dumps(default)}")
+        return 0
+    if not args.parameter_file:
+        parser.error('a parameter file is required')
+
+    config = load_parameter_file(args.parameter_file)
+    output_dir = args.output_dir or os.path.dirname(os.path.abspath(args.parameter_file))
+
+    headless.install()
+    if args.no_cache:
+        render_cache().max_bytes = 0
+    if args.trace:
+        trace.start(args.trace)
+    band_renderer = BandRenderer(args.workers) if args.workers > 1 else None
+    sequence_renderer = SequenceRenderer(args.workers)  # Starts its workers on the first sequence
+    failures = 0
+    try:
+        for index, entry in enumerate(config['renders']):
+            start = time.perf_counter()
+            try:
+                output = render(entry, config, output_dir, band_renderer, sequence_renderer)
+            except Exception as error:
+                failures += 1
+                # A broken entry (e.g. not an object) only fails its own render
+                generator = entry.get('generator') if isinstance(entry, dict) else None
+                print(f"[{index}] {generator}: failed: {error}", file=sys.stderr)
+                continue
+            print(f"[{index}] {entry['generator']}: {output} ({time.perf_counter() - start:.2f} s)")
+    finally:
+        if band_renderer is not None:
+            band_renderer.close()
+        sequence_renderer.close()
+        trace.stop()  # Ends the list of the trace file
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,6 @@
+# Shared rendering helpers for the Krita scripts in simple_scripts
+from .tiles import TiledLayer, DEFAULT_TILE_SIZE
+from .buffers import image_bytes, set_image_pixels
+from .generator import run_generator
+
+__all__ = ['TiledLayer', 'DEFAULT_TILE_SIZE', 'image_bytes', 'set_image_pixels', 'run_generator']
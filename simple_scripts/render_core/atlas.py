@@ -0,0 +1,176 @@
+"""
+Packing of many images into one atlas (contact sheet, sprite sheet).
+
+pack_images places rectangles of the given sizes in a width x height area with
+the MaxRects algorithm (best short side fit): the free space is kept as a list
+of maximal free rectangles, every image goes into the free rectangle it fills
+most tightly, and the rectangles it overlaps are split around it. Images are
+placed largest first, which packs much tighter than rows or shelves for sprites
+of mixed sizes. Images are never rotated.
+
+compose_atlas decodes the images in a thread pool (QImageReader releases the
+GIL while decoding) and every worker copies its image straight into its own
+rectangle of one ARGB32 buffer, so no image is painted twice:
+
+    rects = pack_images(sizes, width, height, padding=2)
+    atlas = compose_atlas(paths, rects)
+    write_manifest('atlas.json', atlas_manifest(names, rects, atlas.size(), padding=2))
+
+The manifest lists the rectangle of every image by file name, for the tools
+that cut the sprites out again.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from PyQt5.QtGui import QImage, QImageReader
+from PyQt5.QtCore import QRect, QSize, Qt
+
+from .pool import image_pixels
+
+# Version of the manifest layout
+MANIFEST_VERSION = 1
+
+
+class MaxRectsPacker:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        # Maximal free rectangles as (x, y, width, height), none contains another
+        self.free = [(0, 0, width, height)]
+
+    # Function to place a width x height rectangle, returns its (x, y) or None when it does not fit
+    def insert(self, width, height):
+        best = None
+        best_fit = None
+        for free_x, free_y, free_width, free_height in self.free:
+            if width <= free_width and height <= free_height:
+                # Best short side fit: the smallest leftover on the tighter side, then on the other side
+                leftover_x = free_width - width
+                leftover_y = free_height - height
+                fit = (min(leftover_x, leftover_y), max(leftover_x, leftover_y))
+                if best_fit is None or fit < best_fit:
+                    best = (free_x, free_y)
+                    best_fit = fit
+        if best is not None:
+            self.place(best[0], best[1], width, height)
+        return best
+
+    # Take a placed rectangle out of the free rectangles
+    def place(self, x, y, width, height):
+        right = x + width
+        bottom = y + height
+        kept = []
+        pieces = []
+        for free in self.free:
+            free_x, free_y, free_width, free_height = free
+            free_right = free_x + free_width
+            free_bottom = free_y + free_height
+            if x >= free_right or right <= free_x or y >= free_bottom or bottom <= free_y:
+                kept.append(free)
+                continue
+
+            # The parts of the free rectangle left, right, above and below the placed one
+            if x > free_x:
+                pieces.append((free_x, free_y, x - free_x, free_height))
+            if right < free_right:
+                pieces.append((right, free_y, free_right - right, free_height))
+            if y > free_y:
+                pieces.append((free_x, free_y, free_width, y - free_y))
+            if bottom < free_bottom:
+                pieces.append((free_x, bottom, free_width, free_bottom - bottom))
+
+        # Only the new pieces can lie inside another free rectangle: the kept ones were maximal already
+        maximal = []
+        for index, piece in enumerate(pieces):
+            others = kept + maximal + pieces[index + 1:]
+            if not any(contains(other, piece) for other in others):
+                maximal.append(piece)
+        self.free = kept + maximal
+
+
+# Function to check if rectangle outer (x, y, width, height) contains rectangle inner
+def contains(outer, inner):
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and inner[0] + inner[2] <= outer[0] + outer[2] and inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+# Function to place images of the given (width, height) sizes in a width x height area, padding pixels
+# apart, returns their QRects in the order of sizes
+def pack_images(sizes, width, height, padding=0):
+    # The padding goes right of and below every image, the area grows by it so the last ones fit at the edge
+    packer = MaxRectsPacker(width + padding, height + padding)
+    rects = [None] * len(sizes)
+    for index in sorted(range(len(sizes)), key=lambda i: (-max(sizes[i]), -sizes[i][0] * sizes[i][1])):
+        image_width, image_height = sizes[index]
+        position = packer.insert(image_width + padding, image_height + padding)
+        if position is None:
+            raise Exception(f"The images do not fit in {width}x{height} pixels: "
+                            f"{len(sizes) - rects.count(None)} of {len(sizes)} placed.")
+        rects[index] = QRect(position[0], position[1], image_width, image_height)
+    return rects
+
+
+# Function to get the size of the atlas of the packed rects (the area they cover from (0, 0))
+def atlas_size(rects):
+    return QSize(max((rect.right() + 1 for rect in rects), default=0),
+                 max((rect.bottom() + 1 for rect in rects), default=0))
+
+
+# Function to decode the image files into their rects of one transparent ARGB32 image, in worker threads
+def compose_atlas(paths, rects, workers=None):
+    size = atlas_size(rects)
+    atlas = QImage(size, QImage.Format_ARGB32)
+    atlas.fill(Qt.transparent)
+    # Taken once here, bits detaches the image; the workers write disjoint parts of it
+    pixels = image_pixels(atlas)
+
+    def copy_image(path, rect):
+        image = QImageReader(path).read()
+        if image.isNull():
+            raise Exception(f"Cannot read image '{path}'.")
+        if image.size() != rect.size():
+            raise Exception(f"Image '{path}' changed its size to {image.width()}x{image.height()}.")
+        pixels[rect.top():rect.bottom() + 1, rect.left():rect.right() + 1] = \
+            image_pixels(image.convertToFormat(QImage.Format_ARGB32), writable=False)
+
+    with ThreadPoolExecutor(workers) as executor:
+        for _ in executor.map(copy_image, paths, rects):
+            pass  # Raises the first error of a worker
+    return atlas
+
+
+# Function to pack and compose the images for a width x height canvas, returns (rects, atlas image);
+# the last one is kept for the tiles of a render
+@lru_cache(maxsize=1)
+def image_atlas(paths, sizes, width, height, padding=0, workers=None):
+    rects = pack_images(sizes, width, height, padding)
+    return rects, compose_atlas(paths, rects, workers)
+
+
+# Function to drop the atlas kept by image_atlas
+def release_image_atlas():
+    image_atlas.cache_clear()
+
+
+# Function to describe the packed images: the atlas size and the rect of every image by name
+def atlas_manifest(names, rects, size, padding=0, layer=None):
+    return {
+        'version': MANIFEST_VERSION,
+        'layer': layer,
+        'size': {'w': size.width(), 'h': size.height()},
+        'padding': padding,
+        'frames': {name: {'x': rect.x(), 'y': rect.y(), 'w': rect.width(), 'h': rect.height()}
+                   for name, rect in zip(names, rects)},
+    }
+
+
+# Write a manifest as a JSON file
+def write_manifest(path, manifest):
+    # Write a temporary file and rename it, the tools never read half a manifest
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temporary_path, path)
@@ -0,0 +1,136 @@
+"""
+Band-parallel rendering of generators in worker processes.
+
+The document is cut into horizontal bands of BAND_HEIGHT rows. Each band is
+painted by a worker process straight into its rows of one shared-memory
+ARGB32 canvas, so the bands need no stitching copy. A band painter is a
+function paint(painter, width, height, top, bottom, *arguments) that draws
+everything reaching into the rows top..bottom in document coordinates,
+including shapes that start in a neighbouring band.
+
+Random generators draw the values of each row of shapes from its own
+substream (render_core.streams). Every band that touches a row sees the same
+shapes, so the bands join without seams and the picture does not depend on
+the number of workers.
+
+Workers are started with "spawn" and run the scripts with the offscreen
+Krita stand-in (render_core.headless). This is for rendering outside Krita:
+Krita's embedded Python cannot start Python worker processes.
+"""
+
+import ctypes
+import math
+import os
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+from PyQt5 import sip
+from PyQt5.QtGui import QImage, QPainter, QFont
+from PyQt5.QtCore import Qt
+
+# Rows per band, small enough to keep all workers busy until the end
+BAND_HEIGHT = 256
+
+
+# Function to get the rows of shapes that reach into the band top..bottom
+def band_rows(step, count, top, bottom, above, below):
+    # Row r is at y = r * step and its shapes cover y - above .. y + below
+    first = max(0, math.ceil((top - below) / step))
+    last = min(count, math.floor((bottom + above) / step) + 1)
+    return range(first, last)
+
+
+# Function to split the document height into (top, bottom) bands
+def band_ranges(height, band_height=BAND_HEIGHT):
+    return [(top, min(top + band_height, height)) for top in range(0, height, band_height)]
+
+
+# Function to get the address of a shared memory block (without keeping its buffer exported)
+def buffer_address(shared_memory):
+    return ctypes.addressof(ctypes.c_char.from_buffer(shared_memory.buf))
+
+
+class FontArgument:
+    # QFont cannot be pickled, it is sent to the workers as its description string
+    def __init__(self, font):
+        self.description = font.toString()
+
+    def font(self):
+        font = QFont()
+        font.fromString(self.description)
+        return font
+
+
+# Function to make band painter arguments picklable
+def pack_arguments(arguments):
+    return [FontArgument(value) if isinstance(value, QFont) else value for value in arguments]
+
+
+# Function to restore band painter arguments in a worker
+def unpack_arguments(arguments):
+    return [value.font() if isinstance(value, FontArgument) else value for value in arguments]
+
+
+# Function to prepare a worker process (offscreen Qt and the Krita stand-in)
+def init_worker():
+    from .headless import install
+    install()
+
+
+# Function to paint one band into its rows of the shared canvas (runs in a worker)
+def paint_band(task):
+    from .headless import load_script
+
+    script_path, paint_name, arguments, memory_name, width, height, top, bottom = task
+    paint = getattr(load_script(script_path), paint_name)
+
+    shared_memory = SharedMemory(name=memory_name)
+    try:
+        address = buffer_address(shared_memory) + top * width * 4
+        image = QImage(sip.voidptr(address), width, bottom - top, width * 4, QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        try:
+            painter.translate(0, -top)  # The painter works in document coordinates
+            paint(painter, width, height, top, bottom, *unpack_arguments(arguments))
+        finally:
+            painter.end()
+        del image
+    finally:
+        shared_memory.close()
+    return top
+
+
+class BandRenderer:
+    def __init__(self, workers=None, band_height=BAND_HEIGHT):
+        self.workers = workers or os.cpu_count()
+        self.band_height = band_height
+        self._pool = get_context('spawn').Pool(self.workers, initializer=init_worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    # Render a band painter of a script over the whole document, returns an ARGB32 QImage
+    def render(self, script_path, paint_name, arguments, width, height):
+        shared_memory = SharedMemory(create=True, size=max(width * height * 4, 1))
+        try:
+            tasks = [(script_path, paint_name, pack_arguments(arguments), shared_memory.name, width, height, top, bottom)
+                     for top, bottom in band_ranges(height, self.band_height)]
+            for _ in self._pool.imap_unordered(paint_band, tasks):
+                pass
+
+            # Copy the finished canvas out before the shared memory is released
+            canvas = QImage(sip.voidptr(buffer_address(shared_memory)), width, height, width * 4, QImage.Format_ARGB32)
+            image = canvas.copy()
+            del canvas
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+        return image
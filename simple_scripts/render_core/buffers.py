@@ -0,0 +1,30 @@
+"""
+Zero-copy hand-over of QImage pixels to Krita.
+
+The scripts used to convert a finished image with
+QByteArray(image.constBits().asstring(image.byteCount())), which copies the
+whole buffer into a Python bytes object and then again into a QByteArray,
+before setPixelData copies it a third time into the layer. image_bytes wraps
+the QImage's own pixel buffer in a QByteArray instead, so setPixelData's copy
+is the only one left.
+"""
+
+from PyQt5.QtCore import QByteArray
+from .trace import stage
+
+
+# Function to get a QByteArray sharing the pixel buffer of an ARGB32 QImage (no copy)
+def image_bytes(image):
+    # The returned QByteArray points into the image memory: keep the image alive and
+    # unchanged until the data was consumed (e.g. by setPixelData)
+    image_bits = image.constBits()  # Pointer to the image data, constBits does not detach
+    image_bits.setsize(image.byteCount())
+    return QByteArray.fromRawData(image_bits)
+
+
+# Function to upload a whole QImage to a layer at the given position
+def set_image_pixels(node, image, x=0, y=0):
+    with stage('convert'):
+        data = image_bytes(image)
+    with stage('setPixelData', bytes=image.byteCount()):
+        node.setPixelData(data, x, y, image.width(), image.height())
@@ -0,0 +1,273 @@
+"""
+On-disk cache of rendered layers.
+
+A generator run with the same settings, seed and document size paints the same
+pixels. The render cache keeps the tiles a TiledLayer uploaded and sets them in
+the layer again on the next run, instead of painting:
+
+    cache_entry = render_cache().entry(paint_hexagons, width, height, hex_width, hex_color, spacing)
+    if cache_entry.upload(new_layer):
+        return  # Read from the cache
+    tiled_layer = TiledLayer(new_layer, width, height, cache_entry=cache_entry)
+    ...
+
+run_generator (render_core.generator) does this for every generator.
+
+Entries are content addressed: the file name is a SHA-256 of the paint function,
+all its parameter values, the document size and the source code of its script
+and of render_core, so a changed generator never reads old pixels. An entry is
+one file of zlib-compressed tiles. When the files take more than max_bytes
+together, the least recently used ones are removed. A render whose tiles alone
+take more than max_bytes is not cached: it stops compressing tiles once they
+pass the limit and is never written, so it does not evict the other entries
+and then itself.
+
+The cache lives in the user's cache directory (e.g. ~/.cache/krita-python-scripts),
+the KRITA_SCRIPTS_CACHE_DIR environment variable moves it.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import struct
+import zlib
+from functools import lru_cache
+
+from PyQt5.QtGui import QColor, QFont
+from PyQt5.QtCore import QStandardPaths
+
+from .buffers import image_bytes
+from .trace import stage
+
+# Environment variable with the directory of the cache
+CACHE_DIR_VARIABLE = 'KRITA_SCRIPTS_CACHE_DIR'
+
+# Default limit of the total size of the cache files (bytes), 0 turns the cache off
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# zlib level of the tile data, low levels compress the mostly empty tiles fast and well enough
+COMPRESSION_LEVEL = 1
+
+# Start of every cache file, changes with the file layout
+MAGIC = b'KRC1'
+
+# File name extension of the cache entries
+ENTRY_EXTENSION = '.tiles'
+
+# Directory of the render_core sources, part of the code version of every entry
+PACKAGE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+# Function to get the directory of the cache
+def default_cache_directory():
+    directory = os.environ.get(CACHE_DIR_VARIABLE)
+    if directory:
+        return directory
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation) or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'krita-python-scripts', 'renders')
+
+
+# Function to get a hash of a file's contents, cached by its modification time and size
+@lru_cache(maxsize=None)
+def file_hash(path, mtime_ns, size):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+# Function to get a hash of the files' contents, changes whenever one of them is edited,
+# also a script edited and run again in the same Krita session
+def source_hash(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(file_hash(path, stat.st_mtime_ns, stat.st_size).encode('ascii'))
+    return digest.hexdigest()
+
+
+# Function to get the code version of a paint or draw function: its script and the render_core package
+def code_version(function):
+    function = inspect.unwrap(function)  # Decorated draw functions (render_core.trace.traced)
+    paths = sorted(os.path.join(PACKAGE_DIR, name) for name in os.listdir(PACKAGE_DIR) if name.endswith('.py'))
+    try:
+        script = inspect.getsourcefile(function)
+    except TypeError:
+        script = None
+    if script and os.path.isfile(script):
+        paths.insert(0, os.path.realpath(script))
+    return source_hash(*paths)
+
+
+# Function to turn a parameter into a JSON value that identifies it
+def parameter_value(value):
+    if isinstance(value, QColor):
+        return value.name(QColor.HexArgb)
+    if isinstance(value, QFont):
+        return value.toString()
+    if isinstance(value, (list, tuple)):
+        return [parameter_value(item) for item in value]
+    if hasattr(value, 'item'):
+        return value.item()  # NumPy numbers
+    return value
+
+
+class CacheEntry:
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.path = os.path.join(cache.directory, key + ENTRY_EXTENSION)
+        self.tiles = []
+        self.size = 0  # Bytes of the compressed tiles
+        self.too_large = False
+
+    # Set the cached tiles in the layer, returns False when the render is not cached
+    def upload(self, node):
+        if not self.cache.max_bytes:
+            return False
+        try:
+            with stage('cache read'):
+                with open(self.path, 'rb') as file:
+                    data = file.read()
+                tiles = self.read_tiles(data)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, zlib.error):
+            self.cache.remove(self.path)  # Broken entry (e.g. an interrupted disk), render again
+            return False
+
+        for x, y, w, h, pixels in tiles:
+            with stage('setPixelData', bytes=len(pixels)):
+                node.setPixelData(pixels, x, y, w, h)
+
+        # The modification time orders the entries for the eviction, a hit makes the entry recent
+        try:
+            os.utime(self.path)
+        except OSError:
+            pass
+        return True
+
+    # Function to split the file data into (x, y, w, h, pixel bytes) tiles
+    def read_tiles(self, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a render cache file.")
+        header_start = len(MAGIC) + 4
+        (header_size,) = struct.unpack('<I', data[len(MAGIC):header_start])
+        header = json.loads(data[header_start:header_start + header_size].decode('utf-8'))
+
+        tiles = []
+        position = header_start + header_size
+        for x, y, w, h, size in header['tiles']:
+            pixels = zlib.decompress(data[position:position + size])
+            if len(pixels) != w * h * 4:
+                raise ValueError("Truncated tile in render cache file.")
+            tiles.append((x, y, w, h, pixels))
+            position += size
+        return tiles
+
+    # Add an uploaded ARGB32 tile of the layer
+    def add_tile(self, x, y, image):
+        if not self.cache.max_bytes or self.too_large:
+            return
+        with stage('cache compress'):
+            pixels = zlib.compress(bytes(image_bytes(image)), COMPRESSION_LEVEL)
+        self.size += len(pixels)
+        if self.size > self.cache.max_bytes:
+            # The entry can never fit, the tiles compressed so far are dropped
+            self.too_large = True
+            self.tiles = []
+            return
+        self.tiles.append((x, y, image.width(), image.height(), pixels))
+
+    # Write the added tiles to the cache, unless the entry is larger than the whole cache
+    def commit(self):
+        if not self.cache.max_bytes:
+            return
+        header = json.dumps({'tiles': [[x, y, w, h, len(pixels)] for x, y, w, h, pixels in self.tiles]}).encode('utf-8')
+        if self.too_large or len(MAGIC) + 4 + len(header) + self.size > self.cache.max_bytes:
+            self.tiles = []
+            return
+        try:
+            os.makedirs(self.cache.directory, exist_ok=True)
+
+            # Write a temporary file and rename it, other runs never read half an entry
+            temporary_path = f'{self.path}.{os.getpid()}.tmp'
+            with stage('cache write'), open(temporary_path, 'wb') as file:
+                file.write(MAGIC)
+                file.write(struct.pack('<I', len(header)))
+                file.write(header)
+                for tile in self.tiles:
+                    file.write(tile[4])
+            os.replace(temporary_path, self.path)
+        except OSError as error:
+            # A full or read-only disk only costs the next run a render
+            print(f"Render cache not written: {error}")
+            return
+        finally:
+            self.tiles = []
+        self.cache.evict()
+
+
+class RenderCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_directory()
+        self.max_bytes = max_bytes
+
+    # Function to get the entry of a render: the paint function, the document size and all parameter values
+    def entry(self, function, width, height, *parameters):
+        identity = [function.__qualname__, code_version(function), width, height,
+                    [parameter_value(parameter) for parameter in parameters]]
+        key = hashlib.sha256(json.dumps(identity).encode('utf-8')).hexdigest()
+        return CacheEntry(self, key)
+
+    # Function to list the entries as (modification time, size, path), oldest first
+    def entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+
+        entries = []
+        for name in names:
+            if not name.endswith(ENTRY_EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Removed by another run meanwhile
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    # Remove the least recently used entries until the cache fits into max_bytes
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    # Remove all entries
+    def clear(self):
+        for mtime, size, path in self.entries():
+            self.remove(path)
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Shared cache of the scripts
+_render_cache = None
+
+
+# Function to get the shared render cache
+def render_cache():
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache()
+    return _render_cache
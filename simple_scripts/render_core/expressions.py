@@ -0,0 +1,155 @@
+"""
+Safe compiler for user-defined plot formulas.
+
+A formula such as "A*sin(x^2 + y^2)*K" is parsed once with the ast module,
+every node is checked against a whitelist (arithmetic, numbers, the allowed
+variable names and a set of NumPy functions), and the tree is compiled into a
+callable that evaluates the formula on whole NumPy arrays. Plot loops call it
+once per grid instead of interpreting the formula per sample.
+"""
+
+import ast
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Functions a formula may call, mapped to their vectorized NumPy implementation
+ALLOWED_FUNCTIONS = {
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'asin': np.arcsin,
+    'acos': np.arccos,
+    'atan': np.arctan,
+    'atan2': np.arctan2,
+    'sinh': np.sinh,
+    'cosh': np.cosh,
+    'tanh': np.tanh,
+    'sqrt': np.sqrt,
+    'exp': np.exp,
+    'log': np.log,
+    'log10': np.log10,
+    'abs': np.abs,
+    'floor': np.floor,
+    'ceil': np.ceil,
+    'sign': np.sign,
+    'min': np.minimum,
+    'max': np.maximum,
+    'hypot': np.hypot,
+}
+
+# Number of arguments of each function; NumPy would take an extra one as the array to write
+# the result into (sin(x, x) overwrites x)
+FUNCTION_ARGUMENTS = {name: 1 for name in ALLOWED_FUNCTIONS}
+FUNCTION_ARGUMENTS.update({'atan2': 2, 'min': 2, 'max': 2, 'hypot': 2})
+
+# Named constants a formula may use
+ALLOWED_CONSTANTS = {
+    'pi': np.pi,
+    'e': np.e,
+}
+
+ALLOWED_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub)
+
+
+class CompiledExpression:
+    def __init__(self, source, variables, constants, code):
+        self.source = source
+        self.variables = variables
+        self._constants = constants
+        self._code = code
+
+    # Evaluate the formula on arrays (or scalars) given as keyword arguments, e.g. f(x=xs, A=2)
+    def __call__(self, **values):
+        missing = [name for name in self.variables if name not in values]
+        if missing:
+            raise ValueError(f"Missing values for {', '.join(missing)} in formula: {self.source}")
+
+        # Inputs become float arrays, so scalar divisions by zero follow NumPy rules too
+        values = {name: np.asarray(value, dtype=np.float64) for name, value in values.items()}
+        namespace = dict(ALLOWED_FUNCTIONS)
+        namespace.update(ALLOWED_CONSTANTS)
+        namespace.update(self._constants)
+        namespace.update(values)
+        with np.errstate(all='ignore'):
+            result = eval(self._code, {'__builtins__': {}}, namespace)
+            result = np.asarray(result, dtype=np.float64)
+            # Division by zero and values outside a function's domain are plotted as 0
+            result = np.where(np.isfinite(result), result, 0.0)
+
+        # A formula that ignores some inputs still yields one value per input sample
+        shape = np.broadcast(*values.values(), result).shape
+        return np.broadcast_to(result, shape)
+
+
+# Function to check every node of a parsed formula against the whitelist
+def validate(tree, variables, source):
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.Load)):
+            continue
+        if isinstance(node, (ast.BinOp, ast.UnaryOp)):
+            if not isinstance(node.op, ALLOWED_OPERATORS):
+                raise ValueError(f"Operator {type(node.op).__name__} is not allowed in formula: {source}")
+        elif isinstance(node, ast.operator) or isinstance(node, ast.unaryop):
+            continue  # Operators are checked with their BinOp/UnaryOp
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f"Only numbers are allowed as constants in formula: {source}")
+        elif isinstance(node, ast.Name):
+            if node.id not in variables and node.id not in ALLOWED_CONSTANTS and node.id not in ALLOWED_FUNCTIONS:
+                raise ValueError(f"Unknown name '{node.id}' in formula: {source}")
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in ALLOWED_FUNCTIONS:
+                raise ValueError(f"Only the functions {', '.join(sorted(ALLOWED_FUNCTIONS))} can be called in formula: {source}")
+            if node.keywords:
+                raise ValueError(f"Keyword arguments are not allowed in formula: {source}")
+            expected = FUNCTION_ARGUMENTS[node.func.id]
+            if len(node.args) != expected:
+                raise ValueError(f"Function '{node.func.id}' takes {expected} argument{'s' if expected > 1 else ''}, "
+                                 f"got {len(node.args)} in formula: {source}")
+        else:
+            raise ValueError(f"{type(node).__name__} is not allowed in formula: {source}")
+
+    # A function name on its own (e.g. "sin + 1") is not a value
+    called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in ALLOWED_FUNCTIONS and id(node) not in called:
+            raise ValueError(f"Function '{node.id}' must be called in formula: {source}")
+
+
+# Function to parse, validate and compile a formula over the given variable names
+@lru_cache(maxsize=64)
+def compile_expression(source, variables):
+    # Accept "y = ..." / "z = ..." prefixes and ^ for powers, as written in the dialogs
+    expression = re.sub(r'^\s*[A-Za-z_]\w*\s*=(?!=)', '', source).strip()
+    expression = expression.replace('^', '**')
+    if not expression:
+        raise ValueError(f"Empty formula: {source}")
+
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as error:
+        raise ValueError(f"Invalid formula: {source} ({error.msg})") from None
+
+    variables = tuple(variables)
+    validate(tree, variables, source)
+
+    # Evaluate numbers as NumPy floats, so e.g. 1/0 or 9^9^9 give inf instead of raising
+    constants = {}
+    for node in ast.walk(tree):
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, ast.Constant):
+                name = f"_constant{len(constants)}"
+                constants[name] = np.float64(value.value)
+                setattr(node, field, ast.Name(id=name, ctx=ast.Load()))
+            elif isinstance(value, list):
+                for index, item in enumerate(value):
+                    if isinstance(item, ast.Constant):
+                        name = f"_constant{len(constants)}"
+                        constants[name] = np.float64(item.value)
+                        value[index] = ast.Name(id=name, ctx=ast.Load())
+    ast.fix_missing_locations(tree)
+
+    used = tuple(name for name in variables if any(isinstance(node, ast.Name) and node.id == name for node in ast.walk(tree)))
+    return CompiledExpression(source, used, constants, compile(tree, '<formula>', 'eval'))
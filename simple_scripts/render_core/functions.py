@@ -0,0 +1,65 @@
+"""
+Vectorized evaluation of the function plots in krita_test20_functions and
+krita_test21_func_3d.
+
+Preset and user-typed formulas go through the same path. They are compiled
+once by render_core.expressions and evaluated on whole NumPy arrays: all N
+graphs at once as an (N, width) array for the 2D plot, and the full grid for
+the 3D plot. Division by zero is masked to 0: a graph whose divisor is zero is
+flat, like the previous per-sample try/except.
+"""
+
+import numpy as np
+
+from .expressions import compile_expression
+
+# Formulas offered by the 2D dialog, in the order of the combo box
+FUNCTIONS = [
+    'y = A*sin((x+x0)/B) + C*cos((x+x0)*A)',
+    'y = B*sin((x+x0)/A) + C*cos((x+x0)/A)',
+    'y = A*sin((x+x0)*B) + A*C',
+]
+
+# Names a 2D formula may use
+FUNCTION_VARIABLES = ('x', 'x0', 'A', 'B', 'C')
+
+# Labels offered by the 3D dialog and the formulas they plot (A is already divided by 10)
+FUNCTIONS_3D = [
+    ('sin(A*(x^2 + y^2))/A', 'sin(A/2 * (x^2 + y^2)) * K'),
+    ('sin(A*x) * cos(A*y)/A', 'sin(A*x) * cos(A*K*y) * K'),
+    ('sin(A*sqrt(x^2 + y^2))', 'sin(A * sqrt(x^2 + y^2)) * K'),
+]
+
+# Names a 3D formula may use
+SURFACE_VARIABLES = ('x', 'y', 'A', 'K')
+
+# Range of x values mapped onto the canvas width
+X_MIN = -10
+X_MAX = 10
+
+
+# Function to map canvas columns 0..width-1 to x values in [X_MIN, X_MAX)
+def x_values(width):
+    return np.arange(width, dtype=np.float64) / width * (X_MAX - X_MIN) + X_MIN
+
+
+# Function to evaluate a 2D formula for every A value (rows) and x value (columns)
+def evaluate_functions(selected_function, A_values, B, C, x0, x):
+    function = compile_expression(selected_function, FUNCTION_VARIABLES)
+    A = np.asarray(A_values, dtype=np.float64)[:, np.newaxis]  # One row per graph
+    x = np.asarray(x, dtype=np.float64)[np.newaxis, :]
+    return function(x=x, x0=x0, A=A, B=B, C=C)
+
+
+# Function to get the formula behind a 3D dialog entry (a preset label or a typed formula)
+def surface_formula(selected_function):
+    for label, formula in FUNCTIONS_3D:
+        if selected_function == label:
+            return formula
+    return selected_function
+
+
+# Function to evaluate a 3D formula on a grid, A is scaled down by 10 like in the dialog
+def evaluate_surface(selected_function, A, K, x, y):
+    function = compile_expression(surface_formula(selected_function), SURFACE_VARIABLES)
+    return function(x=x, y=y, A=A / 10, K=K)
@@ -0,0 +1,105 @@
+"""
+Shared execution path of the generators.
+
+A generator is a paint function that takes its parameters and draws primitives
+with a QPainter, in the band painter contract of render_core.bands:
+
+    paint(painter, width, height, top, bottom, *arguments)
+
+It may return the area it drew, a QRect or a list of QRects: needed for drawing
+the recording does not bound (text, images), and when painting over the active
+layer only these areas are read back and written (render_core.tiles), so they
+must hold all of the drawing. None leaves the area to the recording. The same function paints the live preview (render_core.preview),
+the parallel bands (render_core.bands) and, through run_generator, the layer:
+
+    run_generator(paint_hexagons, "Hexagons", (hex_width, hex_color, spacing), vector=vector, per_tile=True)
+
+run_generator does everything around the painting once for all scripts: it
+takes the active document, creates the layer (render_core.vector.create_layer),
+reads the render cache (render_core.cache), records the drawing into a
+TiledLayer or SvgLayer, uploads the touched tiles and refreshes the projection.
+
+How the layer is rasterized depends on the drawing (see render_core.tiles):
+a small recording is replayed for each touched tile; one with many primitives
+is rasterized in bands of tile rows into one reused band buffer of at most
+MAX_RASTER_BYTES and cut into tiles; per_tile painters and drawing over the
+active layer (new_layer=False) always go tile by tile.
+
+Fill-style drawings that cover the whole canvas are cheaper to paint straight
+into every tile than to record: with per_tile the paint function also takes the left and
+right edge of the area, paint(painter, width, height, top, bottom, *arguments,
+left, right), and is called once per rasterized tile of the area painted(width,
+height) gives (the whole canvas by default).
+"""
+
+from PyQt5.QtCore import QRect
+
+from .tiles import TiledLayer
+from .cache import render_cache
+from .vector import SvgLayer, create_layer
+from .trace import stage
+
+
+# Function to paint a generator into a layer of the active document, returns the layer
+def run_generator(paint, layer_name, arguments, vector=False, per_tile=False, new_layer=True, cache=True,
+                  painted=None):
+    from krita import Krita
+
+    doc = Krita.instance().activeDocument()
+    if not doc:
+        raise Exception("No active document found.")
+
+    # Vector output always goes to a new vector layer, without new_layer the drawing is
+    # painted over the pixels of the active layer
+    if new_layer or vector:
+        layer = create_layer(doc, layer_name, vector)
+        doc.rootNode().addChildNode(layer, None)
+        doc.setActiveNode(layer)
+    else:
+        layer = doc.activeNode()
+    keep_content = not (new_layer or vector)
+
+    width = doc.width()
+    height = doc.height()
+
+    # A render with the same settings and document size is read from the render cache
+    cache_entry = None
+    if cache and not vector and not keep_content:
+        cache_entry = render_cache().entry(paint, width, height, *arguments)
+        if cache_entry.upload(layer):
+            with stage('refreshProjection'):
+                doc.refreshProjection()
+            return layer
+
+    if vector:
+        tiled_layer = SvgLayer(layer, width, height, doc.resolution())
+    else:
+        tiled_layer = TiledLayer(layer, width, height, keep_content=keep_content, cache_entry=cache_entry)
+
+    if per_tile:
+        # Each tile paints its own part of the drawing when it is rasterized
+        tiled_layer.add_tile_painter(lambda painter, area: paint(
+            painter, width, height, area.top(), area.bottom() + 1, *arguments, area.left(), area.right() + 1))
+        if painted is None:
+            tiled_layer.mark_all_dirty()
+        else:
+            area = painted(width, height)
+            if not area.isEmpty():
+                tiled_layer.mark_dirty(area.x(), area.y(), area.width(), area.height())
+    else:
+        # Record the drawing; only the tiles it touches are rasterized and uploaded
+        painter = tiled_layer.begin()
+        areas = paint(painter, width, height, 0, height, *arguments)
+        painter.end()
+        if isinstance(areas, QRect):
+            areas = [areas]
+        for area in areas or []:
+            tiled_layer.mark_dirty(area.x(), area.y(), area.width(), area.height())
+
+    # Rasterize the touched tiles and set them in the layer
+    tiled_layer.upload()
+
+    # Refresh the document to apply the changes
+    with stage('refreshProjection'):
+        doc.refreshProjection()
+    return layer
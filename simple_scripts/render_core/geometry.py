@@ -0,0 +1,48 @@
+"""
+Conversion of NumPy coordinate arrays into Qt geometry.
+
+Building one QPointF or QLineF per sample in Python costs more than computing
+the coordinates. polygon_from_arrays and lines_from_arrays allocate the Qt
+container once and write the coordinates straight into its memory through a
+NumPy view.
+"""
+
+import numpy as np
+from PyQt5 import sip
+from PyQt5.QtGui import QPolygonF
+from PyQt5.QtCore import QLineF
+
+
+# Function to build a QPolygonF from x and y coordinate arrays of the same length
+def polygon_from_arrays(xs, ys):
+    count = len(xs)
+    polygon = QPolygonF(count)
+    if count == 0:
+        return polygon
+
+    # QPolygonF stores its points as consecutive (x, y) pairs of doubles
+    buffer = polygon.data()
+    buffer.setsize(count * 2 * np.dtype(np.float64).itemsize)
+    coordinates = np.frombuffer(buffer, dtype=np.float64).reshape(count, 2)
+    coordinates[:, 0] = xs
+    coordinates[:, 1] = ys
+    return polygon
+
+
+# Function to build an array of QLineF for QPainter.drawLines from start and end coordinate arrays
+def lines_from_arrays(x1, y1, x2, y2):
+    count = len(x1)
+    if not hasattr(sip, 'array'):
+        # Older PyQt5 without sip.array: drawLines takes a list of QLineF
+        return [QLineF(*line) for line in np.column_stack((x1, y1, x2, y2)).tolist()]
+
+    # sip.array(QLineF) stores its lines as consecutive (x1, y1, x2, y2) doubles
+    lines = sip.array(QLineF, count)
+    if count == 0:
+        return lines
+    coordinates = np.frombuffer(memoryview(lines).cast('B'), dtype=np.float64).reshape(count, 4)
+    coordinates[:, 0] = x1
+    coordinates[:, 1] = y1
+    coordinates[:, 2] = x2
+    coordinates[:, 3] = y2
+    return lines
@@ -0,0 +1,86 @@
+"""
+Glyph atlas for grids of characters (krita_test18_random_chars).
+
+Drawing a grid with one drawText call per cell makes Qt lay out and rasterize
+the same few glyphs thousands of times. A GlyphAtlas rasterizes each character
+of an alphabet once into equally sized coverage cells, which draw_glyph_grid
+composes into a whole grid of characters as stamps (render_core.stamps).
+
+drawText on an ARGB32 image (the format of the layer tiles) moves every
+channel of a pixel towards the pen color by the glyph coverage. A glyph on
+transparent pixels is therefore stored as the premultiplied pen color, and
+overlapping glyphs add up like stamps do. The colored grid is drawn as an
+ARGB32 image holding those premultiplied values, which gives the pixels of
+the drawText calls. This holds for an opaque pen color only: drawText blends
+a translucent one over the pixels below, so such grids are drawn with drawText.
+
+Atlases are cached by font and alphabet, so repeated runs reuse them.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from PyQt5.QtGui import QImage, QPainter, QFont
+
+from .stamps import rasterize_coverage, compose_grid, color_pixels, draw_pixels
+
+# Transparent pixels kept around each glyph for antialiasing
+GLYPH_PADDING = 1
+
+
+class GlyphAtlas:
+    def __init__(self, font, characters):
+        self.characters = characters
+
+        # Measure the glyphs on an image, the device the atlas is drawn on
+        measure_image = QImage(1, 1, QImage.Format_ARGB32)
+        painter = QPainter(measure_image)
+        painter.setFont(font)
+        metrics = painter.fontMetrics()
+        painter.end()
+
+        bounds = [metrics.boundingRect(character) for character in characters]
+        padding = GLYPH_PADDING
+        left = min([0] + [rect.left() for rect in bounds]) - padding
+        right = max([metrics.horizontalAdvance(character) for character in characters] + [rect.right() + 1 for rect in bounds]) + padding
+        top = min([-metrics.ascent()] + [rect.top() for rect in bounds]) - padding
+        bottom = max([metrics.descent()] + [rect.bottom() + 1 for rect in bounds]) + padding
+
+        # Cell top-left corner relative to the drawText position (the start of the baseline)
+        self.origin_x = left
+        self.origin_y = top
+        self.width = right - left
+        self.height = bottom - top
+
+        # One coverage cell per character, each rasterized once
+        self.coverage = np.zeros((len(characters), self.height, self.width), dtype=np.uint8)
+        for index, character in enumerate(characters):
+            def paint(painter, character=character):
+                painter.setFont(font)
+                painter.drawText(-left, -top, character)
+            self.coverage[index] = rasterize_coverage(self.width, self.height, paint)
+
+
+@lru_cache(maxsize=32)
+def cached_atlas(font_description, characters):
+    font = QFont()
+    font.fromString(font_description)
+    return GlyphAtlas(font, characters)
+
+
+# Function to get the (cached) atlas of an alphabet for a font
+def glyph_atlas(font, characters):
+    return cached_atlas(font.toString(), characters)
+
+
+# Function to draw a grid of atlas characters in an opaque color, indices[i, j] is the character of row
+# first_row + i and column first_column + j; cell (row, column) is drawn like
+# drawText(column * step_x, row * step_y, character)
+def draw_glyph_grid(painter, atlas, color, indices, first_row, first_column, step_x, step_y):
+    indices = np.asarray(indices)
+    if indices.size == 0:
+        return
+
+    coverage = compose_grid(atlas.coverage, indices, step_x, step_y)
+    draw_pixels(painter, first_column * step_x + atlas.origin_x, first_row * step_y + atlas.origin_y,
+                color_pixels(coverage, color), QImage.Format_ARGB32)
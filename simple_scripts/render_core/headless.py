@@ -0,0 +1,352 @@
+"""
+Offscreen stand-in for the part of the Krita scripting API the generators use.
+
+The scripts talk to Krita through Krita.instance().activeDocument(),
+createNode / addChildNode, setPixelData and pixelData. This module offers the
+same calls backed by one QImage per paint layer, so the draw_* functions run
+unchanged outside Krita (see render_batch.py): call install() before loading
+a script with load_script(). Layer pixels use Krita's RGBA8
+layout (BGRA bytes, not premultiplied), which is QImage.Format_ARGB32 on
+little-endian machines.
+
+Vector layers (createVectorLayer / addShapesFromSvg) keep their SVG and are
+rasterized with QtSvg for the projection.
+
+Animated layers made with importAnimation keep the images of their keyframes
+(Node.keyframes) and show the first one.
+
+Documents are saved with exportImage: a flattened image for PNG/JPEG, an
+OpenRaster (.ora) file that keeps the layers and opens in Krita, or the SVG
+of the top vector layer (.svg).
+"""
+
+import importlib.util
+import os
+import sys
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+from PyQt5.QtGui import QGuiApplication, QImage, QPainter, QColor
+from PyQt5.QtCore import Qt, QBuffer, QByteArray, QIODevice, QRectF
+
+# Largest edge of the thumbnail stored in .ora files
+THUMBNAIL_SIZE = 256
+
+_application = None
+_loaded_scripts = {}
+
+
+# Function to start Qt without a display and put this module in place of the krita module
+def install():
+    global _application
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    if _application is None:
+        _application = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+    sys.modules['krita'] = sys.modules[__name__]
+
+
+# Function to import a generator script once, its main() only runs inside Krita
+def load_script(path):
+    module = _loaded_scripts.get(path)
+    if module is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _loaded_scripts[path] = module
+    return module
+
+
+class Node:
+    def __init__(self, document, name, node_type):
+        self.document = document
+        self._name = name
+        self._type = node_type
+        self._children = []
+        self._visible = True
+        self._opacity = 255
+        self._svg = None
+        self.image = None
+        # Frame number -> image of the keyframes of an animated layer
+        self.keyframes = {}
+        if node_type in ('paintlayer', 'vectorlayer'):
+            self.image = QImage(document.width(), document.height(), QImage.Format_ARGB32)
+            self.image.fill(Qt.transparent)
+
+    def name(self):
+        return self._name
+
+    def setName(self, name):
+        self._name = name
+
+    def type(self):
+        return self._type
+
+    def visible(self):
+        return self._visible
+
+    def setVisible(self, visible):
+        self._visible = visible
+
+    def opacity(self):
+        return self._opacity
+
+    def setOpacity(self, opacity):
+        self._opacity = opacity
+
+    def childNodes(self):
+        return list(self._children)
+
+    # Add a child node above the given sibling, or on top when above is None
+    def addChildNode(self, child, above):
+        if above is None or above not in self._children:
+            self._children.append(child)
+        else:
+            self._children.insert(self._children.index(above) + 1, child)
+        return True
+
+    def removeChildNode(self, child):
+        if child not in self._children:
+            return False
+        self._children.remove(child)
+        return True
+
+    # Add the shapes of an SVG document to a vector layer, like VectorLayer.addShapesFromSvg in Krita
+    def addShapesFromSvg(self, svg):
+        if self._type != 'vectorlayer':
+            raise Exception(f"Node '{self._name}' is not a vector layer.")
+        from PyQt5.QtSvg import QSvgRenderer
+
+        renderer = QSvgRenderer(QByteArray(svg.encode('utf-8')))
+        if not renderer.isValid():
+            raise Exception(f"Invalid SVG for vector layer '{self._name}'.")
+        painter = QPainter(self.image)
+        renderer.render(painter, QRectF(0, 0, self.image.width(), self.image.height()))
+        painter.end()
+        self._svg = svg
+        return []  # Krita returns the new shapes, the stand-in does not model them
+
+    # SVG of the vector layer (the stand-in keeps the last added document)
+    def toSvg(self):
+        return self._svg or ''
+
+    # Copy raw BGRA pixels into the layer at (x, y), like Node.setPixelData in Krita
+    def setPixelData(self, data, x, y, w, h):
+        if self.image is None:
+            raise Exception(f"Node '{self._name}' has no pixels.")
+        source = QImage(bytes(data), w, h, QImage.Format_ARGB32)
+        painter = QPainter(self.image)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawImage(x, y, source)
+        painter.end()
+
+    # Read raw BGRA pixels of an area, pixels outside the document are transparent
+    def pixelData(self, x, y, w, h):
+        if self.image is None:
+            raise Exception(f"Node '{self._name}' has no pixels.")
+        area = self.image.copy(x, y, w, h)
+        bits = area.constBits()
+        bits.setsize(area.byteCount())
+        return QByteArray(bits.asstring())
+
+
+class Document:
+    def __init__(self, width, height, name='Untitled', background=None, resolution=300.0):
+        self._width = width
+        self._height = height
+        self._name = name
+        self._resolution = resolution
+        self._root = Node(self, 'root', 'grouplayer')
+        self._active = None
+        self._filename = ''
+        self._clip_range = (0, 100)
+
+        # Like Krita's new document dialog: a background layer filled with a color
+        if background is not None:
+            layer = self.createNode('Background', 'paintlayer')
+            layer.image.fill(QColor(background))
+            self._root.addChildNode(layer, None)
+            self._active = layer
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def name(self):
+        return self._name
+
+    def resolution(self):
+        return int(self._resolution)
+
+    def fileName(self):
+        return self._filename
+
+    def rootNode(self):
+        return self._root
+
+    def createNode(self, name, node_type):
+        return Node(self, name, node_type)
+
+    def createVectorLayer(self, name):
+        return Node(self, name, 'vectorlayer')
+
+    def activeNode(self):
+        if self._active is None:
+            # Krita always has an active layer, create one for an empty document
+            self._active = self.createNode('Paint Layer 1', 'paintlayer')
+            self._root.addChildNode(self._active, None)
+        return self._active
+
+    def setActiveNode(self, node):
+        self._active = node
+
+    def refreshProjection(self):
+        pass  # The projection is composed on demand
+
+    def fullClipRangeStartTime(self):
+        return self._clip_range[0]
+
+    def fullClipRangeEndTime(self):
+        return self._clip_range[1]
+
+    def setFullClipRangeEndTime(self, end):
+        self._clip_range = (self._clip_range[0], end)
+
+    # Put image files into a new animated paint layer, one keyframe every step frames from first_frame on;
+    # the layer shows the first one
+    def importAnimation(self, files, first_frame, step):
+        layer = self.createNode('Animation', 'paintlayer')
+        for index, path in enumerate(files):
+            image = QImage(path)
+            if image.isNull():
+                return False
+            layer.keyframes[first_frame + index * step] = image.convertToFormat(QImage.Format_ARGB32)
+        if layer.keyframes:
+            layer.image = layer.keyframes[min(layer.keyframes)].copy()
+        self._root.addChildNode(layer, None)
+        self._active = layer
+        return True
+
+    # Paint layers from bottom to top, including those inside group layers
+    def paint_layers(self, node=None):
+        layers = []
+        for child in (node or self._root).childNodes():
+            if not child.visible():
+                continue
+            if child.image is not None:
+                layers.append(child)
+            layers.extend(self.paint_layers(child))
+        return layers
+
+    # Flattened image of all visible layers, like Document.projection in Krita
+    def projection(self, x=0, y=0, w=None, h=None):
+        image = QImage(self._width, self._height, QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        for layer in self.paint_layers():
+            painter.setOpacity(layer.opacity() / 255)
+            painter.drawImage(0, 0, layer.image)
+        painter.end()
+
+        if w is None or h is None:
+            return image
+        return image.copy(x, y, w, h)
+
+    # Save the document, the file extension selects flattened image or layered .ora
+    def exportImage(self, filename, exportConfiguration=None):
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if filename.lower().endswith('.ora'):
+            write_openraster(self, filename)
+        elif filename.lower().endswith('.svg'):
+            vector_layers = [layer for layer in self.paint_layers() if layer.type() == 'vectorlayer']
+            if not vector_layers:
+                raise Exception(f"No vector layer to save as SVG: {filename}")
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.write(vector_layers[-1].toSvg())
+        elif not self.projection().save(filename):
+            raise Exception(f"Could not save image: {filename}")
+        self._filename = filename
+        return True
+
+    def close(self):
+        self._root = Node(self, 'root', 'grouplayer')
+        self._active = None
+        return True
+
+
+class Krita:
+    _instance = None
+
+    def __init__(self):
+        self._documents = []
+        self._active = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def documents(self):
+        return list(self._documents)
+
+    def activeDocument(self):
+        return self._active
+
+    def setActiveDocument(self, document):
+        self._active = document
+
+    def createDocument(self, width, height, name='Untitled', colorModel='RGBA', colorDepth='U8',
+                       profile='', resolution=300.0, background=None):
+        document = Document(width, height, name, background, resolution)
+        self._documents.append(document)
+        return document
+
+    # Forget a document, so a long batch does not keep every rendered image in memory
+    def closeDocument(self, document):
+        document.close()
+        if document in self._documents:
+            self._documents.remove(document)
+        if self._active is document:
+            self._active = None
+
+
+# Function to encode a QImage as PNG bytes
+def png_bytes(image):
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    buffer.close()
+    return bytes(data)
+
+
+# Function to write a document as an OpenRaster file, one PNG per paint layer
+def write_openraster(document, filename):
+    layers = document.paint_layers()
+    entries = []
+    for index, layer in enumerate(reversed(layers)):  # stack.xml lists the top layer first
+        entries.append(f'  <layer name={quoteattr(layer.name())} src="data/layer{index}.png" x="0" y="0" '
+                       f'opacity="{layer.opacity() / 255:.3f}" visibility="visible"/>')
+    stack = (
+        "<?xml version='1.0' encoding='UTF-8'?>\n"
+        f'<image version="0.0.1" w="{document.width()}" h="{document.height()}">\n'
+        ' <stack>\n' + '\n'.join(entries) + '\n </stack>\n</image>\n'
+    )
+
+    merged = document.projection()
+    thumbnail = merged.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as archive:
+        # The mimetype entry must come first and stay uncompressed
+        archive.writestr(zipfile.ZipInfo('mimetype'), 'image/openraster', compress_type=zipfile.ZIP_STORED)
+        archive.writestr('stack.xml', stack)
+        for index, layer in enumerate(reversed(layers)):
+            archive.writestr(f'data/layer{index}.png', png_bytes(layer.image))
+        archive.writestr('mergedimage.png', png_bytes(merged))
+        archive.writestr('Thumbnails/thumbnail.png', png_bytes(thumbnail))
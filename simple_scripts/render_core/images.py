@@ -0,0 +1,134 @@
+"""
+Import of image files that are drawn zoomed onto the canvas.
+
+Loading the whole file and scaling all of it by the zoom factor makes a large
+scan zoomed 20x take gigabytes, even when only a corner lands on the canvas.
+visible_source_rect works out which source pixels are visible, read_region
+decodes only those with QImageReader's clip rect (JPEG decodes just that part,
+formats without clip rect support are cut right after decoding) and the zoom
+is applied to that region only, so the zoomed image is never larger than the
+canvas.
+
+Integer zoom factors need no zoomed image at all: zoom_into writes every source
+pixel as a zoom x zoom block straight into the destination pixels (a tile of
+the layer), clipped to it. Each visible source row is widened once with
+np.take and broadcast into its zoom destination rows.
+"""
+
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+from PyQt5.QtGui import QImage, QImageReader, QPaintEngine, QTransform
+from PyQt5.QtCore import QRect
+
+from .pool import image_pixels
+
+
+# Function to get the size of an image file from its header, without decoding it
+def image_size(path):
+    reader = QImageReader(path)
+    size = reader.size()
+    if not size.isValid():
+        raise Exception(f"Cannot read image '{path}': {reader.errorString()}")
+    return size
+
+
+# Function to get the source pixels of an image of source_size, drawn at (x, y) zoomed by zoom_factor,
+# that land on the canvas (an empty QRect when none do)
+def visible_source_rect(source_size, x, y, zoom_factor, canvas):
+    drawn = QRect(x, y, source_size.width() * zoom_factor, source_size.height() * zoom_factor)
+    visible = drawn.intersected(canvas)
+    if visible.isEmpty():
+        return QRect()
+
+    # Source pixel i covers the canvas pixels x + i * zoom .. x + (i + 1) * zoom - 1
+    left = (visible.left() - x) // zoom_factor
+    top = (visible.top() - y) // zoom_factor
+    right = math.ceil((visible.right() + 1 - x) / zoom_factor)
+    bottom = math.ceil((visible.bottom() + 1 - y) / zoom_factor)
+    return QRect(left, top, right - left, bottom - top)
+
+
+# Function to decode only the source_rect part of an image file
+def read_region(path, source_rect):
+    reader = QImageReader(path)
+    reader.setClipRect(source_rect)
+    image = reader.read()
+    if image.isNull():
+        raise Exception(f"Cannot read image '{path}': {reader.errorString()}")
+    return image
+
+
+# Function to decode the part of an image file that lands on a width x height canvas, as ARGB32,
+# returns (source rect, image) or (empty QRect, None); the last one is kept for the tiles of a render
+def visible_region(path, x, y, zoom_factor, width, height):
+    return _visible_region(path, os.path.getmtime(path), x, y, zoom_factor, width, height)
+
+
+@lru_cache(maxsize=1)
+def _visible_region(path, modified, x, y, zoom_factor, width, height):
+    source_rect = visible_source_rect(image_size(path), x, y, zoom_factor, QRect(0, 0, width, height))
+    if source_rect.isEmpty():
+        return source_rect, None
+    return source_rect, read_region(path, source_rect).convertToFormat(QImage.Format_ARGB32)
+
+
+# Function to drop the region kept by visible_region
+def release_visible_region():
+    _visible_region.cache_clear()
+
+
+# Function to write the pixels of source enlarged zoom_factor times into destination, source pixel (0, 0)
+# at (x, y); both are (height, width) uint32 arrays, the part outside destination is clipped
+def zoom_into(destination, source, x, y, zoom_factor):
+    destination_height, destination_width = destination.shape
+    source_height, source_width = source.shape
+    left = max(x, 0)
+    top = max(y, 0)
+    right = min(x + source_width * zoom_factor, destination_width)
+    bottom = min(y + source_height * zoom_factor, destination_height)
+    if left >= right or top >= bottom:
+        return
+
+    # The visible source rows, widened to the destination columns (zoom_factor times narrower than the target)
+    first_row = (top - y) // zoom_factor
+    last_row = (bottom - 1 - y) // zoom_factor
+    columns = (np.arange(left, right) - x) // zoom_factor
+    widened = np.take(source[first_row:last_row + 1], columns, axis=1)
+
+    # The first and last source rows can be cut by the clipping, the rows between fill whole blocks
+    target = destination[top:bottom, left:right]
+    rows = bottom - top
+    head = min(y + (first_row + 1) * zoom_factor - top, rows)
+    target[:head] = widened[0]
+    blocks = (rows - head) // zoom_factor
+    if blocks:
+        # Splitting the row axis keeps a view of the destination, the broadcast writes into it
+        target[head:head + blocks * zoom_factor].reshape(blocks, zoom_factor, right - left)[...] = \
+            widened[1:1 + blocks, np.newaxis, :]
+    if head + blocks * zoom_factor < rows:
+        target[head + blocks * zoom_factor:] = widened[1 + blocks]
+
+
+# Function to check if a painter paints straight into an ARGB32 QImage, only moved by whole pixels
+def is_pixel_painter(painter):
+    if painter.paintEngine().type() != QPaintEngine.Raster:
+        return False
+    device = painter.device()
+    transform = painter.transform()
+    return (isinstance(device, QImage) and device.format() == QImage.Format_ARGB32
+            and transform.type() <= QTransform.TxTranslate
+            and transform.dx() == int(transform.dx()) and transform.dy() == int(transform.dy()))
+
+
+# Function to draw an image enlarged zoom_factor times at (x, y): with zoom_into on a pixel painter
+# (the pixels replace the ones below, like on a new layer), with drawImage on other painters
+def draw_zoomed(painter, x, y, image, zoom_factor):
+    if is_pixel_painter(painter):
+        transform = painter.transform()
+        zoom_into(image_pixels(painter.device()), image_pixels(image, writable=False),
+                  x + int(transform.dx()), y + int(transform.dy()), zoom_factor)
+    else:
+        painter.drawImage(QRect(x, y, image.width() * zoom_factor, image.height() * zoom_factor), image)
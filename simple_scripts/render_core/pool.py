@@ -0,0 +1,122 @@
+"""
+Pool of reusable QImage buffers.
+
+Every tile of every generator run used to be rasterized into a new QImage that
+was filled transparent first, and a batch of renders allocated and cleared the
+same tile sizes over and over. The image pool keeps released images by
+(width, height, format) and hands them out again:
+
+    image = image_pool().acquire(width, height)  # Transparent, like a new image
+    ...
+    image_pool().release(image, painted_area)
+
+The caller tells on release which area it painted (the whole image when it does
+not know), only that area is cleared when the image is handed out again; an
+image released with an empty area (nothing was drawn) is reused as it is.
+acquire(..., clear=False) skips the clearing for callers that overwrite every
+pixel.
+
+Idle images take at most max_bytes, the least recently released ones are
+dropped first. The KRITA_SCRIPTS_POOL_MB environment variable changes the
+limit, 0 turns the pool off.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PyQt5.QtGui import QImage
+from PyQt5.QtCore import Qt
+
+# Environment variable with the limit of the idle images in megabytes
+POOL_SIZE_VARIABLE = 'KRITA_SCRIPTS_POOL_MB'
+
+# Default limit of the idle images (bytes), enough for the tiles of a few layers
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+# Function to get the pixels of a 32-bit QImage as a (height, width) uint32 array (no copy),
+# read-only without writable
+def image_pixels(image, writable=True):
+    # bits detaches the image from other copies, it is written to; constBits shares them
+    bits = image.bits() if writable else image.constBits()
+    bits.setsize(image.byteCount())
+    return np.frombuffer(bits, dtype=np.uint32).reshape(image.height(), image.bytesPerLine() // 4)[:, :image.width()]
+
+
+class ImagePool:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.idle_bytes = 0
+        self.allocated = 0
+        self.reused = 0
+        # Idle images in release order: serial number -> ((width, height, format), image, painted area)
+        self._idle = OrderedDict()
+        self._serial = 0
+        self._lock = threading.Lock()
+
+    # Function to get a transparent image (or one with undefined pixels without clear)
+    def acquire(self, width, height, image_format=QImage.Format_ARGB32, clear=True):
+        key = (width, height, image_format)
+        with self._lock:
+            found = None
+            for serial in reversed(self._idle):
+                if self._idle[serial][0] == key:
+                    found = serial
+                    break
+            if found is not None:
+                key, image, painted = self._idle.pop(found)
+                self.idle_bytes -= image.byteCount()
+                self.reused += 1
+            else:
+                self.allocated += 1
+
+        if found is None:
+            image = QImage(width, height, image_format)
+            if clear:
+                image.fill(Qt.transparent)
+        elif clear and not painted.isEmpty():
+            # Only the area painted before the image was released needs clearing
+            if painted == image.rect():
+                image.fill(Qt.transparent)
+            else:
+                image_pixels(image)[painted.top():painted.bottom() + 1, painted.left():painted.right() + 1] = 0
+        return image
+
+    # Give an image back to the pool, painted is the area drawn on it since acquire (None: all of it)
+    def release(self, image, painted=None):
+        painted = image.rect() if painted is None else painted.intersected(image.rect())
+        size = image.byteCount()
+        if size > self.max_bytes:
+            return
+
+        key = (image.width(), image.height(), image.format())
+        with self._lock:
+            self._serial += 1
+            self._idle[self._serial] = (key, image, painted)
+            self.idle_bytes += size
+
+            # Drop the least recently released images over the limit
+            while self.idle_bytes > self.max_bytes:
+                key, dropped, painted = self._idle.popitem(last=False)[1]
+                self.idle_bytes -= dropped.byteCount()
+
+    # Drop all idle images
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+            self.idle_bytes = 0
+
+
+# Shared pool of the scripts
+_image_pool = None
+
+
+# Function to get the shared image pool
+def image_pool():
+    global _image_pool
+    if _image_pool is None:
+        megabytes = os.environ.get(POOL_SIZE_VARIABLE)
+        _image_pool = ImagePool() if megabytes is None else ImagePool(int(float(megabytes) * 1024 * 1024))
+    return _image_pool
@@ -0,0 +1,214 @@
+"""
+Live preview of a generator in its settings dialog.
+
+PreviewPane is a widget that shows the active document scaled down to
+PREVIEW_SIZE. The dialog passes the current settings to request() whenever
+one of them changes (connect_changes). The pane waits until the settings stay
+the same for DEBOUNCE_MS, then a PreviewRenderer thread paints the preview
+with the generator's band painter paint(painter, width, height, top, bottom,
+*arguments) (see render_core.bands): first at a fraction of the pane size,
+then refined to the full pane size.
+
+A pass is painted in bands of PREVIEW_BAND_ROWS preview rows, each band calls
+the painter with its own top..bottom rows, so it draws only the shapes reaching
+into them. A newer request abandons a pass between two bands, so a slow
+generator does not finish a preview of stale settings, and results of old
+requests are dropped when they arrive late.
+"""
+
+import math
+
+from PyQt5.QtWidgets import QLabel, QSpinBox, QDoubleSpinBox, QComboBox, QCheckBox
+from PyQt5.QtGui import QImage, QPainter, QPixmap
+from PyQt5.QtCore import Qt, QThread, QTimer, QMutex, QMutexLocker, QWaitCondition, QSize, pyqtSignal
+
+# Longest edge of the preview (pixels)
+PREVIEW_SIZE = 320
+
+# Quiet time after the last change before the preview is rendered (milliseconds)
+DEBOUNCE_MS = 150
+
+# Preview passes, as fractions of the pane size: a quick coarse one, then the full one
+REFINE_SCALES = (0.25, 1.0)
+
+# Rows of the preview painted at once, a newer request is noticed between two bands
+PREVIEW_BAND_ROWS = 64
+
+# Document size shown when there is no active document
+DEFAULT_DOCUMENT_SIZE = (1024, 1024)
+
+
+# Function to get the size of the active document, the preview shows it scaled down
+def active_document_size():
+    from krita import Krita
+
+    doc = Krita.instance().activeDocument()
+    if doc is None:
+        return DEFAULT_DOCUMENT_SIZE
+    return doc.width(), doc.height()
+
+
+# Function to get the preview size of a document, keeping its aspect ratio
+def preview_size(width, height, longest_edge=PREVIEW_SIZE):
+    scale = longest_edge / max(width, height, 1)
+    return QSize(max(1, round(width * scale)), max(1, round(height * scale)))
+
+
+# Function to call slot whenever one of the widgets changes its value
+def connect_changes(slot, *widgets):
+    for widget in widgets:
+        if isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+            widget.valueChanged.connect(slot)
+        elif isinstance(widget, QComboBox):
+            widget.currentIndexChanged.connect(slot)
+            if widget.isEditable():
+                widget.editTextChanged.connect(slot)  # A typed text (a formula) is not an index change
+        elif isinstance(widget, QCheckBox):
+            widget.toggled.connect(slot)
+        else:
+            raise Exception(f"Cannot watch changes of {type(widget).__name__}.")
+
+
+class PreviewRenderer(QThread):
+    # Signals: a finished pass (image, request number) and a failed render (message, request number)
+    rendered = pyqtSignal(QImage, int)
+    failed = pyqtSignal(str, int)
+
+    def __init__(self, paint, width, height, parent=None):
+        super().__init__(parent)
+        self.paint = paint
+        self.width = width
+        self.height = height
+        self._mutex = QMutex()
+        self._condition = QWaitCondition()
+        self._request = None
+        self._request_number = 0
+        self._stopping = False
+
+    # Queue a render of the preview at size with the painter arguments, replacing any older request
+    def request(self, size, arguments):
+        with QMutexLocker(self._mutex):
+            self._request_number += 1
+            self._request = (self._request_number, size, tuple(arguments))
+            self._condition.wakeOne()
+            return self._request_number
+
+    # Stop the thread and wait for it (the current band is finished first)
+    def stop(self):
+        with QMutexLocker(self._mutex):
+            self._stopping = True
+            self._condition.wakeOne()
+        self.wait()
+
+    def is_stale(self, number):
+        with QMutexLocker(self._mutex):
+            return self._stopping or number != self._request_number
+
+    def run(self):
+        while True:
+            with QMutexLocker(self._mutex):
+                while self._request is None and not self._stopping:
+                    self._condition.wait(self._mutex)
+                if self._stopping:
+                    return
+                number, size, arguments = self._request
+                self._request = None
+
+            try:
+                for scale in REFINE_SCALES:
+                    image = self.render(size * scale, arguments, number)
+                    if image is None:
+                        break  # A newer request replaced this one
+                    self.rendered.emit(image, number)
+            except Exception as error:
+                self.failed.emit(str(error), number)
+
+    # Render one pass of the whole document at size, band by band, returns None when request number got stale
+    def render(self, size, arguments, number):
+        image = QImage(max(1, size.width()), max(1, size.height()), QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+        scale_x = image.width() / self.width
+        scale_y = image.height() / self.height
+        painter = QPainter(image)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        try:
+            for row in range(0, image.height(), PREVIEW_BAND_ROWS):
+                if self.is_stale(number):
+                    return None
+                rows = min(PREVIEW_BAND_ROWS, image.height() - row)
+                # Document rows shown in the band, the painter draws the shapes reaching into them
+                top = math.floor(row / scale_y)
+                bottom = min(self.height, math.ceil((row + rows) / scale_y))
+                band = QImage(image.width(), rows, QImage.Format_ARGB32)
+                band.fill(Qt.transparent)
+                band_painter = QPainter(band)
+                try:
+                    band_painter.setRenderHint(QPainter.Antialiasing)
+                    band_painter.setRenderHint(QPainter.SmoothPixmapTransform)
+                    # The painter works in document coordinates
+                    band_painter.translate(0, -row)
+                    band_painter.scale(scale_x, scale_y)
+                    self.paint(band_painter, self.width, self.height, top, bottom, *arguments)
+                finally:
+                    band_painter.end()
+                painter.drawImage(0, row, band)
+        finally:
+            painter.end()
+        return image
+
+
+class PreviewPane(QLabel):
+    def __init__(self, paint, width, height, parent=None):
+        super().__init__(parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.setFixedSize(preview_size(width, height))
+        self.setStyleSheet('background-color: white; color: gray;')
+        self.setText('Preview')
+
+        self._arguments = None
+        self._number = 0
+
+        # Render only when the settings stop changing for a moment
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DEBOUNCE_MS)
+        self.timer.timeout.connect(self.start_render)
+
+        self.renderer = PreviewRenderer(paint, width, height)
+        self.renderer.rendered.connect(self.show_image)
+        self.renderer.failed.connect(self.show_error)
+        self.renderer.start()
+
+        # The thread must end with the dialog
+        if parent is not None and hasattr(parent, 'finished'):
+            parent.finished.connect(self.stop)
+
+    # Show a preview of the painter arguments once they stop changing
+    def request(self, arguments):
+        self._arguments = arguments
+        self.timer.start()
+
+    def start_render(self):
+        if self._arguments is not None:
+            self._number = self.renderer.request(self.size(), self._arguments)
+
+    def show_image(self, image, number):
+        if number != self._number:
+            return  # Result of settings that changed since
+
+        # Coarse passes are scaled up to the pane, shown on white like a new document
+        canvas = QImage(self.size(), QImage.Format_ARGB32)
+        canvas.fill(Qt.white)
+        painter = QPainter(canvas)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawImage(canvas.rect(), image)
+        painter.end()
+        self.setPixmap(QPixmap.fromImage(canvas))
+
+    def show_error(self, message, number):
+        if number == self._number:
+            self.setText(f'No preview:\n{message}')
+
+    def stop(self):
+        self.timer.stop()
+        self.renderer.stop()
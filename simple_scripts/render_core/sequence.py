@@ -0,0 +1,252 @@
+"""
+Animated frame sequences of a generator with swept parameters.
+
+A sequence paints one generator many times, each frame with some parameters
+moved a step from a start to an end value (sweep_values), and saves the frames
+as a numbered PNG sequence (frame_path: 'clock_####.png' -> clock_0000.png,
+clock_0001.png, ...). Inside Krita draw_sequence paints the frames and puts
+them into a new animated layer, one keyframe per frame (import_frames).
+
+Frames are painted by a paint function of a script (render_core.generator),
+found by name so that worker processes can load it; its parameters are taken
+by name from the frame's parameter values:
+
+    renderer = SequenceRenderer(workers=8)
+    frames = frame_parameters({'circle_distance': 50, 'N': 6, ...}, {'rotation': (0, 60)}, 60)
+    renderer.render(script_path, 'paint_clock_lines', frames, 1024, 1024, 'out/clock_####.png',
+                    static_name='paint_clock_circles')
+
+Parts of a drawing that do not move (the circles of the clock while its lines
+turn) go into a static painter. It is painted once and every frame starts from
+a copy of it; it is painted again only when one of its own parameters changes.
+The moving parts are painted over the copy in the same order as the whole
+paint function paints them, so a frame has the same pixels as painting
+everything at once. (Layers of run_generator can differ from it by a few edge
+pixels of curves: they replay a QPicture recording.)
+
+With more than one worker the frames are painted by worker processes, started
+on the first render (see render_core.bands: not inside Krita). Each worker
+keeps its own static layer.
+"""
+
+import inspect
+import json
+import math
+import os
+import re
+import tempfile
+from multiprocessing import get_context
+
+from PyQt5.QtGui import QImage, QPainter, QColor
+from PyQt5.QtCore import Qt
+
+from .bands import init_worker, pack_arguments, unpack_arguments
+from .cache import parameter_value
+from .trace import stage
+
+# Parameters of every paint function before its own ones
+PAINT_PARAMETERS = 5
+
+# Number of digits of the frame numbers when the output pattern has no '#'
+DEFAULT_DIGITS = 4
+
+
+# Function to get the values of a parameter swept from start to end (both included) over the frames,
+# whole numbers when the parameter is an int
+def sweep_values(start, end, frames, integer=False):
+    if frames < 1:
+        raise ValueError(f"A sequence needs at least one frame, got {frames}")
+    values = [start + (end - start) * frame / (frames - 1) if frames > 1 else start for frame in range(frames)]
+    return [int(round(value)) for value in values] if integer else values
+
+
+# Function to get the parameter values of every frame: the fixed values with the swept ones replaced,
+# sweeps maps a parameter name to its (start, end)
+def frame_parameters(parameters, sweeps, frames):
+    unknown = [name for name in sweeps if name not in parameters]
+    if unknown:
+        raise ValueError(f"Unknown swept parameters: {', '.join(unknown)}")
+
+    swept = {}
+    for name, (start, end) in sweeps.items():
+        integer = isinstance(parameters[name], int) and not isinstance(parameters[name], bool)
+        swept[name] = sweep_values(start, end, frames, integer)
+    return [dict(parameters, **{name: values[frame] for name, values in swept.items()}) for frame in range(frames)]
+
+
+# Function to get the file name of a frame: the last run of '#' in the pattern becomes the zero-padded
+# frame number, a pattern without '#' gets _0000 before its extension
+def frame_path(pattern, frame):
+    runs = list(re.finditer('#+', os.path.basename(pattern)))
+    if not runs:
+        root, extension = os.path.splitext(pattern)
+        return f'{root}_{frame:0{DEFAULT_DIGITS}d}{extension}'
+    start = len(pattern) - len(os.path.basename(pattern)) + runs[-1].start()
+    digits = len(runs[-1].group())
+    return f'{pattern[:start]}{frame:0{digits}d}{pattern[start + digits:]}'
+
+
+# Function to get the arguments of a paint function from the named parameter values
+def paint_arguments(paint, parameters):
+    arguments = []
+    for name, parameter in list(inspect.signature(paint).parameters.items())[PAINT_PARAMETERS:]:
+        if name in parameters:
+            arguments.append(parameters[name])
+        elif parameter.default is inspect.Parameter.empty:
+            raise ValueError(f"No value for parameter {name} of {paint.__name__}")
+        else:
+            break  # Parameters with a default (the tile edges of per-tile painters) keep it
+    return arguments
+
+
+# Function to paint a painter over the whole canvas into a transparent ARGB32 image
+def paint_image(paint, arguments, width, height):
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    try:
+        paint(painter, width, height, 0, height, *arguments)
+    finally:
+        painter.end()
+    return image
+
+
+class FramePainter:
+    def __init__(self, paint, static=None):
+        self.paint = paint
+        self.static = static
+        # The last static layer and the parameter values it was painted with
+        self._static_key = None
+        self._static_image = None
+
+    # Function to get the static layer for the parameter values of a frame
+    def static_layer(self, parameters, width, height):
+        arguments = paint_arguments(self.static, parameters)
+        key = json.dumps([width, height, [parameter_value(argument) for argument in arguments]])
+        if key != self._static_key:
+            self._static_image = paint_image(self.static, arguments, width, height)
+            self._static_key = key
+        return self._static_image
+
+    # Function to paint one frame, flattened over the background color when one is given (None: transparent)
+    def frame(self, parameters, width, height, background=None):
+        # The frame's layer: the moving parts painted over a copy of the static layer
+        arguments = paint_arguments(self.paint, parameters)
+        if self.static is None:
+            layer = paint_image(self.paint, arguments, width, height)
+        else:
+            layer = self.static_layer(parameters, width, height).copy()
+            painter = QPainter(layer)
+            try:
+                self.paint(painter, width, height, 0, height, *arguments)
+            finally:
+                painter.end()
+        if not background:
+            return layer
+
+        # Like the projection of a document with a background layer
+        image = QImage(width, height, QImage.Format_ARGB32)
+        image.fill(QColor(background))
+        painter = QPainter(image)
+        painter.drawImage(0, 0, layer)
+        painter.end()
+        return image
+
+
+# Frame painters of this process by (script, paint function, static painter)
+_frame_painters = {}
+
+
+# Function to paint one frame and save it, returns the file name (runs in a worker or in this process)
+def render_frame(task):
+    from .headless import load_script
+
+    script_path, paint_name, static_name, parameters, width, height, background, path = task
+    key = (script_path, paint_name, static_name)
+    frame_painter = _frame_painters.get(key)
+    if frame_painter is None:
+        script = load_script(script_path)
+        frame_painter = FramePainter(getattr(script, paint_name), static_name and getattr(script, static_name))
+        _frame_painters[key] = frame_painter
+
+    names = list(parameters)
+    parameters = dict(zip(names, unpack_arguments(list(parameters.values()))))
+    save_frame(frame_painter.frame(parameters, width, height, background), path)
+    return path
+
+
+# Save a frame image
+def save_frame(image, path):
+    with stage('save frame'):
+        if not image.save(path):
+            raise Exception(f"Cannot write frame '{path}'.")
+
+
+class SequenceRenderer:
+    def __init__(self, workers=1):
+        self.workers = workers or os.cpu_count()
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    # Render the frames (parameter values of each) of a paint function of a script and save them under
+    # the output pattern, returns the file names
+    def render(self, script_path, paint_name, frames, width, height, output, static_name=None, background=None):
+        directory = os.path.dirname(os.path.abspath(output))
+        os.makedirs(directory, exist_ok=True)
+        tasks = [(script_path, paint_name, static_name,
+                  dict(zip(parameters, pack_arguments(list(parameters.values())))),
+                  width, height, background, frame_path(output, frame))
+                 for frame, parameters in enumerate(frames)]
+
+        if self.workers <= 1 or len(tasks) <= 1:
+            return [render_frame(task) for task in tasks]
+        if self._pool is None:
+            self._pool = get_context('spawn').Pool(self.workers, initializer=init_worker)
+        # Neighbouring frames go to the same worker, mostly with the same static layer
+        return self._pool.map(render_frame, tasks, chunksize=max(1, math.ceil(len(tasks) / (self.workers * 4))))
+
+
+# Function to put frame files into a new animated layer of a Krita document, one keyframe per file
+# from first_frame on
+def import_frames(doc, paths, first_frame=0):
+    if not doc.importAnimation(paths, first_frame, 1):
+        raise Exception("Krita could not import the animation frames.")
+    last_frame = first_frame + len(paths) - 1
+    if doc.fullClipRangeEndTime() < last_frame:
+        doc.setFullClipRangeEndTime(last_frame)
+
+
+# Function to paint the frames (parameter values of each) into a new animated layer of the active document,
+# in this process (Krita's Python cannot start workers)
+def draw_sequence(paint, frames, static=None, first_frame=0):
+    from krita import Krita
+
+    doc = Krita.instance().activeDocument()
+    if not doc:
+        raise Exception("No active document found.")
+
+    # Krita imports the keyframes from files, they are only needed until the import
+    frame_painter = FramePainter(paint, static)
+    with tempfile.TemporaryDirectory(prefix='krita-frames-') as directory:
+        paths = []
+        for frame, parameters in enumerate(frames):
+            with stage('frame', frame=frame):
+                path = frame_path(os.path.join(directory, 'frame_####.png'), frame)
+                save_frame(frame_painter.frame(parameters, doc.width(), doc.height()), path)
+            paths.append(path)
+        with stage('importAnimation'):
+            import_frames(doc, paths, first_frame)
+
+    with stage('refreshProjection'):
+        doc.refreshProjection()
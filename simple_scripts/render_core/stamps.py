@@ -0,0 +1,101 @@
+"""
+Stamps: one shape rasterized once and repeated on a grid.
+
+Many generators draw the same shape many times at positions a whole number
+of pixels apart. Such shapes rasterize to the same pixels, so the shape is
+rasterized once into a coverage stamp (the alpha mask of an opaque shape) and
+the grid is composed from it with NumPy and drawn with one drawImage call.
+
+A stamp larger than the grid step overlaps its neighbours. The grid is then
+composed in interleaved passes whose stamps never overlap, and the coverage of
+the passes is added up like Qt blends an opaque color over itself:
+c1 + c2 * (1 - c1). All stamps share one color, so only one channel is
+composed and the order of the passes does not change the result.
+"""
+
+import math
+
+import numpy as np
+from PyQt5.QtGui import QImage, QPainter, QPaintEngine, QColor
+from PyQt5.QtCore import Qt
+
+
+# Function to rasterize paint(painter) in white on a transparent width x height image,
+# returns the coverage (alpha) as a (height, width) uint8 array
+def rasterize_coverage(width, height, paint, render_hints=None):
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    if render_hints is not None:
+        painter.setRenderHints(render_hints)
+    painter.setPen(QColor(Qt.white))
+    painter.setBrush(QColor(Qt.white))
+    paint(painter)
+    painter.end()
+
+    bits = image.constBits()
+    bits.setsize(image.byteCount())
+    pixels = np.frombuffer(bits, dtype=np.uint8).reshape(height, image.bytesPerLine() // 4, 4)
+    return pixels[:, :width, 3].copy()
+
+
+# Function to add coverage to the coverage of target (in place), like an opaque color is drawn
+# over pixels that are already drawn
+def add_coverage(target, coverage):
+    kept = (target.astype(np.uint16) * (255 - coverage) + 127) // 255
+    target[...] = coverage + kept.astype(np.uint8)
+
+
+# Function to color a coverage map, returns premultiplied BGRA pixels (the memory layout of ARGB32)
+def color_pixels(coverage, color):
+    color = QColor(color)
+    pixels = np.empty(coverage.shape + (4,), dtype=np.uint8)
+    for channel, value in enumerate((color.blue(), color.green(), color.red(), color.alpha())):
+        pixels[..., channel] = (coverage.astype(np.uint16) * value + 127) // 255
+    return pixels
+
+
+# Function to compose a grid of stamps, indices[i, j] selects the stamp of row i and column j,
+# whose top-left corner is at (j * step_x, i * step_y) of the returned coverage map
+def compose_grid(stamps, indices, step_x, step_y):
+    stamp_count, stamp_height, stamp_width = stamps.shape
+    rows, columns = indices.shape
+
+    # Every pass takes every passes_x-th column and passes_y-th row, so its stamps do not overlap
+    passes_x = max(1, math.ceil(stamp_width / step_x))
+    passes_y = max(1, math.ceil(stamp_height / step_y))
+    block_width = passes_x * step_x
+    block_height = passes_y * step_y
+
+    # Stamps padded to the block size of a pass
+    blocks = np.zeros((stamp_count, block_height, block_width), dtype=np.uint8)
+    blocks[:, :stamp_height, :stamp_width] = stamps
+
+    coverage = np.zeros(((rows - 1 + passes_y) * step_y, (columns - 1 + passes_x) * step_x), dtype=np.uint8)
+    for pass_y in range(passes_y):
+        for pass_x in range(passes_x):
+            selected = indices[pass_y::passes_y, pass_x::passes_x]
+            if selected.size == 0:
+                continue
+
+            # (rows, columns, block_height, block_width) -> one map of side by side blocks
+            count_y, count_x = selected.shape
+            composed = blocks[selected].transpose(0, 2, 1, 3).reshape(count_y * block_height, count_x * block_width)
+
+            y = pass_y * step_y
+            x = pass_x * step_x
+            target = coverage[y:y + count_y * block_height, x:x + count_x * block_width]
+            if pass_x == 0 and pass_y == 0:
+                target[...] = composed  # Nothing drawn yet below the first pass
+            else:
+                add_coverage(target, composed)
+    return coverage
+
+
+# Function to draw BGRA pixels with the painter, pixel (0, 0) at (x, y)
+def draw_pixels(painter, x, y, pixels, image_format=QImage.Format_ARGB32_Premultiplied):
+    height, width = pixels.shape[:2]
+    image = QImage(pixels.data, width, height, width * 4, image_format)
+    if painter.paintEngine().type() == QPaintEngine.Picture:
+        image = image.copy()  # A QPicture keeps the image, which must not point into pixels
+    painter.drawImage(x, y, image)
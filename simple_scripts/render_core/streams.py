@@ -0,0 +1,50 @@
+"""
+Seedable random streams for the random generators.
+
+A drawing has one integer seed. Its random values are drawn in bulk with NumPy
+from substreams: substream(seed, key, ...) is an independent generator for one
+part of the drawing (a row of shapes, one line, one chunk of items). Each part
+always gets the same values, whatever order or process renders it. The same
+seed therefore gives the same picture, painted in one go in Krita or in
+parallel bands (render_core.bands).
+"""
+
+import numpy as np
+
+# Largest seed, also the largest value the seed spin boxes of the dialogs accept
+MAX_SEED = 2 ** 31 - 1
+
+# Items per substream when a long run of items is drawn in chunks
+CHUNK_SIZE = 4096
+
+
+# Function to pick a random seed for a drawing that is not seeded by the user
+def new_seed():
+    return int(np.random.default_rng().integers(1, MAX_SEED, endpoint=True))
+
+
+# Function to get the random generator of one part of a drawing
+def substream(seed, *key):
+    return np.random.default_rng([seed, *key])
+
+
+# Function to draw count items in chunks of chunk_size from the substreams (seed, stream, chunk)
+def draw_chunked(seed, stream, count, draw, chunk_size=CHUNK_SIZE):
+    # draw(rng, n) returns a tuple of arrays with n items each; item i gets the same values
+    # whether all items are drawn at once or only a part of them
+    parts = []
+    for chunk, start in enumerate(range(0, count, chunk_size)):
+        parts.append(draw(substream(seed, stream, chunk), min(chunk_size, count - start)))
+    if not parts:
+        return draw(substream(seed, stream, 0), 0)
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+# Function to draw count random RGB colors as an (count, 3) integer array
+def random_colors(rng, count):
+    return rng.integers(0, 256, size=(count, 3))
+
+
+# Function to draw count random signs (-1 or 1)
+def random_signs(rng, count):
+    return rng.choice(np.array([-1, 1]), size=count)
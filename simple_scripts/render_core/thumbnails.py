@@ -0,0 +1,214 @@
+"""
+Persistent index of the image files of a directory, with thumbnails.
+
+Listing a directory of thousands of reference images on every run, and picking
+one by its path, is slow and blind. ImageIndex keeps what the picker needs of
+every image (file name, modification time, size in bytes, dimensions and the
+name of its thumbnail) in a JSON file and brings it up to date with one
+os.scandir pass: only files whose modification time or size changed have their
+header read again, removed files are dropped with their thumbnails.
+
+    index = ImageIndex(directory)
+    names = index.update()
+
+Thumbnails are made lazily: ThumbnailLoader reads the stored ones and makes the
+missing ones (QImageReader decodes at the small size, JPEG without the full
+image) in a thread pool, and hands every finished one to the GUI thread with
+its ready signal, so the picker opens at once and fills in its icons:
+
+    loader = ThumbnailLoader(index)
+    loader.ready.connect(show_thumbnail)  # (name, QImage)
+    loader.request(names)
+    ...
+    loader.stop()
+    index.save()
+
+Thumbnail files are named after the image's path, modification time and size,
+an edited image never shows an old one. The index and the thumbnails live in
+the thumbnails directory of the render cache (render_core.cache), moved along
+with it by the KRITA_SCRIPTS_CACHE_DIR environment variable.
+"""
+
+import hashlib
+import json
+import os
+
+from PyQt5.QtGui import QImage, QImageReader
+from PyQt5.QtCore import QCoreApplication, QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+
+from .cache import default_cache_directory
+
+# File name extensions of the indexed images
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Longest edge of the thumbnails in pixels
+THUMBNAIL_SIZE = 64
+
+# Version of the index file layout, an index of another version is built again
+INDEX_VERSION = 1
+
+
+# Function to get the directory of the indexes and thumbnails
+def default_index_directory():
+    return os.path.join(default_cache_directory(), 'thumbnails')
+
+
+# Function to read a small version of an image file, scaled while decoding (a null QImage when unreadable)
+def read_thumbnail(path, size=THUMBNAIL_SIZE):
+    reader = QImageReader(path)
+    source_size = reader.size()
+    if source_size.isValid() and (source_size.width() > size or source_size.height() > size):
+        reader.setScaledSize(source_size.scaled(size, size, Qt.KeepAspectRatio))
+    return reader.read()
+
+
+class ImageIndex:
+    def __init__(self, directory, index_directory=None):
+        self.directory = os.path.realpath(directory)
+        self.index_directory = index_directory or default_index_directory()
+        key = hashlib.sha256(self.directory.encode('utf-8')).hexdigest()[:32]
+        self.path = os.path.join(self.index_directory, key + '.json')
+        # File name -> {'mtime', 'size', 'width', 'height', 'thumbnail'}, thumbnail is None until made
+        self.entries = {}
+        self.changed = False
+        self.load()
+
+    # Read the index file, a missing or unreadable one leaves the index empty
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == INDEX_VERSION and data.get('directory') == self.directory:
+            self.entries = data['entries']
+
+    # Write the index file if it changed
+    def save(self):
+        if not self.changed:
+            return
+        try:
+            os.makedirs(self.index_directory, exist_ok=True)
+
+            # Write a temporary file and rename it, other runs never read half an index
+            temporary_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(temporary_path, 'w', encoding='utf-8') as file:
+                json.dump({'version': INDEX_VERSION, 'directory': self.directory, 'entries': self.entries}, file)
+            os.replace(temporary_path, self.path)
+        except OSError as error:
+            # A read-only disk only costs the next run the header reads and thumbnails
+            print(f"Image index not written: {error}")
+            return
+        self.changed = False
+
+    # Function to bring the index up to date with the directory, returns the sorted image file names
+    def update(self):
+        found = {}
+        with os.scandir(self.directory) as scan:
+            for item in scan:
+                if item.name.lower().endswith(IMAGE_EXTENSIONS) and item.is_file():
+                    found[item.name] = item.stat()
+
+        # Removed and changed files lose their entry and thumbnail
+        for name in list(self.entries):
+            stat = found.get(name)
+            entry = self.entries[name]
+            if stat is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+                self.remove_thumbnail(name)
+                del self.entries[name]
+                self.changed = True
+
+        # New and changed files: the dimensions come from the header, unreadable files are left out
+        for name, stat in found.items():
+            if name in self.entries:
+                continue
+            size = QImageReader(self.image_path(name)).size()
+            if not size.isValid():
+                continue
+            self.entries[name] = {'mtime': stat.st_mtime, 'size': stat.st_size,
+                                  'width': size.width(), 'height': size.height(), 'thumbnail': None}
+            self.changed = True
+
+        self.save()
+        return sorted(self.entries, key=str.lower)
+
+    # Function to get the full path of an indexed image
+    def image_path(self, name):
+        return os.path.join(self.directory, name)
+
+    # Function to get the path of the thumbnail file of an indexed image (it may not exist yet)
+    def thumbnail_path(self, name):
+        entry = self.entries[name]
+        identity = f"{self.image_path(name)}\0{entry['mtime']}\0{entry['size']}"
+        return os.path.join(self.index_directory, hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32] + '.png')
+
+    # Record the thumbnail file of an indexed image as written
+    def set_thumbnail(self, name):
+        entry = self.entries.get(name)
+        if entry is not None and entry['thumbnail'] is None:
+            entry['thumbnail'] = os.path.basename(self.thumbnail_path(name))
+            self.changed = True
+
+    # Delete the thumbnail file of an indexed image
+    def remove_thumbnail(self, name):
+        if self.entries[name]['thumbnail'] is None:
+            return
+        try:
+            os.remove(self.thumbnail_path(name))
+        except OSError:
+            pass
+
+
+# Job of the thumbnail pool: read the stored thumbnail of one image or make and store it
+class ThumbnailTask(QRunnable):
+    def __init__(self, loader, name, image_path, thumbnail_path, stored):
+        super().__init__()
+        self.loader = loader
+        self.name = name
+        self.image_path = image_path
+        self.thumbnail_path = thumbnail_path
+        self.stored = stored
+
+    def run(self):
+        thumbnail = QImage(self.thumbnail_path) if self.stored else QImage()
+        if thumbnail.isNull():
+            thumbnail = read_thumbnail(self.image_path)
+            if thumbnail.isNull():
+                return
+            # A thumbnail that is not written is made again on the next run
+            try:
+                os.makedirs(os.path.dirname(self.thumbnail_path), exist_ok=True)
+            except OSError:
+                pass
+            if not thumbnail.save(self.thumbnail_path, 'PNG'):
+                print(f"Thumbnail not written: {self.thumbnail_path}")
+        # Queued to the loader's thread, the GUI thread
+        self.loader.ready.emit(self.name, thumbnail)
+
+
+class ThumbnailLoader(QObject):
+    # Image file name and its thumbnail, emitted in the GUI thread
+    ready = pyqtSignal(str, QImage)
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.pool = QThreadPool(self)
+        self.ready.connect(self.record)
+
+    # Queue the thumbnails of the named images
+    def request(self, names):
+        for name in names:
+            entry = self.index.entries[name]
+            self.pool.start(ThumbnailTask(self, name, self.index.image_path(name), self.index.thumbnail_path(name),
+                                          entry['thumbnail'] is not None))
+
+    # Function to record a finished thumbnail in the index
+    def record(self, name, thumbnail):
+        self.index.set_thumbnail(name)
+
+    # Drop the queued thumbnails and wait for the running ones, their thumbnails are recorded in the index
+    def stop(self):
+        self.pool.clear()
+        self.pool.waitForDone()
+        QCoreApplication.sendPostedEvents(self)
@@ -0,0 +1,318 @@
+"""
+Tiled, dirty-rect upload of generated drawings into a Krita paint layer.
+
+The drawing commands are recorded into a QPicture. On upload the recording is
+rasterized and cut into tiles, which are pushed to the layer with
+setPixelData; tiles that stayed transparent are skipped. The touched tiles are
+those of the marked rects and of the recording's bounding rect, one rect around
+all of the drawing: two dots in opposite corners touch every tile, so the
+bounds say nothing about how much is drawn and never decide the path.
+
+Replaying the whole recording for every tile costs tiles x primitives (16
+replays of a 3D plot at 2048 x 2048, 256 at 8192 x 8192), so the path is
+chosen by the size of the recording:
+
+- a recording up to TILE_REPLAY_BYTES (a few shapes, a few hundred lines) is
+  replayed per tile, which is cheap and keeps the buffers tile-sized;
+- a larger one is rasterized in bands of whole tile rows, as many rows as fit
+  into MAX_RASTER_BYTES, into one band buffer that is reused from band to
+  band: one replay per band, and never an image as big as the document;
+- tile painters (add_tile_painter), which paint only their part of a
+  fill-style drawing, and drawing over the existing pixels of a layer
+  (keep_content), which reads back and writes only the marked areas, always
+  go tile by tile.
+
+The images come from the shared image pool (render_core.pool) and go back to
+it after the upload, so repeated runs reuse them.
+"""
+
+from PyQt5.QtGui import QPainter, QPicture, QImage
+from PyQt5.QtCore import Qt, QRect
+from .buffers import set_image_pixels
+from .pool import image_pool, image_pixels
+from .trace import stage, open_stage, close_stage, recording_painter, primitive_counts
+
+# Default edge length of the square upload tiles (in pixels)
+DEFAULT_TILE_SIZE = 512
+
+# Extra pixels added around dirty rects to cover antialiasing outside the recorded bounds
+DIRTY_MARGIN = 2
+
+# Pixels rendered around each tile and thrown away, hides clipping differences at tile seams
+TILE_OVERLAP = 16
+
+# Recordings up to this size (QPicture bytes) are replayed per tile, a replay is cheap
+TILE_REPLAY_BYTES = 64 * 1024
+
+# Largest band of tile rows a larger recording is rasterized into at once (bytes, without the overlap),
+# at least one tile row: a quarter of an 8192 x 8192 document
+MAX_RASTER_BYTES = 64 * 1024 * 1024
+
+
+# Function to merge overlapping rects until none overlap, each result is the bounding rect of a group
+def merge_rects(rects):
+    merged = sorted(rects, key=lambda rect: rect.top())
+    while True:
+        result = []
+        active = []  # Indices of the results that reach down to the current rect
+        for rect in merged:
+            active = [index for index in active if result[index].bottom() >= rect.top()]
+            for index in active:
+                if result[index].intersects(rect):
+                    result[index] = result[index].united(rect)
+                    break
+            else:
+                active.append(len(result))
+                result.append(rect)
+
+        # A pass without merges leaves no overlaps
+        if len(result) == len(merged):
+            return result
+        merged = sorted(result, key=lambda rect: rect.top())
+
+
+class TiledLayer:
+    def __init__(self, node, width, height, tile_size=DEFAULT_TILE_SIZE, keep_content=False, cache_entry=None):
+        self.node = node
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        # With keep_content the drawing is painted over the pixels already in the layer; when areas
+        # are marked (mark_dirty), only they are read back and written, so they must hold all of the drawing
+        self.keep_content = keep_content
+        # With a cache_entry (render_core.cache) the uploaded tiles are also written to the render cache
+        self.cache_entry = cache_entry
+
+        self.picture = QPicture()
+        self.painter = None
+        self.dirty_rects = []
+        self.tile_painters = []
+        self.uploaded_tiles = 0
+        self._blank_tiles = {}
+        self._painting = None
+
+    # End a recording left open (e.g. by an exception), Qt crashes when a QPicture
+    # is destroyed while a painter is still active on it
+    def __del__(self):
+        if self.painter is not None and self.painter.isActive():
+            self.painter.end()
+
+    # Start recording and return the QPainter to draw with (document coordinates)
+    def begin(self):
+        self._painting = open_stage('paint')
+        self.painter = recording_painter(self.picture)
+        return self.painter
+
+    # Add a function paint(painter, area) that paints straight into every rendered tile, for drawing
+    # that is cheaper to rasterize per tile than to record (area is a QRect in document coordinates,
+    # mark the painted area dirty)
+    def add_tile_painter(self, paint):
+        self.tile_painters.append(paint)
+
+    # Mark an area as painted, needed for drawing QPicture does not bound (e.g. text)
+    def mark_dirty(self, x, y, w, h):
+        self.dirty_rects.append(QRect(int(x), int(y), int(w + 1), int(h + 1)))
+
+    # Mark the whole document as painted
+    def mark_all_dirty(self):
+        self.dirty_rects.append(QRect(0, 0, self.width, self.height))
+
+    # Areas to upload: the marked rects and (with recorded) the bounds of the recorded drawing
+    def dirty_region(self, recorded=True):
+        rects = list(self.dirty_rects)
+        bounds = self.picture.boundingRect()
+        if recorded and bounds.isValid():
+            rects.append(bounds)
+
+        canvas = QRect(0, 0, self.width, self.height)
+        margin = DIRTY_MARGIN
+        region = []
+        for rect in rects:
+            rect = rect.adjusted(-margin, -margin, margin, margin).intersected(canvas)
+            if not rect.isEmpty():
+                region.append(rect)
+        return region
+
+    # Bands rasterized in one piece as (band, tiles): runs of touched tile rows, each band spanning
+    # the touched tiles of its rows, with as many rows as fit into MAX_RASTER_BYTES (at least one)
+    def raster_bands(self):
+        rows = {}
+        for tile in self.dirty_tiles():
+            rows.setdefault(tile.y(), []).append(tile)
+
+        bands = []
+        for y in sorted(rows):
+            row = rows[y][0].united(rows[y][-1])  # The tiles of a row are sorted by column
+            if bands and bands[-1][0].bottom() + 1 == y:
+                band = bands[-1][0].united(row)
+                if band.width() * band.height() * 4 <= MAX_RASTER_BYTES:
+                    bands[-1] = (band, bands[-1][1] + rows[y])
+                    continue
+            bands.append((row, list(rows[y])))
+        return bands
+
+    # Tiles (as QRects clipped to the document) touched by the dirty region, each listed once
+    def dirty_tiles(self):
+        size = self.tile_size
+        indices = set()
+        for rect in self.dirty_region():
+            for row in range(rect.top() // size, rect.bottom() // size + 1):
+                for column in range(rect.left() // size, rect.right() // size + 1):
+                    indices.add((row, column))
+
+        tiles = []
+        for row, column in sorted(indices):
+            x = column * size
+            y = row * size
+            tiles.append(QRect(x, y, min(size, self.width - x), min(size, self.height - y)))
+        return tiles
+
+    # Areas rendered and uploaded as (tile, bounds): the tiles of the dirty region on the document,
+    # or in place on existing content the marked areas, cut at the tile grid, within the bounds of
+    # their merged area (only that is read back)
+    def upload_areas(self):
+        canvas = QRect(0, 0, self.width, self.height)
+        if not (self.keep_content and self.dirty_rects):
+            return [(tile, canvas) for tile in self.dirty_tiles()]
+
+        size = self.tile_size
+        areas = []
+        for bounds in merge_rects(self.dirty_region(recorded=False)):
+            for row in range(bounds.top() // size, bounds.bottom() // size + 1):
+                for column in range(bounds.left() // size, bounds.right() // size + 1):
+                    areas.append((QRect(column * size, row * size, size, size).intersected(bounds), bounds))
+        return areas
+
+    # Part of the dirty region inside an area, in the area's coordinates: where the drawing can have painted
+    def painted_area(self, area):
+        painted = QRect()
+        for rect in self.dirty_region():
+            painted |= rect.intersected(area)
+        return painted.translated(-area.x(), -area.y())
+
+    # Render an overlapping area around a tile (within bounds, the document by default), so lines
+    # clipped at the tile edges are rasterized exactly like when painting on the whole document
+    def render_area(self, tile, bounds=None):
+        if bounds is None:
+            bounds = QRect(0, 0, self.width, self.height)
+        overlap = TILE_OVERLAP
+        return tile.adjusted(-overlap, -overlap, overlap, overlap).intersected(bounds)
+
+    # Rasterize the recorded drawing into one tile-sized QImage (give it back with release_tile),
+    # returns None for a tile that stays transparent on a new layer
+    def render_tile(self, tile, bounds=None):
+        area = self.render_area(tile, bounds)
+
+        if self.keep_content:
+            with stage('pixelData'):
+                pixel_data = self.node.pixelData(area.x(), area.y(), area.width(), area.height())
+                image = QImage(pixel_data, area.width(), area.height(), QImage.Format_ARGB32)
+        else:
+            with stage('allocate'):
+                image = image_pool().acquire(area.width(), area.height())
+
+        with stage('rasterize'):
+            painter = QPainter(image)
+            painter.translate(-area.x(), -area.y())
+            painter.drawPicture(0, 0, self.picture)
+            for paint in self.tile_painters:
+                painter.save()
+                paint(painter, area)
+                painter.restore()
+            painter.end()
+
+        if area != tile:
+            # Cut the tile out of the overlapping area into a pooled tile image
+            tile_image = image_pool().acquire(tile.width(), tile.height(), clear=False)
+            left, top = tile.x() - area.x(), tile.y() - area.y()
+            image_pixels(tile_image)[:] = image_pixels(image)[top:top + tile.height(), left:left + tile.width()]
+            if not self.keep_content:
+                image_pool().release(image, self.painted_area(area))
+            image = tile_image
+
+        if not self.keep_content and self.is_blank(image):
+            image_pool().release(image, QRect())  # Nothing was drawn, reused without clearing
+            return None
+        return image
+
+    # Whether a freshly rendered tile stayed fully transparent
+    def is_blank(self, image):
+        key = (image.width(), image.height())
+        blank = self._blank_tiles.get(key)
+        if blank is None:
+            blank = QImage(image.width(), image.height(), QImage.Format_ARGB32)
+            blank.fill(Qt.transparent)
+            self._blank_tiles[key] = blank
+        return image == blank
+
+    # Give a tile image of render_tile back to the image pool once it was uploaded
+    def release_tile(self, tile, image, bounds=None):
+        if not self.keep_content:
+            image_pool().release(image, self.painted_area(tile))
+        elif self.render_area(tile, bounds) != tile:
+            image_pool().release(image)  # A copy of the layer pixels, all of it is painted
+
+    # Rasterize the recorded drawing once into an image of an area (give it back to the image pool)
+    def render_raster_area(self, area):
+        with stage('allocate'):
+            image = image_pool().acquire(area.width(), area.height())
+        with stage('rasterize'):
+            painter = QPainter(image)
+            painter.translate(-area.x(), -area.y())
+            painter.drawPicture(0, 0, self.picture)
+            painter.end()
+        return image
+
+    # Cut a tile out of a rasterized area into a pooled tile image, returns None for a transparent tile
+    def cut_tile(self, image, area, tile):
+        left, top = tile.x() - area.x(), tile.y() - area.y()
+        pixels = image_pixels(image, writable=False)[top:top + tile.height(), left:left + tile.width()]
+        if not pixels.any():
+            return None
+        tile_image = image_pool().acquire(tile.width(), tile.height(), clear=False)
+        image_pixels(tile_image)[:] = pixels
+        return tile_image
+
+    # Hand a rendered tile to the layer and the render cache
+    def upload_tile(self, tile, image):
+        # Hand the tile pixels to the layer without copying them first
+        set_image_pixels(self.node, image, tile.x(), tile.y())
+        self.uploaded_tiles += 1
+        if self.cache_entry is not None:
+            self.cache_entry.add_tile(tile.x(), tile.y(), image)
+
+    # Stop recording, then rasterize and upload every touched tile to the layer
+    def upload(self):
+        if self.painter is not None and self.painter.isActive():
+            self.painter.end()
+        close_stage(self._painting, **primitive_counts(self.painter))
+        self._painting = None
+
+        self.uploaded_tiles = 0
+        with stage('upload'):
+            if self.tile_painters or self.keep_content or self.picture.size() <= TILE_REPLAY_BYTES:
+                # Tile by tile: tile painters paint just their tile, existing pixels are read back per tile,
+                # a small recording is replayed for every tile
+                for tile, bounds in self.upload_areas():
+                    image = self.render_tile(tile, bounds)
+                    if image is None:
+                        continue  # Nothing was drawn here, the new layer is already transparent
+                    self.upload_tile(tile, image)
+                    self.release_tile(tile, image, bounds)
+            else:
+                # The recording is replayed once per band of tile rows, the band image is cut into tiles
+                for band, tiles in self.raster_bands():
+                    area = self.render_area(band)
+                    image = self.render_raster_area(area)
+                    for tile in tiles:
+                        with stage('convert'):
+                            tile_image = self.cut_tile(image, area, tile)
+                        if tile_image is None:
+                            continue  # Nothing was drawn here, the new layer is already transparent
+                        self.upload_tile(tile, tile_image)
+                        image_pool().release(tile_image)
+                    image_pool().release(image, self.painted_area(area))
+
+            if self.cache_entry is not None:
+                self.cache_entry.commit()
+        return self.uploaded_tiles
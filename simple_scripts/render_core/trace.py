@@ -0,0 +1,289 @@
+"""
+Opt-in timing and memory instrumentation of the render pipeline.
+
+Every generator run goes through the same stages: createNode, painting (the
+recording of the drawing), per tile the QImage allocation, rasterization,
+pixel buffer conversion and setPixelData, and refreshProjection at the end.
+The render_core classes and the draw_* functions (decorated with traced) wrap
+those stages with stage(). Without tracing a stage costs one check.
+
+Tracing is turned on with start(path), or for a whole Krita session by
+setting the KRITA_SCRIPTS_TRACE environment variable to a file path before
+starting Krita. Each stage then records its wall time, the resident and peak
+memory of the process, and for painting the number of primitives drawn. When
+a draw function returns, a summary per stage is printed and its events are
+appended to the trace file, so a long session writes every event once. The
+file is in the JSON Array Format of Chrome trace events (open it at
+chrome://tracing or https://ui.perfetto.dev): a list that stop() closes with
+']', which the viewers (and read_trace) also read while it is still open.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from PyQt5.QtGui import QPainter
+
+# Environment variable with the trace file, tracing starts when the module is imported
+TRACE_VARIABLE = 'KRITA_SCRIPTS_TRACE'
+
+# QPainter calls counted as primitives, the ones taking a list count its items
+COUNTED_CALLS = ('drawArc', 'drawChord', 'drawConvexPolygon', 'drawEllipse', 'drawImage', 'drawLine', 'drawPath',
+                 'drawPicture', 'drawPie', 'drawPixmap', 'drawPolygon', 'drawPolyline', 'drawRect',
+                 'drawRoundedRect', 'drawStaticText', 'drawText')
+COUNTED_LIST_CALLS = ('drawLines', 'drawPoints', 'drawRects')
+
+MEGABYTE = 1024 * 1024
+
+
+# Function to get the (current, peak) resident memory of the process in bytes, None where unknown
+def memory_usage():
+    if sys.platform.startswith('linux'):
+        values = {}
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    name, size, unit = line.split()
+                    values[name] = int(size) * 1024
+        return values.get('VmRSS:'), values.get('VmHWM:')
+
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize, counters.PeakWorkingSetSize
+        return None, None
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Bytes on macOS
+    return None, peak
+
+
+class CountingPainter(QPainter):
+    # QPainter that counts the primitives drawn with it (only calls made from Python)
+    def __init__(self, device):
+        super().__init__(device)
+        self.primitives = Counter()
+
+
+def counting_call(name, list_call):
+    draw = getattr(QPainter, name)
+
+    def call(self, *arguments):
+        if list_call and len(arguments) == 1 and hasattr(arguments[0], '__len__'):
+            self.primitives[name] += len(arguments[0])
+        else:
+            self.primitives[name] += len(arguments) if list_call else 1
+        return draw(self, *arguments)
+
+    call.__name__ = name
+    return call
+
+
+for _name in COUNTED_CALLS:
+    setattr(CountingPainter, _name, counting_call(_name, False))
+for _name in COUNTED_LIST_CALLS:
+    setattr(CountingPainter, _name, counting_call(_name, True))
+
+
+class Stage:
+    def __init__(self, name, arguments, thread):
+        self.name = name
+        self.arguments = arguments
+        self.thread = thread
+        self.start = time.perf_counter()
+        self.memory = memory_usage()
+
+
+class Tracer:
+    def __init__(self, path):
+        self.path = path
+        self.origin = time.perf_counter()
+        self.written = 0  # Events in the trace file
+        self.pending = []  # Events not written yet
+        self.run_events = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def open(self, name, arguments):
+        stage = Stage(name, arguments, threading.get_ident())
+        self.stack().append(stage)
+        return stage
+
+    def close(self, stage, arguments):
+        end = time.perf_counter()
+        rss, peak = memory_usage()
+        start_rss, start_peak = stage.memory
+
+        arguments = dict(stage.arguments, **arguments)
+        if rss is not None:
+            arguments['rss_mb'] = round(rss / MEGABYTE, 1)
+            if start_rss is not None:
+                arguments['rss_change_mb'] = round((rss - start_rss) / MEGABYTE, 1)
+        if peak is not None:
+            arguments['peak_rss_mb'] = round(peak / MEGABYTE, 1)
+            if start_peak is not None and peak > start_peak:
+                arguments['peak_rise_mb'] = round((peak - start_peak) / MEGABYTE, 1)
+
+        event = {
+            'name': stage.name, 'cat': 'render', 'ph': 'X', 'pid': os.getpid(), 'tid': stage.thread,
+            'ts': round((stage.start - self.origin) * 1e6, 1), 'dur': round((end - stage.start) * 1e6, 1),
+            'args': arguments,
+        }
+        counter = None
+        if rss is not None:
+            counter = {'name': 'memory', 'ph': 'C', 'pid': os.getpid(), 'tid': stage.thread,
+                       'ts': event['ts'] + event['dur'], 'args': {'rss_mb': arguments['rss_mb']}}
+
+        stack = self.stack()
+        if stage in stack:
+            stack.remove(stage)
+        with self._lock:
+            self.pending.append(event)
+            self.run_events.append(event)
+            if counter is not None:
+                self.pending.append(counter)
+            finished_run = not stack and threading.get_ident() == stage.thread
+            if finished_run:
+                run_events, self.run_events = self.run_events, []
+        if finished_run:
+            self.write()
+            print_summary(stage.name, run_events)
+
+    # Append the pending events to the trace file (the first write starts it), with close also end the list
+    def write(self, close=False):
+        with self._lock:
+            events, self.pending = self.pending, []
+            first = self.written == 0
+            self.written += len(events)
+            with open(self.path, 'w' if first else 'a', encoding='utf-8') as file:
+                if first:
+                    file.write('[\n')
+                for index, event in enumerate(events):
+                    if index or not first:
+                        file.write(',\n')
+                    file.write(json.dumps(event))
+                if close:
+                    file.write('\n]\n')
+
+
+# Function to read the events of a trace file, also one that is still being written (without its closing ']')
+def read_trace(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        text = file.read().rstrip()
+    if not text.endswith(']'):
+        text = text.rstrip(',') + ']'
+    return json.loads(text)
+
+
+# Function to print the time, count and primitives of each stage of a finished run
+def print_summary(name, events):
+    total = events[-1]['dur'] / 1e6
+    stages = {}
+    for event in events[:-1]:
+        time_spent, count, primitives = stages.get(event['name'], (0.0, 0, 0))
+        stages[event['name']] = (time_spent + event['dur'] / 1e6, count + 1,
+                                 primitives + event['args'].get('primitives', 0))
+
+    print(f"{name}: {total:.3f} s, peak memory {events[-1]['args'].get('peak_rss_mb', '?')} MiB")
+    for stage_name, (time_spent, count, primitives) in sorted(stages.items(), key=lambda item: -item[1][0]):
+        share = time_spent / total if total else 0
+        details = f", {primitives} primitives" if primitives else ''
+        print(f"    {stage_name:<20} {time_spent:>8.3f} s {share:>6.1%} ({count}x{details})")
+
+
+_tracer = None
+
+
+# Function to start tracing into a Chrome trace JSON file
+def start(path):
+    global _tracer
+    _tracer = Tracer(path)
+    return _tracer
+
+
+# Function to stop tracing, the trace file keeps the stages recorded so far
+def stop():
+    global _tracer
+    if _tracer is not None:
+        _tracer.write(close=True)
+    _tracer = None
+
+
+def is_tracing():
+    return _tracer is not None
+
+
+# Function to start a stage that ends in another function, returns None without tracing
+def open_stage(name, **arguments):
+    if _tracer is None:
+        return None
+    return _tracer.open(name, arguments)
+
+
+# Function to end a stage of open_stage, the arguments are added to the recorded ones
+def close_stage(stage, **arguments):
+    if stage is not None and _tracer is not None:
+        _tracer.close(stage, arguments)
+
+
+# Context manager of a stage: with stage('setPixelData', bytes=size): ...
+@contextmanager
+def stage(name, **arguments):
+    if _tracer is None:
+        yield
+        return
+    current = _tracer.open(name, arguments)
+    try:
+        yield
+    finally:
+        _tracer.close(current, {})
+
+
+# Decorator tracing a whole draw function as one run (its stages are nested in it)
+def traced(function):
+    @functools.wraps(function)
+    def traced_function(*arguments, **keywords):
+        with stage(function.__name__):
+            return function(*arguments, **keywords)
+    return traced_function
+
+
+# Function to create the painter of a recording, counting primitives while tracing
+def recording_painter(device):
+    if _tracer is None:
+        return QPainter(device)
+    return CountingPainter(device)
+
+
+# Function to get the primitive counts of a painter of recording_painter
+def primitive_counts(painter):
+    counts = getattr(painter, 'primitives', None)
+    if not counts:
+        return {}
+    return {'primitives': sum(counts.values()), **counts}
+
+
+if os.environ.get(TRACE_VARIABLE):
+    start(os.environ[TRACE_VARIABLE])
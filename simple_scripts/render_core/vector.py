@@ -0,0 +1,117 @@
+"""
+Vector output of the generators: the drawing as shapes of a Krita vector layer.
+
+The generators draw pure geometry (lines, polygons, circles, text) with a
+QPainter. SvgLayer offers the calls of TiledLayer, but records the painting
+with a QSvgGenerator instead of rasterizing it, and adds the SVG document as
+shapes to a vector layer (created with create_layer). The layer then takes
+memory per shape instead of per pixel, and Krita renders it sharp at any
+resolution without running the generator again.
+
+Paint functions that draw pixels (glyph and hexagon stamps) check
+is_vector_painter and draw shapes instead.
+
+QtSvg is part of the PyQt5 shipped with Krita; without it only raster layers
+are available.
+"""
+
+import re
+
+from PyQt5.QtGui import QPaintEngine
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QRect, QSize
+
+from .trace import stage, open_stage, close_stage, recording_painter, primitive_counts
+
+try:
+    from PyQt5.QtSvg import QSvgGenerator
+except ImportError:
+    QSvgGenerator = None
+
+# Logical resolution of the layer tiles (QImage), the SVG uses it for font sizes so text
+# has the same size as on a raster layer
+RASTER_DPI = 96
+
+
+# Function to check if a painter records shapes (SvgLayer) instead of pixels
+def is_vector_painter(painter):
+    return painter.paintEngine().type() == QPaintEngine.SVG
+
+
+# Function to create the layer of a generator: a vector layer for vector output, a paint layer otherwise
+def create_layer(doc, name, vector):
+    with stage('createNode', vector=vector):
+        if vector:
+            return doc.createVectorLayer(name)
+        return doc.createNode(name, "paintlayer")
+
+
+class SvgLayer:
+    def __init__(self, node, width, height, resolution=RASTER_DPI):
+        if QSvgGenerator is None:
+            raise Exception("Vector layers need the PyQt5.QtSvg module.")
+
+        self.node = node
+        self.width = width
+        self.height = height
+        self.resolution = resolution
+        self.painter = None
+        self.tile_painters = []
+        self._painting = None
+
+        self._data = QByteArray()
+        self._buffer = QBuffer(self._data)
+        self._buffer.open(QIODevice.WriteOnly)
+        self.generator = QSvgGenerator()
+        self.generator.setOutputDevice(self._buffer)
+        self.generator.setSize(QSize(width, height))
+        self.generator.setViewBox(QRect(0, 0, width, height))  # User units are document pixels
+        self.generator.setResolution(RASTER_DPI)
+        self.generator.setTitle(node.name())
+
+    def __del__(self):
+        # End an active painter before the generator goes away
+        if self.painter is not None and self.painter.isActive():
+            self.painter.end()
+
+    # Start recording, returns the painter to draw with
+    def begin(self):
+        if self.painter is None:
+            self._painting = open_stage('paint')
+            self.painter = recording_painter(self.generator)
+        return self.painter
+
+    # Add a function paint(painter, area), called once with the whole canvas as area
+    def add_tile_painter(self, paint):
+        self.tile_painters.append(paint)
+
+    # Shapes have their own bounds, the dirty areas of TiledLayer are not needed
+    def mark_dirty(self, x, y, w, h):
+        pass
+
+    def mark_all_dirty(self):
+        pass
+
+    # Function to finish the recording and get the SVG document
+    def svg(self):
+        painter = self.begin()
+        for paint in self.tile_painters:
+            painter.save()
+            paint(painter, QRect(0, 0, self.width, self.height))
+            painter.restore()
+        self.tile_painters = []
+        if painter.isActive():
+            painter.end()
+        self._buffer.close()
+        close_stage(self._painting, **primitive_counts(painter))
+        self._painting = None
+
+        # The size in points places the shapes on the document pixels at its resolution
+        svg = bytes(self._data).decode('utf-8')
+        size = f'width="{self.width * 72 / self.resolution:g}pt" height="{self.height * 72 / self.resolution:g}pt"'
+        return re.sub(r'width="[^"]*" height="[^"]*"', size, svg, count=1)
+
+    # Add the recorded drawing as shapes to the vector layer
+    def upload(self):
+        svg = self.svg()
+        with stage('addShapesFromSvg', bytes=len(svg)):
+            self.node.addShapesFromSvg(svg)
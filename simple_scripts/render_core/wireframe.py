@@ -0,0 +1,70 @@
+"""
+Hidden-line removal for the isometric wireframe of krita_test21_func_3d.
+
+Floating-horizon algorithm on the projected grid. The wireframe edges are
+grouped into depth bands: all x and y edges starting at grid points with
+i + j == k. Each band forms one zigzag polyline whose screen x grows
+monotonically. Bands are processed front to back, largest k first. Each band
+is sampled once per canvas column and compared with two horizon arrays, the
+highest (upper) and lowest (lower) screen y drawn so far. Only the parts above
+the upper or below the lower horizon are emitted. The work per band is a few
+NumPy operations, so the whole pass stays O(grid cells).
+"""
+
+import math
+
+import numpy as np
+
+
+# Function to get the zigzag polyline of depth band k from projected (n, n) grids
+def band_polyline(proj_x, proj_y, k):
+    n = proj_x.shape[0]
+    # Base points (m, k - m) that start both an x edge and a y edge of the wireframe
+    m = np.arange(max(0, k - (n - 2)), min(n - 2, k) + 1)
+    count = len(m)
+
+    # Alternate the deeper end of the y edge (m, k + 1 - m) and the base point (m, k - m),
+    # and finish with the far end of the last x edge
+    xs = np.empty(2 * count + 1)
+    ys = np.empty(2 * count + 1)
+    xs[0:2 * count:2] = proj_x[m, k + 1 - m]
+    ys[0:2 * count:2] = proj_y[m, k + 1 - m]
+    xs[1:2 * count:2] = proj_x[m, k - m]
+    ys[1:2 * count:2] = proj_y[m, k - m]
+    xs[-1] = proj_x[m[-1] + 1, k - m[-1]]
+    ys[-1] = proj_y[m[-1] + 1, k - m[-1]]
+    return xs, ys
+
+
+# Function to yield the visible parts of the wireframe as (xs, ys) polylines
+def visible_polylines(proj_x, proj_y, width):
+    n = proj_x.shape[0]
+    upper = np.full(width, np.inf)  # Smallest screen y drawn so far, per canvas column
+    lower = np.full(width, -np.inf)  # Largest screen y drawn so far, per canvas column
+
+    # Bands from the front (largest i + j, lowest on screen) to the back
+    for k in range(2 * (n - 2), -1, -1):
+        xs, ys = band_polyline(proj_x, proj_y, k)
+
+        first_column = max(math.ceil(xs[0]), 0)
+        last_column = min(math.floor(xs[-1]), width - 1)
+        if last_column < first_column:
+            continue  # Band is between two columns or outside the canvas
+
+        columns = np.arange(first_column, last_column + 1)
+        sampled_y = np.interp(columns, xs, ys)
+
+        # Visible where the band is above everything in front of it, or below it (underside)
+        visible = (sampled_y <= upper[columns]) | (sampled_y >= lower[columns])
+        upper[columns] = np.minimum(upper[columns], sampled_y)
+        lower[columns] = np.maximum(lower[columns], sampled_y)
+
+        # Emit each run of visible columns with the original vertices inside it
+        changes = np.flatnonzero(np.diff(np.concatenate(([0], visible.astype(np.int8), [0]))))
+        for start, end in zip(changes[0::2], changes[1::2] - 1):
+            start_x = columns[start]
+            end_x = columns[end]
+            inside = (xs > start_x) & (xs < end_x)
+            run_xs = np.concatenate(([start_x], xs[inside], [end_x]))
+            run_ys = np.concatenate(([sampled_y[start]], ys[inside], [sampled_y[end]]))
+            yield run_xs, run_ys
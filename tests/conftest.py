@@ -0,0 +1,23 @@
+"""
+Shared setup of the tests: the render_core package and the scripts of
+simple_scripts are imported like render_batch.py does, with render_core.headless
+in place of the krita module and Qt without a display.
+"""
+
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'simple_scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from render_core import headless  # noqa: E402
+
+headless.install()
+
+
+# Fixture loading a generator script by file name, its main() is not run
+@pytest.fixture
+def load_script():
+    return lambda name: headless.load_script(os.path.join(SCRIPTS_DIR, name))
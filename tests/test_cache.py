@@ -0,0 +1,45 @@
+import importlib.util
+import os
+
+from PyQt5.QtGui import QColor
+
+from render_core import cache, headless
+from render_core.generator import run_generator
+
+SCRIPT = '''
+from PyQt5.QtGui import QColor
+
+
+def paint(painter, width, height, start_y, end_y):
+    painter.fillRect(0, start_y, width, end_y - start_y, QColor('{color}'))
+    return [painter.window()]
+'''
+
+
+# Function to run a script like Krita does: its file is executed again on every run
+def run_script(path):
+    spec = importlib.util.spec_from_file_location('edited_script', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    layer = run_generator(module.paint, 'Edited', [])
+    return QColor.fromRgba(layer.image.pixel(0, 0)).name()
+
+
+def test_script_edited_between_runs_is_rendered_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, '_render_cache', cache.RenderCache(str(tmp_path / 'cache')))
+    document = headless.Krita.instance().createDocument(64, 64)
+    headless.Krita.instance().setActiveDocument(document)
+    path = tmp_path / 'edited_script.py'
+    try:
+        path.write_text(SCRIPT.format(color='#ff0000'))
+        assert run_script(str(path)) == '#ff0000'
+        assert run_script(str(path)) == '#ff0000'  # Read from the cache
+
+        # Same size and a modification time a microsecond later, as a quick edit on a coarse clock
+        mtime_ns = os.stat(path).st_mtime_ns
+        path.write_text(SCRIPT.format(color='#0000ff'))
+        os.utime(path, ns=(mtime_ns + 1000, mtime_ns + 1000))
+        assert run_script(str(path)) == '#0000ff'
+    finally:
+        headless.Krita.instance().closeDocument(document)
+
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from render_core.expressions import compile_expression
+
+
+@pytest.mark.parametrize('formula', ['sin(x, x)', 'sin(1, 2)', 'min(x)', 'max(x, 1, 2)', 'atan2(x)',
+                                     'sin(x=1)', 'sin(*x)', 'sin()'])
+def test_wrong_arguments_fail_to_compile(formula):
+    with pytest.raises(ValueError):
+        compile_expression(formula, ('x',))
+
+
+def test_extra_argument_does_not_overwrite_input():
+    x = np.linspace(-1, 1, 5)
+    before = x.copy()
+    with pytest.raises(ValueError):
+        compile_expression('sin(x, x)', ('x',))(x=x)
+    assert np.array_equal(x, before)
+
+
+@pytest.mark.parametrize('formula, expected', [('y = sin(x)', np.sin), ('min(x, 0)', lambda x: np.minimum(x, 0)),
+                                               ('atan2(x, 1)', lambda x: np.arctan2(x, 1)),
+                                               ('hypot(x, 2^2)', lambda x: np.hypot(x, 4))])
+def test_valid_formulas_evaluate(formula, expected):
+    x = np.linspace(-3, 3, 7)
+    assert np.allclose(compile_expression(formula, ('x',))(x=x), expected(x))
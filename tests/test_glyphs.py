@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from PyQt5.QtGui import QColor, QFont, QImage, QPainter, QPen
+from PyQt5.QtCore import Qt
+
+from render_core.pool import image_pixels
+from render_core.streams import substream
+
+SIZE = 200
+CHAR_TYPE = 'Hexadecimal (0-F)'
+
+
+# Function to paint the characters on a new transparent image, returns its channels
+def paint_image(paint):
+    image = QImage(SIZE, SIZE, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    paint(painter)
+    painter.end()
+    return image_pixels(image, writable=False).view(np.uint8).astype(np.int16)
+
+
+@pytest.mark.parametrize('alpha', [128, 40])
+def test_translucent_characters_match_draw_text(load_script, alpha):
+    script = load_script('krita_test18_random_chars.py')
+    font = QFont('DejaVu Sans', 14)
+    color = QColor(200, 30, 90, alpha)
+    # Characters closer than their size, so neighbouring glyphs overlap
+    char_size, spacing, seed = 8, 0, 5
+
+    def draw_text(painter):
+        painter.setFont(font)
+        painter.setPen(QPen(color))
+        characters = script.CHARACTER_SETS[CHAR_TYPE]
+        for row in range(len(range(0, SIZE, char_size))):
+            indices = script.generate_random_characters(CHAR_TYPE, substream(seed, row), len(range(0, SIZE, char_size)))
+            for column, index in enumerate(indices):
+                painter.drawText(column * char_size, row * char_size, characters[index])
+
+    grid = paint_image(lambda painter: script.paint_random_characters(
+        painter, SIZE, SIZE, 0, SIZE, CHAR_TYPE, font, color, char_size, spacing, spacing, seed))
+    assert np.array_equal(grid, paint_image(draw_text))
@@ -0,0 +1,28 @@
+from PyQt5.QtCore import QSize
+
+from render_core import preview
+from render_core.preview import PreviewRenderer
+
+
+def test_bands_cover_the_document():
+    bands = []
+    renderer = PreviewRenderer(lambda painter, width, height, top, bottom: bands.append((top, bottom)), 1000, 1000)
+    number = renderer.request(QSize(200, 200), ())
+    assert renderer.render(QSize(200, 200), (), number) is not None
+    assert len(bands) == -(-200 // preview.PREVIEW_BAND_ROWS)
+    assert bands[0][0] == 0 and bands[-1][1] == 1000
+    assert all(bottom >= next_top for (top, bottom), (next_top, next_bottom) in zip(bands, bands[1:]))
+
+
+def test_newer_request_abandons_the_pass():
+    bands = []
+
+    # A slow generator whose settings change while its first band is painted
+    def paint(painter, width, height, top, bottom):
+        bands.append((top, bottom))
+        renderer.request(QSize(200, 200), ())
+
+    renderer = PreviewRenderer(paint, 1000, 1000)
+    number = renderer.request(QSize(200, 200), ())
+    assert renderer.render(QSize(200, 200), (), number) is None
+    assert len(bands) == 1
@@ -0,0 +1,20 @@
+import json
+import sys
+
+import render_batch
+from render_core import cache
+
+
+def test_broken_entries_do_not_stop_the_batch(tmp_path, monkeypatch, capsys):
+    parameter_file = tmp_path / 'renders.json'
+    parameter_file.write_text(json.dumps({'width': 64, 'height': 64, 'renders': [
+        'lines', 3, None, {'generator': 'unknown', 'output': 'unknown.png'}, {'generator': 'lines', 'output': 'lines.png'},
+    ]}))
+    monkeypatch.setattr(cache, '_render_cache', cache.RenderCache(str(tmp_path / 'cache')))  # Turned off by --no-cache
+    monkeypatch.setattr(sys, 'argv', ['render_batch.py', str(parameter_file), '--no-cache'])
+
+    assert render_batch.main() == 1
+    assert (tmp_path / 'lines.png').is_file()
+    errors = capsys.readouterr().err.splitlines()
+    assert len(errors) == 4
+    assert errors[0].startswith("[0] None: failed: A render must be an object")
@@ -0,0 +1,112 @@
+import random
+
+import numpy as np
+import pytest
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen
+from PyQt5.QtCore import Qt
+
+from render_core import tiles
+from render_core.pool import image_pixels, image_pool
+from render_core.tiles import TiledLayer, TILE_OVERLAP
+
+
+class RecordingNode:
+    # Layer that keeps only the uploaded areas, so a test of a large document does not hold its pixels
+    def __init__(self):
+        self.uploads = []
+
+    def setPixelData(self, data, x, y, w, h):
+        self.uploads.append((x, y, w, h))
+
+
+class ImageNode:
+    # Layer with the pixels of a whole document, to compare them with painting straight into an image
+    def __init__(self, width, height):
+        self.image = QImage(width, height, QImage.Format_ARGB32)
+        self.image.fill(Qt.transparent)
+
+    def setPixelData(self, data, x, y, w, h):
+        tile = QImage(bytes(data), w, h, QImage.Format_ARGB32)
+        image_pixels(self.image)[y:y + h, x:x + w] = image_pixels(tile, writable=False)
+
+
+@pytest.fixture
+def largest_image(monkeypatch):
+    # Bytes of the largest image taken from the image pool during the test
+    pool = image_pool()
+    acquire = pool.acquire
+    largest = [0]
+
+    def tracked_acquire(width, height, *arguments, **keywords):
+        largest[0] = max(largest[0], width * height * 4)
+        return acquire(width, height, *arguments, **keywords)
+
+    monkeypatch.setattr(pool, 'acquire', tracked_acquire)
+    return largest
+
+
+def tile_area_bytes(layer):
+    return (layer.tile_size + 2 * TILE_OVERLAP) ** 2 * 4
+
+
+def test_sparse_drawing_uses_tile_sized_images(largest_image):
+    # Two dots in opposite corners: their bounding rect is the whole 8192 x 8192 document
+    layer = TiledLayer(RecordingNode(), 8192, 8192)
+    painter = layer.begin()
+    painter.drawPoint(10, 10)
+    painter.drawPoint(8180, 8180)
+    layer.upload()
+
+    assert largest_image[0] <= tile_area_bytes(layer)
+    assert len(layer.node.uploads) == 2
+
+
+def test_horizontal_lines_use_tile_sized_images(load_script, largest_image):
+    script = load_script('krita_test10_lines_dialog.py')
+    layer = TiledLayer(RecordingNode(), 8192, 8192)
+    for rect in script.paint_lines(layer.begin(), 8192, 8192, 0, 8192, 'Horizontal', QColor(Qt.black), 2, 10):
+        layer.mark_dirty(rect.x(), rect.y(), rect.width(), rect.height())
+    layer.upload()
+
+    assert largest_image[0] <= tile_area_bytes(layer)
+
+
+def test_large_recording_is_rasterized_in_bands(largest_image):
+    layer = TiledLayer(RecordingNode(), 8192, 8192)
+    painter = layer.begin()
+    generator = random.Random(1)
+    for _ in range(20000):
+        painter.drawLine(generator.randrange(8192), generator.randrange(8192),
+                         generator.randrange(8192), generator.randrange(8192))
+    layer.upload()
+
+    assert layer.picture.size() > tiles.TILE_REPLAY_BYTES
+    assert largest_image[0] <= tiles.MAX_RASTER_BYTES + 2 * TILE_OVERLAP * 8192 * 4
+    assert largest_image[0] < 8192 * 8192 * 4 // 2
+
+
+def test_bands_keep_the_pixels_of_one_image(monkeypatch):
+    # Small bands (two tile rows) on a document that does not end on the tile grid
+    width, height = 1500, 1300
+    monkeypatch.setattr(tiles, 'MAX_RASTER_BYTES', 2 * 256 * width * 4)
+    generator = random.Random(2)
+
+    layer = TiledLayer(ImageNode(width, height), width, height, tile_size=256)
+    painter = layer.begin()
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(QPen(QColor(30, 60, 90), 3))
+    for _ in range(6000):
+        painter.drawLine(generator.randrange(-50, width + 50), generator.randrange(-50, height + 50),
+                         generator.randrange(-50, width + 50), generator.randrange(-50, height + 50))
+    layer.upload()
+    assert layer.picture.size() > tiles.TILE_REPLAY_BYTES
+    assert len(layer.raster_bands()) == 3
+
+    # The same recording replayed once into an image of the whole document
+    expected = QImage(width, height, QImage.Format_ARGB32)
+    expected.fill(Qt.transparent)
+    painter = QPainter(expected)
+    painter.drawPicture(0, 0, layer.picture)
+    painter.end()
+    differs = image_pixels(layer.node.image, writable=False) != image_pixels(expected, writable=False)
+    assert np.count_nonzero(differs) == 0